@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import sys
+
+from RIPServerCode import RIPRouter, readTopology
+
+'''
+asyncio front end for the RIP daemon.
+
+Each input port is an asyncio DatagramProtocol endpoint, and the periodic, triggered, timeout and
+garbage collection timers are scheduled with loop.call_at/call_later. Any number of routers can
+run on one event loop, alongside other asyncio services, without threads.
+
+Library use, with readConfig from RIPServerCode:
+router = await startRouter(readConfig("router1.txt"))
+...
+router.stop()
+
+Usage:
+python RIPAsync.py router1.txt [router2.txt ...]
+python RIPAsync.py topology.txt
+'''
+
+class AsyncioScheduler:#gives RIPRouter the TimerScheduler interface on top of an asyncio event loop
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.clock = loop.time#deadlines are in event loop time
+
+    def scheduleAt(self, deadline, kind, callback):
+        return self.loop.call_at(deadline, callback)
+
+    def schedule(self, delay, kind, callback):
+        return self.loop.call_later(delay, callback)
+
+    def cancel(self, timer):
+        if (timer is not None):
+            timer.cancel()
+
+class RIPProtocol(asyncio.DatagramProtocol):#one input port of a router
+
+    def __init__(self, asyncRouter, inputPort):
+        self.asyncRouter = asyncRouter
+        self.inputPort = inputPort
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.asyncRouter.router.receivePacket((data, addr))
+
+    def error_received(self, exc):#e.g. a neighbour's port is closed, which is expected while it is down
+        self.asyncRouter.router.logger.debug("Socket error on port %d: %s", self.inputPort, exc)
+
+class AsyncRIPRouter:#one router running on an asyncio event loop
+
+    def __init__(self, config, host="127.0.0.1", logger=None):
+        self.config = config
+        self.host = host
+        self.logger = logger
+        self.router = None
+        self.transports = []
+        self.neighbourTransports = {}#neighbour port -> transport its packets are sent from
+
+    async def start(self):#bind every input port and start the router's timers
+        loop = asyncio.get_running_loop()
+        try:
+            for inputPort in self.config.inputPorts:
+                transport, protocol = await loop.create_datagram_endpoint(lambda inputPort=inputPort: RIPProtocol(self, inputPort), local_addr=(self.host, inputPort))
+                self.transports.append(transport)
+        except OSError:
+            self.closeTransports()
+            raise
+        for index, outputRouter in enumerate(self.config.outputData):#spread neighbours over the bound ports rather than sending everything from the first one
+            self.neighbourTransports[outputRouter[0]] = self.transports[index % len(self.transports)]
+        self.router = RIPRouter(self.config, AsyncioScheduler(loop), self.sendPacket, logger=self.logger)
+        return self
+
+    def sendPacket(self, packet, port, kind):#the transport queues packets itself, so kind is not needed
+        transport = self.neighbourTransports.get(port) or self.transports[0]
+        if not transport.is_closing():
+            transport.sendto(bytes(packet), (self.host, port))#the router reuses its packet buffers, and the transport may queue the packet
+
+    def closeTransports(self):
+        for transport in self.transports:
+            transport.close()
+        self.transports = []
+
+    def stop(self):#cancel the router's timers and close its ports
+        if (self.router is not None):
+            self.router.stop()
+        self.closeTransports()
+
+async def startRouter(config, host="127.0.0.1", logger=None):#start one router on the running event loop and return it
+    return await AsyncRIPRouter(config, host, logger).start()
+
+async def runRouters(configs, host="127.0.0.1"):#run several routers on one event loop until cancelled
+    routers = []
+    try:
+        for config in configs:
+            routers.append(await startRouter(config, host))
+        await asyncio.Event().wait()#nothing ever sets this, the routers run from their protocols and timers
+    finally:
+        for router in routers:
+            router.stop()
+
+def main():
+    configs = []
+    for configurationFile in sys.argv[1:]:
+        fileConfigs = readTopology(configurationFile)
+        if (fileConfigs is None):
+            return 1
+        configs.extend(fileConfigs.values())
+    if not configs:
+        print("Usage: python RIPAsync.py router1.txt [router2.txt ...] or topology.txt")
+        return 1
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    try:
+        asyncio.run(runRouters(configs))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,668 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import struct
+import sys
+import time
+import timeit
+import zlib
+from time import perf_counter
+
+from RIPCapture import readCapture
+from RIPCodec import COMPACT_VERSION, FLAG_COMPRESSED, HEADER, HELLO_COMMAND, INFINITY, MAX_ENTRIES, PACKET_FORMATS, REQUEST_COMMAND, RESPONSE_COMMAND, ResponseEncoder, compactPacket, decodeEntries, decodeHeader, expandCompact
+from RIPRouteTable import Route, RouteTable
+from RIPSimulator import Simulation, VirtualClock
+from RIPServerCode import ENGINES, RIPRouter, RouterConfig, packetCheckFailure, readTopology
+from RIPTimers import TimerScheduler
+from RIPTopology import TOPOLOGIES, generateConfigs, writeConfigs
+from RIPVectorTable import VectorRouteTable, vectorAvailable
+
+'''
+Benchmarks for the RIP daemon.
+
+Usage:
+python RIPBenchmark.py codec [--json]
+python RIPBenchmark.py engine [--sizes 1000,10000] [--json]
+python RIPBenchmark.py wire [--sizes 60,1000,10000] [--json]
+python RIPBenchmark.py suite [--topologies ring,grid,star,random,scalefree] [--size 50] [--output results.json]
+python RIPBenchmark.py replay capture.ripcap config.txt [--realtime] [--times-file times.txt] [--json]
+
+codec compares the precompiled struct codec against the per-field pack_into/unpack_from
+functions it replaced, for tables of several sizes. The old functions could only fill one 512
+byte packet, so for larger tables they are run once per MAX_ENTRIES sized chunk.
+
+engine times one full received distance vector, every fragment from one neighbour, applied by
+the scalar RouteTable and by the NumPy VectorRouteTable. "refresh" updates confirm every route
+without changing it, as in a converged network, and "change" updates move every route's metric.
+It then applies random batches of full tables and triggered updates to both engines, in which
+one neighbour's run often names a destination twice and poisoned routes fail over, and exits
+with 1 if their tables ever differ.
+
+wire reports the bytes per route a full table takes in the standard, compact and compressed
+packet formats, with the time to encode the table and to decode it again (for the compact formats
+this includes turning the packets back into the standard layout, as a receiver does). The table
+is shaped like a real one: dense router IDs, learned through a handful of neighbours. It also
+checks that compressed packets which would inflate to megabytes are rejected without being
+inflated, and exits with 1 if one is not.
+
+suite generates topologies, runs them in the simulator and reports, as JSON, the simulated time
+to converge, to reconverge after a link and a router failure, and to reconverge after a short
+outage of that router when it restarts cold and warm from its snapshot. It also reports packets
+and bytes sent per router per simulated second once converged, and the CPU time spent in
+updateFromPackets and composeResponse. The restarts are repeated with every request lost, as
+with neighbours which don't answer requests, where only a warm start has routes before their
+next periodic update. For the router failure it reports failover latency: how long until every
+route through the failed router had moved to another next hop, and how long those routes spent
+with no usable route at all between timing out and being replaced. Run it with
+and without --no-backup-routes to see what the backup route cache saves, and with
+--hello-interval to see how much sooner a failed router is noticed with hellos.
+
+replay feeds a capture written by a daemon's --capture-file back through the packet checks and
+updateRoutingTable, or with --router-path through the router's whole receive path, and reports
+the time each packet took. The routers' timers run on a virtual clock following the capture's
+timestamps, so every replay of one capture ends with the same tables whether it ran as fast as
+possible or in real time, and two versions of the code can be compared on identical input. The
+final tables are reported as a digest, to check that a faster version still computes the same
+routes. Each packet goes to the router whose config owns its input port, so a capture from a
+multi-router daemon replays against the topology file it ran with.
+python RIPBenchmark.py replay capture.ripcap topology.txt [--realtime] [--router-path] [--json]
+'''
+
+def legacyComposeResponse(routingTable, routerID, metric):#the original composeResponse packing loop, kept as the baseline
+    routerResponse = bytearray(512)
+    struct.pack_into(">B", routerResponse, 0, 2)
+    struct.pack_into(">B", routerResponse, 1, 2)
+    struct.pack_into(">H", routerResponse, 2, routerID)
+    struct.pack_into(">H", routerResponse, 4, 0)
+    struct.pack_into(">H", routerResponse, 6, 0)
+    struct.pack_into(">L", routerResponse, 8, 0)
+    struct.pack_into(">L", routerResponse, 12, 0)
+    struct.pack_into(">L", routerResponse, 16, 0)
+    struct.pack_into(">L", routerResponse, 20, metric)
+    count = 0
+    while (count < len(routingTable)):
+        struct.pack_into(">B", routerResponse, (25 + count * 8), routingTable[count][0])
+        struct.pack_into(">H", routerResponse, (25 + count * 8) + 1, routingTable[count][1])
+        struct.pack_into(">H", routerResponse, (25 + count * 8) + 3, routingTable[count][2])
+        struct.pack_into(">H", routerResponse, (25 + count * 8) + 5, routingTable[count][3])
+        struct.pack_into(">B", routerResponse, (25 + count * 8) + 7, routingTable[count][5])
+        count = count + 1
+    struct.pack_into(">B", routerResponse, 24, count)
+    return routerResponse
+
+def legacyDecode(packet):#the original header checks and entry unpacking loop, kept as the baseline
+    struct.unpack_from(">B", packet, 0)
+    struct.unpack_from(">B", packet, 1)
+    struct.unpack_from(">H", packet, 2)
+    struct.unpack_from(">H", packet, 6)
+    struct.unpack_from(">L", packet, 12)
+    struct.unpack_from(">L", packet, 16)
+    struct.unpack_from(">L", packet, 20)
+    routerCount = (struct.unpack_from(">B", packet, 24))[0]
+    receivedTable = []
+    routersAddedCount = 0
+    while (routerCount > 0):
+        thisRouter = []
+        thisRouter.append((struct.unpack_from(">B", packet, (25 + routersAddedCount * 8)))[0])
+        thisRouter.append((struct.unpack_from(">H", packet, (25 + routersAddedCount * 8) + 1))[0])
+        thisRouter.append((struct.unpack_from(">H", packet, (25 + routersAddedCount * 8) + 3))[0])
+        thisRouter.append((struct.unpack_from(">H", packet, (25 + routersAddedCount * 8) + 5))[0])
+        thisRouter.append((struct.unpack_from(">B", packet, (25 + routersAddedCount * 8) + 7))[0])
+        receivedTable.append(thisRouter)
+        routerCount = routerCount - 1
+        routersAddedCount = routersAddedCount + 1
+    return receivedTable
+
+def legacyEncodeTable(routingTable, routerID, metric):#the old packing loop run over each packet-sized chunk of the table
+    return [legacyComposeResponse(routingTable[start:start + MAX_ENTRIES], routerID, metric) for start in range(0, max(1, len(routingTable)), MAX_ENTRIES)]
+
+def legacyDecodeTable(packets):
+    return [legacyDecode(packet) for packet in packets]
+
+def codecDecodeTable(packets):#header and entries through the precompiled codec
+    receivedTable = []
+    for packet in packets:
+        header = decodeHeader(packet)
+        receivedTable.extend(decodeEntries(packet, header[10]))
+    return receivedTable
+
+def bestTime(function, number):#seconds per call, best of five repeats
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+def benchmarkCodec(tableSizes, number):#time encode and decode of the old and new code for each table size
+    results = []
+    for size in tableSizes:
+        routes = [Route(destination, 10000 + destination, destination, destination % 15 + 1, 0, 0) for destination in range(1, size + 1)]
+        routingTable = [[destination & 0xff] + route.asList()[1:] for destination, route in zip(range(1, size + 1), routes)]#the old layout only had one byte for the destination
+        encoder = ResponseEncoder()
+        packets = [bytes(packet) for packet in encoder.encode(1, 1, routes)]
+        legacyPackets = legacyEncodeTable(routingTable, 1, 1)
+
+        result = {
+            "entries": size,
+            "datagrams": len(packets),
+            "bytes": sum(len(packet) for packet in packets),
+            "legacyBytes": sum(len(packet) for packet in legacyPackets),
+            "legacyEncodeSeconds": bestTime(lambda: legacyEncodeTable(routingTable, 1, 1), number),
+            "codecEncodeSeconds": bestTime(lambda: encoder.encode(1, 1, routes), number),
+            "legacyDecodeSeconds": bestTime(lambda: legacyDecodeTable(legacyPackets), number),
+            "codecDecodeSeconds": bestTime(lambda: codecDecodeTable(packets), number),
+        }
+        result["encodeSpeedup"] = result["legacyEncodeSeconds"] / result["codecEncodeSeconds"]
+        result["decodeSpeedup"] = result["legacyDecodeSeconds"] / result["codecDecodeSeconds"]
+        results.append(result)
+    return results
+
+def printCodecResults(results):
+    print("%8s %14s %14s %8s %14s %14s %8s" % ("entries", "legacy enc/s", "codec enc/s", "speedup", "legacy dec/s", "codec dec/s", "speedup"))
+    for result in results:
+        print("%8d %14.0f %14.0f %7.1fx %14.0f %14.0f %7.1fx" % (result["entries"],
+            1 / result["legacyEncodeSeconds"], 1 / result["codecEncodeSeconds"], result["encodeSpeedup"],
+            1 / result["legacyDecodeSeconds"], 1 / result["codecDecodeSeconds"], result["decodeSpeedup"]))
+
+def engineWorkload(tableClass, size):#a table with size destinations learned from neighbour 2, and the packets neighbour 2 sends to refresh them and to change them all
+    routingTable = tableClass(1, [[10002, 1, 2], [10003, 1, 3]], lambda: 0.0)
+    advertised = [Route(destination, 10000 + destination, 5, destination % 14 + 1, 0, 0) for destination in range(4, size + 4)]
+    worse = [Route(route.destination, route.address, 5, route.metric + 1, 0, 0) for route in advertised]
+    encoder = ResponseEncoder()
+    refresh = [(bytes(packet), None) for packet in encoder.encode(2, 1, advertised)]
+    change = [(bytes(packet), None) for packet in encoder.encode(2, 1, worse)]
+    routingTable.updateFromPackets(refresh)
+    return routingTable, refresh, change
+
+def applyAll(routingTable, packets):#apply a full vector as one received batch
+    routingTable.updateFromPackets(packets)
+
+def benchmarkEngines(tableSizes, number):#time full vector updates through each available engine for each table size
+    tableClasses = {"scalar": RouteTable}
+    if vectorAvailable:
+        tableClasses["vector"] = VectorRouteTable
+    results = []
+    for size in tableSizes:
+        result = {"destinations": size, "datagrams": None}
+        finalTables = []
+        for engine, tableClass in tableClasses.items():
+            routingTable, refresh, change = engineWorkload(tableClass, size)
+            result["datagrams"] = len(refresh)
+            result[engine + "RefreshSeconds"] = bestTime(lambda: applyAll(routingTable, refresh), number)
+            result[engine + "ChangeSeconds"] = bestTime(lambda: (applyAll(routingTable, change), applyAll(routingTable, refresh)), number) / 2#every update moves every metric
+            applyAll(routingTable, change)
+            finalTables.append(sorted((route.destination, route.address, route.nextHop, route.metric) for route in routingTable))
+        result["sameResult"] = all(table == finalTables[0] for table in finalTables)
+        if vectorAvailable:
+            result["refreshSpeedup"] = result["scalarRefreshSeconds"] / result["vectorRefreshSeconds"]
+            result["changeSpeedup"] = result["scalarChangeSeconds"] / result["vectorChangeSeconds"]
+        results.append(result)
+    return results
+
+def routeStates(routingTable):#every route as a sorted list, with the time it was last confirmed wherever the table keeps it
+    return sorted((route.destination, route.address, route.nextHop, route.metric, routingTable.lastUpdateOf(route), route.learnedFrom) for route in routingTable)
+
+def engineDifferential(batches, seed=0):#apply the same random batches to the scalar and vector tables, returns the first batch after which they differ, or None
+    if not vectorAvailable:
+        return None
+    rng = random.Random(seed)
+    now = [0.0]
+    neighbours = [2, 3, 4]
+    tables = [tableClass(1, [[10000 + neighbourID, neighbourID - 1, neighbourID] for neighbourID in neighbours], lambda: now[0]) for tableClass in (RouteTable, VectorRouteTable)]
+    for routingTable in tables:
+        routingTable.backupLifetime = 30
+    encoder = ResponseEncoder()
+    for batch in range(batches):
+        now[0] = now[0] + rng.choice([0.5, 5])
+        packets = []
+        sender = rng.choice(neighbours)
+        for packet in range(rng.randint(1, 4)):#a sender often sends twice in a row, so one run can name a destination more than once
+            if (rng.random() < 0.4):
+                sender = rng.choice(neighbours)
+            routes = [Route(destination, 20000 + destination, rng.choice([0, 2, 3, 4, 7]), rng.choice([rng.randint(1, 15), INFINITY]), 0, 0) for destination in rng.sample(range(5, 45), rng.randint(1, 30))]
+            packets.extend((bytes(datagram), None) for datagram in encoder.encode(sender, 1, routes, partial=rng.random() < 0.5))#triggered updates as well as full tables
+        for routingTable in tables:
+            routingTable.updateFromPackets(packets)
+        scalar, vector = tables
+        if (routeStates(scalar) != routeStates(vector) or scalar.addedCount != vector.addedCount):
+            return batch
+        if any(vector.metrics[route.destination] != route.metric or vector.nextHops[route.destination] != route.nextHop for route in vector):#the arrays must match the Route objects
+            return batch
+    return None
+
+def printEngineResults(results):
+    if not vectorAvailable:
+        print("NumPy is not installed, only the scalar engine was timed")
+    print("%12s %9s %7s %16s %16s %8s %16s %16s %8s" % ("destinations", "datagrams", "same", "scalar refresh", "vector refresh", "speedup", "scalar change", "vector change", "speedup"))
+    for result in results:
+        print("%12d %9d %7s %14.0fus %14.0fus %7.1fx %14.0fus %14.0fus %7.1fx" % (result["destinations"], result["datagrams"], result["sameResult"],
+            result["scalarRefreshSeconds"] * 1e6, result.get("vectorRefreshSeconds", 0) * 1e6, result.get("refreshSpeedup", 0),
+            result["scalarChangeSeconds"] * 1e6, result.get("vectorChangeSeconds", 0) * 1e6, result.get("changeSpeedup", 0)))
+
+def wireWorkload(size, seed=0):#a full table of size routes, learned through four neighbours
+    rng = random.Random(seed)
+    neighbours = [(10000 + 2 * index, index + 2) for index in range(4)]#(port, router ID) of each neighbour
+    routes = []
+    for destination in range(6, size + 6):
+        port, neighbourID = rng.choice(neighbours)
+        routes.append(Route(destination, port, neighbourID, rng.randint(2, 15), 0, neighbourID))
+    return routes
+
+def encodeWire(encoder, routes, packetFormat):#the datagrams of a full table in one packet format
+    packets = encoder.encode(1, 1, routes)
+    if (packetFormat == "standard"):
+        return [bytes(packet) for packet in packets]
+    compress = packetFormat == "compressed"
+    return [compactPacket(packet, compress) for packet in packets]
+
+def decodeWire(packets):#every entry of the datagrams, expanding compact packets first as a receiver does
+    receivedTable = []
+    for packet in packets:
+        if (packet[1] == COMPACT_VERSION):
+            packet = expandCompact(packet)
+        receivedTable.extend(decodeEntries(packet, packet[24]))
+    return receivedTable
+
+def benchmarkWire(tableSizes, number):#bytes per route and encode/decode time of a full table in each packet format
+    results = []
+    for size in tableSizes:
+        routes = wireWorkload(size)
+        encoder = ResponseEncoder()
+        expected = sorted(codecDecodeTable(encodeWire(encoder, routes, "standard")))
+        result = {"routes": size}
+        for packetFormat in PACKET_FORMATS:
+            packets = encodeWire(encoder, routes, packetFormat)
+            byteCount = sum(len(packet) for packet in packets)
+            result[packetFormat] = {
+                "datagrams": len(packets),
+                "bytes": byteCount,
+                "bytesPerRoute": byteCount / size,
+                "encodeSeconds": bestTime(lambda: encodeWire(encoder, routes, packetFormat), number),
+                "decodeSeconds": bestTime(lambda: decodeWire(packets), number),
+                "sameResult": sorted(decodeWire(packets)) == expected,
+            }
+        results.append(result)
+    return results
+
+def compressionBombs():#compressed compact packets which inflate to 4MB, with entry counts of 0 and 1, as a hostile sender could craft them
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    block = compressor.compress(b"\x81\x01" * 2000000) + compressor.flush()#two byte varints, the slowest kind to parse
+    return {count: HEADER.pack(RESPONSE_COMMAND, COMPACT_VERSION, 2, 0, FLAG_COMPRESSED, 0, 1, 0, 0, 0, count) + block for count in (0, 1)}
+
+def checkCompressionBombs():#expandCompact must reject every bomb without inflating it, returns {entry count: seconds taken}, None for a bomb it accepted
+    results = {}
+    for count, packet in compressionBombs().items():
+        started = perf_counter()
+        rejected = expandCompact(packet) is None
+        results[count] = perf_counter() - started if rejected else None
+    return results
+
+def printWireResults(results):
+    print("%8s %11s %9s %13s %13s %8s" % ("routes", "format", "bytes", "bytes/route", "encode", "decode"))
+    for result in results:
+        for packetFormat in PACKET_FORMATS:
+            formatResult = result[packetFormat]
+            print("%8d %11s %9d %13.2f %11.0fus %6.0fus %s" % (result["routes"], packetFormat, formatResult["bytes"], formatResult["bytesPerRoute"],
+                formatResult["encodeSeconds"] * 1e6, formatResult["decodeSeconds"] * 1e6, "" if formatResult["sameResult"] else "MISMATCH"))
+
+class MethodTimer:#while active, wraps methods of a class to add up the CPU time spent in them
+
+    def __init__(self, owner, names):
+        self.owner = owner
+        self.names = names
+        self.originals = {}
+        self.seconds = {name: 0.0 for name in names}
+        self.calls = {name: 0 for name in names}
+
+    def wrap(self, name, method):
+        seconds = self.seconds
+        calls = self.calls
+        clock = time.process_time
+        def timed(*arguments, **keywords):
+            started = clock()
+            try:
+                return method(*arguments, **keywords)
+            finally:
+                seconds[name] = seconds[name] + clock() - started
+                calls[name] = calls[name] + 1
+        return timed
+
+    def __enter__(self):
+        for name in self.names:
+            self.originals[name] = getattr(self.owner, name)
+            setattr(self.owner, name, self.wrap(name, self.originals[name]))
+        return self
+
+    def __exit__(self, *exception):
+        for name, method in self.originals.items():
+            setattr(self.owner, name, method)
+
+def trafficSince(simulation, packets, bytesSent):#packets and bytes sent by all routers since the given totals
+    return sum(simulation.packetsSent.values()) - packets, sum(simulation.bytesSent.values()) - bytesSent
+
+def routesThrough(simulation, failedRouter):#(router ID, destination) of every route through a just failed router to a destination still reachable without it
+    links = simulation.liveLinks()
+    routes = []
+    for routerID, router in simulation.routers.items():
+        reachable = simulation.shortestPaths(routerID, links)
+        routes.extend((routerID, route.destination) for route in router.routingTable if route.nextHop == failedRouter and route.destination in reachable)
+    return routes
+
+def runMeasuringFailover(simulation, failedRouter, routes, limit, step=0.01, checkInterval=0.1):#runUntilConverged, also timing how the given routes move off the failed router
+    startTime = simulation.clock.now
+    movedAt = {}#route -> time it first had a usable next hop other than the failed router
+    lostAt = {}#route -> time it became unusable, while it is
+    outages = dict.fromkeys(routes, 0.0)#route -> seconds spent with no usable route at all
+    failedOver = sum(router.routingTable.failoverCount for router in simulation.routers.values())
+    reconvergence = None
+    checkSteps = max(1, int(round(checkInterval / step)))
+    steps = 0
+    while (simulation.clock.now - startTime < limit):
+        simulation.runFor(step)
+        now = simulation.clock.now
+        for routerID, destination in routes:
+            route = simulation.routers[routerID].routingTable.get(destination)
+            usable = route is not None and route.metric < INFINITY
+            key = (routerID, destination)
+            if not usable:
+                lostAt.setdefault(key, now)
+            else:
+                if key in lostAt:
+                    outages[key] = outages[key] + now - lostAt.pop(key)
+                if (key not in movedAt and route.nextHop != failedRouter):
+                    movedAt[key] = now
+        steps = steps + 1
+        if (steps % checkSteps == 0 and simulation.isConverged()):
+            reconvergence = round(simulation.clock.now - startTime, 6)
+            break
+    for key, since in lostAt.items():#still unusable when the run ended
+        outages[key] = outages[key] + simulation.clock.now - since
+    return reconvergence, {
+        "failoverRoutes": len(routes),
+        "failoverSeconds": round(max(movedAt.values()) - startTime, 6) if len(movedAt) == len(routes) and routes else None,#until the last route through the failed router had moved off it
+        "failoverOutageMeanSeconds": round(sum(outages.values()) / len(routes), 6) if routes else 0.0,#time without any usable route, after the timeout and before a backup or new advertisement
+        "failoverOutageMaxSeconds": round(max(outages.values()), 6) if routes else 0.0,
+        "routesFailedOver": sum(router.routingTable.failoverCount for router in simulation.routers.values()) - failedOver,
+    }
+
+def benchmarkTopology(topology, size, seed, maxCost, limit, steadyTime, engine="scalar", adaptivePeriodic=False, backupRoutes=True, packetFormat="standard", helloInterval=0):#run one topology through convergence, steady state and failures
+    configs = generateConfigs(topology, size, seed, maxCost, engine=engine, adaptivePeriodic=adaptivePeriodic, backupRoutes=backupRoutes, packetFormat=packetFormat, helloInterval=helloInterval)
+    rng = random.Random(seed)
+    result = {"topology": topology, "engine": engine, "adaptivePeriodic": adaptivePeriodic, "backupRoutes": backupRoutes, "packetFormat": packetFormat, "helloInterval": helloInterval, "routers": len(configs), "links": sum(len(config.outputData) for config in configs) // 2, "seed": seed}
+
+    wallStarted = time.perf_counter()
+    cpuStarted = time.process_time()
+    tableClass = VectorRouteTable if (engine == "vector" and vectorAvailable) else RouteTable
+    with MethodTimer(tableClass, ("updateFromPackets", "composeResponse")) as methodTimer:
+        simulation = Simulation(configs, seed)
+        result["convergenceSeconds"] = simulation.runUntilConverged(limit)
+
+        packets, bytesSent = trafficSince(simulation, 0, 0)
+        simulation.runFor(steadyTime)
+        packets, bytesSent = trafficSince(simulation, packets, bytesSent)
+        result["steadyPacketsPerRouterPerSecond"] = packets / len(configs) / steadyTime
+        result["steadyBytesPerRouterPerSecond"] = bytesSent / len(configs) / steadyTime
+
+        config = rng.choice(configs)
+        neighbourID = rng.choice(config.outputData)[2]
+        result["failedLink"] = [config.routerID, neighbourID]
+        simulation.failLink(config.routerID, neighbourID)
+        result["linkFailureReconvergenceSeconds"] = simulation.runUntilConverged(limit)
+        simulation.restoreLink(config.routerID, neighbourID)
+        simulation.runUntilConverged(limit)
+
+        failedRouter = rng.choice(configs).routerID
+        result["failedRouter"] = failedRouter
+        simulation.failRouter(failedRouter)
+        result["routerFailureReconvergenceSeconds"], failover = runMeasuringFailover(simulation, failedRouter, routesThrough(simulation, failedRouter), limit)
+        result.update(failover)
+        simulation.restoreRouter(failedRouter)
+        simulation.runUntilConverged(limit)
+        for requestsLost in (False, True):#with requests lost the restarted router only hears its neighbours' periodic updates, which is where the snapshot earns its keep
+            simulation.requestsLost = requestsLost
+            for restart in ("cold", "warm"):
+                simulation.failRouter(failedRouter)
+                simulation.runFor(simulation.configs[failedRouter].periodicValue)#a short outage, as a restart of the daemon would be
+                simulation.restoreRouter(failedRouter, warm=(restart == "warm"))
+                result[restart + "Restart" + ("NoRequests" if requestsLost else "") + "ReconvergenceSeconds"] = simulation.runUntilConverged(limit, 0.01)
+        simulation.requestsLost = False
+
+    result["simulatedSeconds"] = simulation.clock.now
+    for name in ("duplicateHits", "duplicateMisses"):#packets answered by the duplicate filter, and packets which took the full path
+        result[name] = sum(router.metrics.counter(name).value for router in simulation.routers.values())
+    result["wallSeconds"] = time.perf_counter() - wallStarted
+    result["cpuSeconds"] = time.process_time() - cpuStarted
+    for name in methodTimer.names:
+        result[name + "CpuSeconds"] = methodTimer.seconds[name]
+        result[name + "Calls"] = methodTimer.calls[name]
+    return result
+
+def benchmarkSuite(topologies, size, seed, maxCost, limit, steadyTime, saveConfigs=None, engine="scalar", adaptivePeriodic=False, backupRoutes=True, packetFormat="standard", helloInterval=0):
+    results = []
+    for topology in topologies:
+        if (saveConfigs is not None):
+            writeConfigs(generateConfigs(topology, size, seed, maxCost, engine=engine, adaptivePeriodic=adaptivePeriodic, backupRoutes=backupRoutes, packetFormat=packetFormat, helloInterval=helloInterval), os.path.join(saveConfigs, topology))
+        results.append(benchmarkTopology(topology, size, seed, maxCost, limit, steadyTime, engine, adaptivePeriodic, backupRoutes, packetFormat, helloInterval))
+    return {
+        "benchmark": "suite",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parameters": {"size": size, "seed": seed, "maxCost": maxCost, "limit": limit, "steadyTime": steadyTime, "engine": engine, "adaptivePeriodic": adaptivePeriodic, "backupRoutes": backupRoutes, "packetFormat": packetFormat, "helloInterval": helloInterval},
+        "results": results,
+    }
+
+def tableDigest(routers):#a short hash of every router's routes, equal for two replays which ended with the same tables
+    digest = hashlib.blake2b(digest_size=8)
+    for routerID in sorted(routers):
+        routes = sorted((route.destination, route.nextHop, route.metric) for route in routers[routerID].routingTable)
+        digest.update(repr((routerID, routes)).encode())
+    return digest.hexdigest()
+
+def percentile(sortedValues, fraction):
+    if not sortedValues:
+        return 0.0
+    return sortedValues[min(len(sortedValues) - 1, int(fraction * len(sortedValues)))]
+
+def replayCapture(records, configs, routerPath=False, realtime=False, engine=None):#feed captured datagrams to the routers owning their ports, returns a report and (time captured, input port, seconds) for each packet replayed
+    if not records:
+        return {"packets": 0}, []
+    clock = VirtualClock(records[0][0])
+    scheduler = TimerScheduler(clock)
+    portOwners = {}#input port -> RouterConfig listening on it
+    for config in configs:
+        if (engine is not None):
+            config = RouterConfig(config.routerID, config.inputPorts, config.outputData, config.timeoutValue, config.periodicValue, engine, config.adaptivePeriodic, config.backupRoutes, config.packetFormat, config.helloInterval, config.helloMultiplier)
+        for inputPort in config.inputPorts:
+            portOwners[inputPort] = config
+    routers = {}#router ID -> RIPRouter, started when its first packet is replayed
+    sent = []
+
+    def sendPacket(packet, port, kind):#nothing is delivered during a replay, the capture already holds what the neighbours sent
+        sent.append(len(packet))
+
+    times = []
+    unknownPorts = 0
+    rejected = 0
+    changed = 0
+    firstTime = records[0][0]
+    wallStarted = perf_counter()
+    for receivedAt, inputPort, packet in records:
+        config = portOwners.get(inputPort)
+        if (config is None):
+            unknownPorts = unknownPorts + 1
+            continue
+        router = routers.get(config.routerID)
+        if (router is None):
+            router = routers[config.routerID] = RIPRouter(config, scheduler, sendPacket)
+        if realtime:
+            wait = (receivedAt - firstTime) - (perf_counter() - wallStarted)
+            if (wait > 0):
+                time.sleep(wait)
+        if (receivedAt > clock.now):#run the timers due before this packet, outside the timed section
+            clock.now = receivedAt
+            scheduler.runDue()
+
+        packetReceived = (packet, ("127.0.0.1", inputPort))
+        if routerPath:#everything the daemon does with a packet, including the duplicate filter and scheduling a triggered update
+            started = perf_counter()
+            router.receivePacket(packetReceived)
+            times.append((receivedAt, inputPort, perf_counter() - started))
+            continue
+        started = perf_counter()
+        failure = packetCheckFailure(packetReceived, router.routerID)
+        if (failure is None):
+            if (packet[0] == REQUEST_COMMAND):
+                router.answerRequest(decodeHeader(packet)[2])
+                packetChanged = 0
+            elif (packet[0] == HELLO_COMMAND):
+                header = decodeHeader(packet)
+                router.hello.helloHeard(header[2], header[7] / 1000)
+                packetChanged = 0
+            else:
+                if (packet[1] == COMPACT_VERSION):#expanded to the standard layout first, as the router does
+                    packetReceived = router.compactHeard(packetReceived)
+                packetChanged = router.routingTable.updateRoutingTable(packetReceived) if packetReceived is not None else 0
+        times.append((receivedAt, inputPort, perf_counter() - started))
+        if (failure is not None):
+            rejected = rejected + 1
+        elif (packetChanged > 0):
+            changed = changed + packetChanged
+            router.scheduleTriggeredUpdate()
+    wallSeconds = perf_counter() - wallStarted
+
+    sortedTimes = sorted(packetTime[2] for packetTime in times)
+    processingSeconds = sum(sortedTimes)
+    report = {
+        "packets": len(times),
+        "unknownPorts": unknownPorts,
+        "rejected": rejected if not routerPath else sum(sum(counter.value for counter in router.rejectedCounters.values()) for router in routers.values()),
+        "routesChanged": changed if not routerPath else sum(router.routesChanged.value for router in routers.values()),
+        "routers": len(routers),
+        "capturedSeconds": records[-1][0] - firstTime,
+        "wallSeconds": wallSeconds,
+        "processingSeconds": processingSeconds,
+        "packetsPerSecond": len(times) / processingSeconds if processingSeconds > 0 else 0.0,
+        "meanMicroseconds": 1e6 * processingSeconds / len(times) if times else 0.0,
+        "p50Microseconds": 1e6 * percentile(sortedTimes, 0.5),
+        "p90Microseconds": 1e6 * percentile(sortedTimes, 0.9),
+        "p99Microseconds": 1e6 * percentile(sortedTimes, 0.99),
+        "maxMicroseconds": 1e6 * sortedTimes[-1] if sortedTimes else 0.0,
+        "tableDigest": tableDigest(routers),
+    }
+    return report, times
+
+def printReplayResults(report):
+    print("%d packets for %d routers over %.1f captured seconds, %d on unknown ports, %d rejected, %d routes changed" % (report["packets"], report["routers"], report["capturedSeconds"], report["unknownPorts"], report["rejected"], report["routesChanged"]))
+    print("%.0f packets/s, per packet: mean %.1f us, p50 %.1f us, p90 %.1f us, p99 %.1f us, max %.1f us" % (report["packetsPerSecond"], report["meanMicroseconds"], report["p50Microseconds"], report["p90Microseconds"], report["p99Microseconds"], report["maxMicroseconds"]))
+    print("final tables %s" % report["tableDigest"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the RIP daemon")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    codecParser = subparsers.add_parser("codec", help="packet encode/decode throughput against the legacy functions")
+    codecParser.add_argument("--sizes", default="1,10,%d,1000,5000" % MAX_ENTRIES, help="comma separated table sizes")
+    codecParser.add_argument("--number", type=int, default=200, help="calls per timing repeat")
+    codecParser.add_argument("--json", action="store_true", help="print machine-readable results")
+
+    engineParser = subparsers.add_parser("engine", help="cost of applying a full received vector with the scalar and NumPy routing tables")
+    engineParser.add_argument("--sizes", default="1000,10000", help="comma separated numbers of destinations")
+    engineParser.add_argument("--number", type=int, default=5, help="full vectors per timing repeat")
+    engineParser.add_argument("--batches", type=int, default=500, help="random batches, with destinations repeated within a run, applied to both engines to check they agree")
+    engineParser.add_argument("--json", action="store_true", help="print machine-readable results")
+
+    wireParser = subparsers.add_parser("wire", help="bytes per route and encode/decode cost of the standard, compact and compressed packet formats")
+    wireParser.add_argument("--sizes", default="%d,1000,10000" % MAX_ENTRIES, help="comma separated numbers of routes")
+    wireParser.add_argument("--number", type=int, default=5, help="full tables per timing repeat")
+    wireParser.add_argument("--json", action="store_true", help="print machine-readable results")
+
+    suiteParser = subparsers.add_parser("suite", help="convergence, traffic and CPU cost of generated topologies in the simulator")
+    suiteParser.add_argument("--topologies", default=",".join(sorted(TOPOLOGIES)), help="comma separated topology names")
+    suiteParser.add_argument("--size", type=int, default=50, help="routers per topology")
+    suiteParser.add_argument("--seed", type=int, default=0)
+    suiteParser.add_argument("--max-cost", type=int, default=3, help="link costs are chosen between 1 and this")
+    suiteParser.add_argument("--limit", type=float, default=120, help="simulated seconds to wait for convergence before giving up")
+    suiteParser.add_argument("--steady-time", type=float, default=30, help="simulated seconds of converged traffic to measure")
+    suiteParser.add_argument("--save-configs", help="also write the generated config files under this directory")
+    suiteParser.add_argument("--engine", choices=ENGINES, default="scalar", help="routing table the routers use")
+    suiteParser.add_argument("--adaptive-periodic", action="store_true", help="routers stretch their periodic interval while their tables are stable")
+    suiteParser.add_argument("--no-backup-routes", action="store_true", help="routers wait for new advertisements instead of failing over to backup routes")
+    suiteParser.add_argument("--packet-format", choices=PACKET_FORMATS, default="standard", help="what routers send neighbours which can read compact packets")
+    suiteParser.add_argument("--hello-interval", type=float, default=0, help="seconds between hellos, so a failed router is noticed after 3 missed hellos rather than a timeout")
+    suiteParser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+
+    replayParser = subparsers.add_parser("replay", help="per-packet processing time of a capture written with --capture-file")
+    replayParser.add_argument("capture", help="capture file")
+    replayParser.add_argument("configs", nargs="+", help="config or topology files of the routers the capture was taken from")
+    replayParser.add_argument("--realtime", action="store_true", help="replay at the speed the packets were captured rather than as fast as possible")
+    replayParser.add_argument("--router-path", action="store_true", help="time the router's whole receive path, including the duplicate filter, rather than only the packet checks and updateRoutingTable")
+    replayParser.add_argument("--engine", choices=ENGINES, help="routing table to replay into, default the one each config names")
+    replayParser.add_argument("--times-file", help="write each packet's capture time, input port and processing microseconds to this file")
+    replayParser.add_argument("--json", action="store_true", help="print machine-readable results")
+
+    arguments = parser.parse_args()
+
+    if (arguments.benchmark == "codec"):
+        results = benchmarkCodec([int(size) for size in arguments.sizes.split(",")], arguments.number)
+        if arguments.json:
+            json.dump({"benchmark": "codec", "results": results}, sys.stdout, indent=2)
+            print()
+        else:
+            printCodecResults(results)
+    elif (arguments.benchmark == "engine"):
+        results = benchmarkEngines([int(size) for size in arguments.sizes.split(",")], arguments.number)
+        mismatch = engineDifferential(arguments.batches)
+        if arguments.json:
+            json.dump({"benchmark": "engine", "results": results, "differentialBatches": arguments.batches, "differentialMismatchBatch": mismatch}, sys.stdout, indent=2)
+            print()
+        else:
+            printEngineResults(results)
+            if vectorAvailable:
+                print("random batches with repeated destinations: %s" % ("same for all %d" % arguments.batches if mismatch is None else "MISMATCH after batch %d" % mismatch))
+        if (mismatch is not None):
+            return 1
+    elif (arguments.benchmark == "wire"):
+        results = benchmarkWire([int(size) for size in arguments.sizes.split(",")], arguments.number)
+        bombs = checkCompressionBombs()
+        failed = [count for count, seconds in bombs.items() if seconds is None or seconds > 0.01]#a bomb which was inflated takes seconds to reject
+        if arguments.json:
+            json.dump({"benchmark": "wire", "results": results, "compressionBombSeconds": bombs}, sys.stdout, indent=2)
+            print()
+        else:
+            printWireResults(results)
+            for count, seconds in bombs.items():
+                print("compression bomb with %d entries: %s" % (count, "accepted" if seconds is None else "rejected in %.0fus%s" % (seconds * 1e6, " TOO SLOW" if seconds > 0.01 else "")))
+        if failed:
+            return 1
+    elif (arguments.benchmark == "suite"):
+        report = benchmarkSuite(arguments.topologies.split(","), arguments.size, arguments.seed, arguments.max_cost, arguments.limit, arguments.steady_time, arguments.save_configs, arguments.engine, arguments.adaptive_periodic, not arguments.no_backup_routes, arguments.packet_format, arguments.hello_interval)
+        if (arguments.output is None):
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(arguments.output, "w") as outputFile:
+                json.dump(report, outputFile, indent=2)
+    elif (arguments.benchmark == "replay"):
+        capture = readCapture(arguments.capture)
+        if (capture is None):
+            print("%s is not a capture file" % arguments.capture)
+            return 1
+        configs = []
+        for configurationFile in arguments.configs:
+            fileConfigs = readTopology(configurationFile)
+            if (fileConfigs is None):
+                return 1
+            configs.extend(fileConfigs.values())
+        report, times = replayCapture(capture[1], configs, arguments.router_path, arguments.realtime, arguments.engine)
+        if (arguments.times_file is not None):
+            with open(arguments.times_file, "w") as timesFile:
+                for receivedAt, inputPort, seconds in times:
+                    timesFile.write("%.6f %d %.3f\n" % (receivedAt, inputPort, 1e6 * seconds))
+        if arguments.json:
+            json.dump({"benchmark": "replay", "capture": arguments.capture, "results": report}, sys.stdout, indent=2)
+            print()
+        else:
+            printReplayResults(report)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import struct
+import time
+
+'''
+Packet capture for the RIP daemon, for offline replay.
+
+With capture on, the receive path appends every datagram it receives to a binary log, together
+with the time it arrived and the input port it arrived on. The log goes through a large write
+buffer, so capturing costs one struct pack and two buffered writes per packet.
+
+"python RIPBenchmark.py replay" feeds a capture back through the same checks and routing table
+code and times each packet (see replayCapture there).
+
+File header (16 bytes):
+magic b"RIPC" (4s), format version (B), padding (3x), wall clock time the capture started (d)
+
+Record (12 bytes, followed by the datagram):
+wall clock time the datagram was received (d), input port (H), datagram length (H)
+
+A capture cut short by a crash just ends at the last complete record.
+'''
+
+CAPTURE_MAGIC = b"RIPC"
+CAPTURE_VERSION = 1
+CAPTURE_HEADER = struct.Struct(">4sB3xd")
+CAPTURE_RECORD = struct.Struct(">dHH")
+
+class PacketCapture:#appends received datagrams to a capture file
+
+    def __init__(self, fileName, bufferSize=1 << 20):
+        self.fileName = fileName
+        self.file = open(fileName, "wb", buffering=bufferSize)#datagrams are only written to disk once this much has built up, or on close
+        self.file.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, time.time()))
+        self.packRecord = CAPTURE_RECORD.pack
+        self.packetCount = 0
+
+    def record(self, packet, inputPort, receivedAt):
+        write = self.file.write
+        write(self.packRecord(receivedAt, inputPort, len(packet)))
+        write(packet)
+        self.packetCount = self.packetCount + 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def readCapture(fileName):#returns (time started, list of (time received, input port, datagram)), or None if the file is not a capture
+    with open(fileName, "rb") as captureFile:
+        data = captureFile.read()
+    if (len(data) < CAPTURE_HEADER.size):
+        return None
+    magic, version, startedAt = CAPTURE_HEADER.unpack_from(data, 0)
+    if (magic != CAPTURE_MAGIC or version != CAPTURE_VERSION):
+        return None
+    records = []
+    view = memoryview(data)
+    offset = CAPTURE_HEADER.size
+    recordSize = CAPTURE_RECORD.size
+    while (offset + recordSize <= len(data)):
+        receivedAt, inputPort, length = CAPTURE_RECORD.unpack_from(data, offset)
+        offset = offset + recordSize
+        if (offset + length > len(data)):#the last record was only partly written
+            break
+        records.append((receivedAt, inputPort, view[offset:offset + length]))
+        offset = offset + length
+    return startedAt, records
@@ -0,0 +1,240 @@
+import re
+import struct
+import zlib
+from itertools import accumulate
+
+'''
+Packet encoding and decoding for the RIP daemon.
+
+The layouts are compiled once into struct.Struct objects so a header is read with a single
+unpack call, a whole block of route entries is read in one iter_unpack pass over a memoryview
+of the received buffer, and responses are packed into a buffer that is allocated once and reused.
+
+A routing table that does not fit in one packet is split across several datagrams. Each one
+carries its fragment number and the total number of fragments, and holds complete entries, so a
+receiver can apply every fragment on its own as it arrives.
+
+Header (25 bytes):
+command (B), version (B), router ID (H), periodic stretch (H), must be zero (H),
+fragment number (H), fragment count (H), must be zero (L), must be zero (L),
+metric to the recipient (L), entry count (B)
+
+The periodic stretch field was the unused address family. A sender with an adaptive periodic
+interval puts the multiple of its base interval it will wait before its next full table there.
+Receivers don't stretch their timeouts by it, as the sender keeps two stretched periods within a
+timeout. 0 means the base interval.
+
+Entry (8 bytes):
+destination (H), address (H), first router to destination (H), metric (H)
+
+A triggered update only carries the routes that changed, so it must not stand for any fragment of
+the full table. Every datagram of one is numbered fragment PARTIAL_FRAGMENT of PARTIAL_FRAGMENT + 1,
+which every receiver accepts, and which the routing table recognises so that the update replaces
+only the backup offers it carries rather than superseding a fragment of the last full table.
+
+A hello (command 3) is a header with no entries. Its first must be zero long holds the hold time
+in milliseconds: how long the recipient should wait for the next hello before treating the sender
+as down.
+
+Compact packets (version 3) have the same header, except that the first must be zero field holds
+flags, and a variable length entry block. The block is sorted by destination and holds four
+varints per entry (7 bits a byte, low bits first): the destination minus the previous entry's
+destination, the address and first router to destination as zigzag encoded differences from the
+previous entry's, and the metric. Routers are numbered densely and most routes share a few
+addresses and next hops, so a typical entry takes 4 or 5 bytes rather than 8. With FLAG_COMPRESSED
+the block is also raw deflate compressed. A compact packet is only ever sent when it is smaller
+than the standard packet it replaces, so it never needs more datagrams.
+
+Compact packets go only to neighbours which have said they can read them. A router configured to
+send them follows its requests and full tables to every other neighbour with an empty version 3
+response flagged FLAG_ADVERTISE, which routers without version 3 reject, like any unknown version,
+and which otherwise marks the sender as able to read compact packets. A neighbour which sends
+nothing compact back after a few advertisements is not sent any more until it restarts. Receivers turn compact
+packets back into the standard layout before applying them (expandCompact), so the routing tables
+only ever see one format.
+'''
+
+INFINITY = 16#metric advertised for poisoned routes
+REQUEST_COMMAND = 1#asks a neighbour for its whole table, sent with no entries
+RESPONSE_COMMAND = 2
+HELLO_COMMAND = 3#keepalive sent to every neighbour between full tables, see RIPHello
+RIP_VERSION = 2
+COMPACT_VERSION = 3#version byte of a compact packet
+MAX_PACKET_SIZE = 512
+
+HEADER = struct.Struct(">BBHHHHHLLLB")
+ENTRY = struct.Struct(">HHHH")
+HEADER_SIZE = HEADER.size
+ENTRY_SIZE = ENTRY.size
+MAX_ENTRIES = (MAX_PACKET_SIZE - HEADER_SIZE) // ENTRY_SIZE#number of entries that fit in one packet
+MAX_FRAGMENTS = 0xfffe#a full table's fragments are numbered below PARTIAL_FRAGMENT
+PARTIAL_FRAGMENT = 0xfffe#fragment number of every datagram of a triggered update, sent as fragment PARTIAL_FRAGMENT of PARTIAL_FRAGMENT + 1
+HEADER_METRIC = struct.Struct(">L")#the metric to the recipient, at HEADER_METRIC_OFFSET in the header
+HEADER_METRIC_OFFSET = 20
+HEADER_STRETCH = struct.Struct(">H")#the periodic stretch, at HEADER_STRETCH_OFFSET in the header
+HEADER_STRETCH_OFFSET = 4
+MAX_PERIODIC_STRETCH = 4#largest stretch a sender may use, less when two stretched periods wouldn't fit in its timeout
+ENTRY_METRIC = struct.Struct(">H")#an entry's metric, at ENTRY_METRIC_OFFSET within the entry
+ENTRY_METRIC_OFFSET = 6
+HEADER_FLAGS = struct.Struct(">H")#a compact packet's flags, at HEADER_FLAGS_OFFSET in the header
+HEADER_FLAGS_OFFSET = 6
+FLAG_COMPRESSED = 1#the compact entry block is deflate compressed
+FLAG_ADVERTISE = 2#an empty packet saying the sender can read compact packets, it carries no routes
+MAX_COMPACT_ENTRY_SIZE = 10#three varints of up to 3 bytes and a one byte metric
+PACKET_FORMATS = ("standard", "compact", "compressed")#what a router sends to neighbours which can read compact packets
+MULTIBYTE_VARINT = re.compile(rb"[\x80-\xff]+[\x00-\x7f]")#continuation bytes and the byte ending them
+
+entryBlockStructs = {}#entry count -> Struct packing that many entries in one call
+
+def entryBlockStruct(count):#return a Struct which packs count entries at once, compiled the first time each count is seen
+    blockStruct = entryBlockStructs.get(count)
+    if (blockStruct is None):
+        blockStruct = struct.Struct(">" + "HHHH" * count)
+        entryBlockStructs[count] = blockStruct
+    return blockStruct
+
+def decodeHeader(packet):#unpack the whole header in one call, the packet must be at least HEADER_SIZE bytes
+    return HEADER.unpack_from(packet, 0)
+
+def decodeEntries(packet, count):#iterate over (destination, address, first hop, metric) tuples without copying the packet
+    return ENTRY.iter_unpack(memoryview(packet)[HEADER_SIZE:HEADER_SIZE + count * ENTRY_SIZE])
+
+def encodeRequest(routerID):#a request for the recipient's whole table
+    return HEADER.pack(REQUEST_COMMAND, RIP_VERSION, routerID, 0, 0, 0, 1, 0, 0, 0, 0)
+
+def fragmentCount(routeCount):#number of datagrams needed to carry routeCount entries, an empty table still needs one
+    return max(1, -(-routeCount // MAX_ENTRIES))
+
+class ResponseEncoder:#packs responses into preallocated buffers, one per fragment
+
+    def __init__(self):
+        self.buffers = []#one MAX_PACKET_SIZE bytearray per fragment, grown as the table grows and then reused
+        self.views = []
+
+    def encode(self, routerID, metric, routes, poisonVia=None, stretch=0, partial=False):#pack a response, routes is a sequence of Route objects. Routes whose next hop is poisonVia are sent as unreachable. partial marks a triggered update rather than a full table. Returns one memoryview per datagram, only valid until the next call
+        routeCount = len(routes)
+        fragments = fragmentCount(routeCount)
+        if (fragments > MAX_FRAGMENTS):
+            raise ValueError("%d routes need more than %d fragments" % (routeCount, MAX_FRAGMENTS))
+        while (len(self.buffers) < fragments):
+            self.buffers.append(bytearray(MAX_PACKET_SIZE))
+            self.views.append(memoryview(self.buffers[-1]))
+
+        packets = []
+        for fragment in range(fragments):
+            chunk = routes[fragment * MAX_ENTRIES:(fragment + 1) * MAX_ENTRIES]
+            count = len(chunk)
+            values = []
+            for route in chunk:
+                values += (route.destination, route.address, route.nextHop, INFINITY if route.nextHop == poisonVia else route.metric)
+
+            buffer = self.buffers[fragment]
+            if partial:
+                HEADER.pack_into(buffer, 0, RESPONSE_COMMAND, RIP_VERSION, routerID, stretch, 0, PARTIAL_FRAGMENT, PARTIAL_FRAGMENT + 1, 0, 0, metric, count)
+            else:
+                HEADER.pack_into(buffer, 0, RESPONSE_COMMAND, RIP_VERSION, routerID, stretch, 0, fragment, fragments, 0, 0, metric, count)
+            entryBlockStruct(count).pack_into(buffer, HEADER_SIZE, *values)
+            packets.append(self.views[fragment][:HEADER_SIZE + count * ENTRY_SIZE])#only the bytes in use are sent
+        return packets
+
+class ResponseCache:#full table responses encoded once per table version, then patched for each neighbour
+
+    def __init__(self):
+        self.version = None#table version the templates were built from
+        self.templates = []#one bytes object per fragment holding every route with its real metric
+        self.positions = {}#destination -> index of its entry across all fragments
+
+    def build(self, version, routerID, routes):#encode the whole table once for this table version
+        encoder = ResponseEncoder()
+        self.templates = [bytes(packet) for packet in encoder.encode(routerID, 0, routes)]
+        self.positions = {route.destination: index for index, route in enumerate(routes)}
+        self.version = version
+
+    def packetsFor(self, metric, poisonedDestinations, stretch=0):#copy the templates for one neighbour, setting its header metric and stretch and poisoning the given destinations
+        packets = [bytearray(template) for template in self.templates]
+        for packet in packets:
+            HEADER_METRIC.pack_into(packet, HEADER_METRIC_OFFSET, metric)
+            if stretch:
+                HEADER_STRETCH.pack_into(packet, HEADER_STRETCH_OFFSET, stretch)
+        positions = self.positions
+        for destination in poisonedDestinations:#only the routes learned through this neighbour are touched
+            index = positions.get(destination)
+            if (index is None):#a stale route, which is not advertised
+                continue
+            ENTRY_METRIC.pack_into(packets[index // MAX_ENTRIES], HEADER_SIZE + (index % MAX_ENTRIES) * ENTRY_SIZE + ENTRY_METRIC_OFFSET, INFINITY)
+        return packets
+
+def encodeHello(routerID, holdTime):#a hello telling the recipient to declare this router down if it hears no other within holdTime seconds
+    return HEADER.pack(HELLO_COMMAND, RIP_VERSION, routerID, 0, 0, 0, 1, int(holdTime * 1000), 0, 0, 0)
+
+def encodeAdvertisement(routerID):#an empty compact response telling the recipient this router can read compact packets
+    return HEADER.pack(RESPONSE_COMMAND, COMPACT_VERSION, routerID, 0, FLAG_ADVERTISE, 0, 1, 0, 0, 0, 0)
+
+def compactPacket(packet, compress=False):#re-encode a standard response as a compact packet, returns the packet unchanged if that would not make it smaller
+    count = packet[HEADER_SIZE - 1]
+    block = bytearray()
+    append = block.append
+    previousDestination = previousAddress = previousNextHop = 0
+    for destination, address, nextHop, metric in sorted(ENTRY.iter_unpack(memoryview(packet)[HEADER_SIZE:HEADER_SIZE + count * ENTRY_SIZE])):
+        addressDelta = address - previousAddress
+        nextHopDelta = nextHop - previousNextHop
+        for value in (destination - previousDestination, addressDelta << 1 if addressDelta >= 0 else (-addressDelta << 1) - 1, nextHopDelta << 1 if nextHopDelta >= 0 else (-nextHopDelta << 1) - 1, metric):
+            while (value >= 0x80):
+                append(value & 0x7f | 0x80)
+                value = value >> 7
+            append(value)
+        previousDestination, previousAddress, previousNextHop = destination, address, nextHop
+    flags = 0
+    if compress:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)#raw deflate, the header and checksum of the zlib wrapper would cost 6 bytes a packet
+        compressed = compressor.compress(block) + compressor.flush()
+        if (len(compressed) < len(block)):
+            block = compressed
+            flags = FLAG_COMPRESSED
+    if (HEADER_SIZE + len(block) >= len(packet)):
+        return packet
+    header = bytearray(packet[:HEADER_SIZE])
+    header[1] = COMPACT_VERSION
+    HEADER_FLAGS.pack_into(header, HEADER_FLAGS_OFFSET, flags)
+    return bytes(header + block)
+
+def expandCompact(packet):#turn a compact response back into the standard layout, returns None if its entry block is malformed
+    count = packet[HEADER_SIZE - 1]
+    block = bytes(packet[HEADER_SIZE:])
+    if (HEADER_FLAGS.unpack_from(packet, HEADER_FLAGS_OFFSET)[0] & FLAG_COMPRESSED):
+        if (count == 0):#nothing to inflate, and zlib would read a limit of 0 as no limit at all
+            return None
+        decompressor = zlib.decompressobj(-15)
+        try:
+            block = decompressor.decompress(block, count * MAX_COMPACT_ENTRY_SIZE)#never more than count entries can need, so a small packet can't inflate into a huge one
+        except zlib.error:
+            return None
+        if decompressor.unconsumed_tail:
+            return None
+    if (block and block[-1] >= 0x80):#the last varint was cut off
+        return None
+    varints = []#every varint in the block. Most are one byte, which are copied across a run at a time
+    position = 0
+    for match in MULTIBYTE_VARINT.finditer(block):
+        start, end = match.span()
+        varints.extend(block[position:start])
+        value = 0
+        for shift, byte in enumerate(block[start:end]):
+            value = value | (byte & 0x7f) << (7 * shift)
+        varints.append(value)
+        position = end
+    varints.extend(block[position:])
+    if (len(varints) != count * 4):#the block holds the wrong number of entries
+        return None
+    varints[0::4] = accumulate(varints[0::4])#the differences are turned back into values in place, one field at a time
+    varints[1::4] = accumulate((delta >> 1) ^ -(delta & 1) for delta in varints[1::4])#undoing the zigzag encoding first
+    varints[2::4] = accumulate((delta >> 1) ^ -(delta & 1) for delta in varints[2::4])
+    expanded = bytearray(HEADER_SIZE + count * ENTRY_SIZE)
+    expanded[:HEADER_SIZE] = packet[:HEADER_SIZE]
+    expanded[1] = RIP_VERSION
+    HEADER_FLAGS.pack_into(expanded, HEADER_FLAGS_OFFSET, 0)
+    try:
+        entryBlockStruct(count).pack_into(expanded, HEADER_SIZE, *varints)
+    except struct.error:#a value outside 0 to 65535
+        return None
+    return expanded
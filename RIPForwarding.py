@@ -0,0 +1,186 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+
+from RIPCodec import INFINITY
+
+'''
+Shared memory export of a router's forwarding table.
+
+The daemon publishes its routes into a memory-mapped file, normally on /dev/shm, with one fixed
+size record per possible destination router ID. Other processes on the host map the same file
+and look next hops up directly in it: a lookup is a struct.unpack_from on the shared buffer, with
+no copy of the table, no lock and no system call.
+
+Consistency uses a seqlock. The writer makes the sequence number odd before it changes any
+record and even again afterwards. A reader notes the sequence number, reads the records it
+wants, and reads the sequence number again. If it was odd or has moved, the writer was busy and
+the reader tries again. The writer is the daemon's single thread, so it never waits for readers.
+
+Header (32 bytes):
+magic b"RIPF" (4s), format version (B), padding (x), router ID (H), sequence number (Q),
+record count (L), routes present (L), time of the last publish (d)
+
+Record (12 bytes, record N describes destination N):
+destination (H), next hop (H), metric (B), flags (B), padding (2x), generation (L)
+
+flags is FLAG_PRESENT for a route in the table, plus FLAG_STALE while it is an unconfirmed route
+from a warm restart snapshot. generation is the publish number in which the record last changed.
+
+Reader usage:
+python RIPForwarding.py /dev/shm/rip-fib-1 [destination ...]
+'''
+
+FIB_MAGIC = b"RIPF"
+FIB_VERSION = 1
+FIB_HEADER = struct.Struct("=4sBxHQLLd")#native byte order, the file never leaves the host
+FIB_SEQUENCE = struct.Struct("=Q")
+FIB_SEQUENCE_OFFSET = 8
+FIB_RECORD = struct.Struct("=HHBBxxL")
+FIB_RECORDS = 64001#router IDs are 1 to 64000
+FLAG_PRESENT = 1
+FLAG_STALE = 2
+
+def defaultExportPath(routerID):#/dev/shm where it exists, so the file lives in memory, otherwise the temporary directory
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "rip-fib-%d" % routerID)
+
+class ForwardingTableExport:#keeps a shared memory copy of a routing table's next hops up to date
+
+    def __init__(self, routingTable, fileName, scheduler):
+        self.routingTable = routingTable
+        self.fileName = fileName
+        self.scheduler = scheduler
+        self.sequence = 0
+        self.pending = set()#destinations changed since the last publish
+        self.timer = None
+        self.publishCount = 0
+
+        size = FIB_HEADER.size + FIB_RECORDS * FIB_RECORD.size
+        self.file = open(fileName, "w+b")
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        FIB_HEADER.pack_into(self.map, 0, FIB_MAGIC, FIB_VERSION, routingTable.routerID, 0, FIB_RECORDS, 0, time.time())
+
+        routingTable.onRouteChanged = self.routeChanged
+        self.pending.update(route.destination for route in routingTable)#routes that existed before the export was attached
+        self.publish()
+
+    def routeChanged(self, destination):#called by the routing table, publishing waits until the current batch of changes is done
+        self.pending.add(destination)
+        if (self.timer is None):
+            self.timer = self.scheduler.schedule(0, "export", self.publish)
+
+    def publish(self):#write every pending record inside one odd/even sequence window
+        self.timer = None
+        if not self.pending:
+            return
+        exportMap = self.map
+        routes = self.routingTable.routes
+        staleDestinations = self.routingTable.staleDestinations
+        self.sequence = self.sequence + 1
+        FIB_SEQUENCE.pack_into(exportMap, FIB_SEQUENCE_OFFSET, self.sequence)#odd, readers retry until it is even again
+        generation = self.publishCount + 1
+        for destination in self.pending:
+            if (destination >= FIB_RECORDS):
+                continue
+            route = routes.get(destination)
+            offset = FIB_HEADER.size + destination * FIB_RECORD.size
+            if (route is None):
+                FIB_RECORD.pack_into(exportMap, offset, destination, 0, INFINITY, 0, generation)
+            else:
+                flags = FLAG_PRESENT | (FLAG_STALE if destination in staleDestinations else 0)
+                FIB_RECORD.pack_into(exportMap, offset, destination, route.nextHop, route.metric, flags, generation)
+        self.pending.clear()
+        self.sequence = self.sequence + 1
+        FIB_HEADER.pack_into(exportMap, 0, FIB_MAGIC, FIB_VERSION, self.routingTable.routerID, self.sequence, FIB_RECORDS, len(routes), time.time())#even again
+        self.publishCount = generation
+
+    def close(self, remove=True):
+        self.scheduler.cancel(self.timer)
+        if (self.routingTable.onRouteChanged == self.routeChanged):
+            self.routingTable.onRouteChanged = None
+        self.map.close()
+        self.file.close()
+        if remove:
+            os.remove(self.fileName)
+
+class ForwardingTableReader:#lock-free lookups in a forwarding table exported by a running daemon
+
+    def __init__(self, fileName, retries=1000):
+        self.file = open(fileName, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        self.retries = retries#reads attempted before giving up on a writer which seems stuck
+        magic, version, self.routerID, sequence, self.recordCount, routeCount, publishedAt = FIB_HEADER.unpack_from(self.view, 0)
+        if (magic != FIB_MAGIC or version != FIB_VERSION):
+            self.close()
+            raise ValueError("%s is not a forwarding table export" % fileName)
+
+    def read(self, function):#run function on the shared buffer inside the seqlock, retrying until it saw a consistent table
+        view = self.view
+        for attempt in range(self.retries):
+            before = FIB_SEQUENCE.unpack_from(view, FIB_SEQUENCE_OFFSET)[0]
+            if (before & 1):#the writer is part way through a publish
+                continue
+            result = function(view)
+            if (FIB_SEQUENCE.unpack_from(view, FIB_SEQUENCE_OFFSET)[0] == before):
+                return result
+        raise RuntimeError("forwarding table kept changing during %d reads" % self.retries)
+
+    def lookupMany(self, destinations):#(next hop, metric) for each destination, or None where there is no usable route, all from the same publish
+        recordCount = self.recordCount
+        headerSize = FIB_HEADER.size
+        recordSize = FIB_RECORD.size
+        unpackRecord = FIB_RECORD.unpack_from
+
+        def lookupAll(view):
+            results = []
+            for destination in destinations:
+                if (destination < 0 or destination >= recordCount):
+                    results.append(None)
+                    continue
+                recordDestination, nextHop, metric, flags, generation = unpackRecord(view, headerSize + destination * recordSize)
+                results.append((nextHop, metric) if (flags & FLAG_PRESENT and metric < INFINITY) else None)
+            return results
+        return self.read(lookupAll)
+
+    def lookup(self, destination):#(next hop, metric) for one destination, or None
+        return self.lookupMany((destination,))[0]
+
+    def routes(self):#every present record as (destination, next hop, metric, flags, generation)
+        recordCount = self.recordCount
+        def readAll(view):
+            return [record for record in FIB_RECORD.iter_unpack(view[FIB_HEADER.size:FIB_HEADER.size + recordCount * FIB_RECORD.size]) if record[3] & FLAG_PRESENT]
+        return self.read(readAll)
+
+    def sequence(self):
+        return FIB_SEQUENCE.unpack_from(self.view, FIB_SEQUENCE_OFFSET)[0]
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+def main():
+    if (len(sys.argv) < 2):
+        print("Usage: python RIPForwarding.py /dev/shm/rip-fib-<routerID> [destination ...]")
+        return 1
+    reader = ForwardingTableReader(sys.argv[1])
+    try:
+        if (len(sys.argv) > 2):
+            destinations = [int(destination) for destination in sys.argv[2:]]
+            for destination, result in zip(destinations, reader.lookupMany(destinations)):
+                print(destination, "unreachable" if result is None else "via %d metric %d" % result)
+        else:
+            for destination, nextHop, metric, flags, generation in reader.routes():
+                print(destination, nextHop, metric, "stale" if flags & FLAG_STALE else "", generation)
+    finally:
+        reader.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
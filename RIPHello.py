@@ -0,0 +1,97 @@
+from RIPCodec import encodeHello
+
+'''
+Hello protocol for the RIP daemon.
+
+Without hellos a dead neighbour is only noticed when the routes through it time out, timeoutValue
+seconds after its last update. A router with helloInterval set sends every neighbour a 25 byte
+hello that often, carrying a hold time of helloInterval * helloMultiplier. A router which hears
+hellos from a neighbour expects the next one within that hold time. When it misses, the neighbour
+is declared down at once: every route through it is poisoned, or failed over to a feasible backup,
+and a triggered update goes out. Hearing a hello again brings the neighbour back, and it is asked
+for its whole table so its routes return without waiting for its next periodic update.
+
+Hold timers are lazy, like route timeouts (see RIPRouteExpiry). A hello only moves the time the
+neighbour was last heard. When the timer fires early it is put back at the new deadline, so a
+hello costs no work in the scheduler heap.
+
+Neighbours which send no hellos are left to the ordinary timeouts, and routers without the hello
+command reject hellos like any unknown command, so hellos can be turned on one router at a time.
+'''
+
+class HelloProtocol:#hellos sent to a router's neighbours, and hold timers for the neighbours which send them
+
+    def __init__(self, routingTable, scheduler, sendHello, neighbourLost, neighbourBack, rng, interval=0, multiplier=3):
+        self.routingTable = routingTable
+        self.scheduler = scheduler
+        self.sendHello = sendHello#function taking (packet, port) which sends a hello to a neighbour's input port
+        self.neighbourLost = neighbourLost#called with a neighbour ID whose hold time ran out
+        self.neighbourBack = neighbourBack#called with a neighbour ID heard from again after it was declared down
+        self.random = rng
+        self.interval = interval#seconds between the hellos this router sends, 0 sends none
+        self.multiplier = multiplier#hellos a neighbour may miss before it declares this router down
+        self.heardAt = {}#neighbour ID -> time its last hello arrived
+        self.holdTimes = {}#neighbour ID -> hold time its last hello asked for
+        self.holdTimers = {}#neighbour ID -> pending hold timer
+        self.down = set()#neighbours declared down which haven't sent a hello since
+        self.helloTimer = None
+        self.lostCount = 0
+        self.scheduleHello()
+
+    def configure(self, interval, multiplier):#apply a reloaded hello interval and multiplier
+        if (interval == self.interval and multiplier == self.multiplier):
+            return
+        self.interval = interval
+        self.multiplier = multiplier
+        self.scheduler.cancel(self.helloTimer)
+        self.helloTimer = None
+        self.scheduleHello()
+
+    def scheduleHello(self):#a little early rather than late, so a neighbour never sees a gap longer than the interval
+        if (self.interval > 0):
+            self.helloTimer = self.scheduler.schedule(self.interval * self.random.uniform(0.75, 1.0), "hello", self.sendHellos)
+
+    def sendHellos(self):
+        hello = encodeHello(self.routingTable.routerID, self.interval * self.multiplier)
+        for port in self.routingTable.neighbourPorts.values():
+            self.sendHello(hello, port)
+        self.scheduleHello()
+
+    def helloHeard(self, neighbourID, holdTime):#a hello arrived from a neighbour, asking to be declared down if the next takes longer than holdTime seconds
+        if neighbourID not in self.routingTable.linkCosts:#only neighbours from the config file are tracked
+            return
+        self.heardAt[neighbourID] = self.scheduler.clock()
+        self.holdTimes[neighbourID] = holdTime
+        if (neighbourID not in self.holdTimers):
+            self.armHold(neighbourID)
+        if neighbourID in self.down:
+            self.down.discard(neighbourID)
+            self.neighbourBack(neighbourID)
+
+    def armHold(self, neighbourID):
+        self.holdTimers[neighbourID] = self.scheduler.scheduleAt(self.heardAt[neighbourID] + self.holdTimes[neighbourID], "hold", lambda: self.holdDue(neighbourID))
+
+    def holdDue(self, neighbourID):
+        del self.holdTimers[neighbourID]
+        if neighbourID not in self.routingTable.linkCosts:#removed from the config since
+            self.forget(neighbourID)
+            return
+        if (self.heardAt[neighbourID] + self.holdTimes[neighbourID] > self.scheduler.clock()):#heard since the timer was set
+            self.armHold(neighbourID)
+            return
+        self.down.add(neighbourID)
+        self.lostCount = self.lostCount + 1
+        self.neighbourLost(neighbourID)
+
+    def forget(self, neighbourID):#drop everything known about a neighbour, e.g. after it was removed from the config
+        self.scheduler.cancel(self.holdTimers.pop(neighbourID, None))
+        self.heardAt.pop(neighbourID, None)
+        self.holdTimes.pop(neighbourID, None)
+        self.down.discard(neighbourID)
+
+    def stop(self):
+        self.scheduler.cancel(self.helloTimer)
+        self.helloTimer = None
+        for timer in self.holdTimers.values():
+            self.scheduler.cancel(timer)
+        self.holdTimers = {}
@@ -0,0 +1,199 @@
+import bisect
+import json
+import logging
+import os
+import socket
+
+'''
+Metrics for the RIP daemon.
+
+A MetricsRegistry holds counters, gauges and latency histograms. Updating one is an attribute
+increment on a preallocated object, so they can stay on the hot path. Values that are already
+kept elsewhere, such as the routing table size, are read by collector functions only when a
+snapshot is taken.
+
+Snapshots are plain dictionaries which can be dumped to a JSON file on a timer
+(MetricsFileExporter) or returned over a local UDP control socket (MetricsControlSocket). Any
+datagram sent to the control port is answered with the current snapshot as JSON. A daemon hosting
+many routers also answers "metrics <routerID>" with that router's snapshot alone. A snapshot too
+big for one datagram is answered with an error naming the routers to ask for one at a time.
+'''
+
+MAX_REPLY_SIZE = 65507#the largest UDP payload over IPv4
+LATENCY_BUCKETS = [0.000001 * 2 ** power for power in range(21)]#upper bounds in seconds, 1us up to about 1s
+
+class Counter:#a value that only goes up
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value = self.value + amount
+
+class Gauge:#a value that is set to the latest reading
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:#counts of observations falling into each bucket, with their total
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds#upper bound of each bucket, one more bucket catches everything above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count = self.count + 1
+        self.sum = self.sum + value
+
+    def quantile(self, fraction):#upper bound of the bucket holding the given fraction of observations
+        if (self.count == 0):
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for index, bucketCount in enumerate(self.counts):
+            seen = seen + bucketCount
+            if (seen >= wanted):
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": {("%g" % bound): bucketCount for bound, bucketCount in zip(self.bounds + [float("inf")], self.counts) if bucketCount},
+        }
+
+def metricName(name, labels):#counter name with its labels, e.g. packetsRejected{reason=version}
+    if not labels:
+        return name
+    return "%s{%s}" % (name, ",".join("%s=%s" % (key, labels[key]) for key in sorted(labels)))
+
+class MetricsRegistry:#the counters, gauges and histograms of one router
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.collectors = []#functions called with each snapshot to add values kept elsewhere to it
+
+    def counter(self, name, **labels):#return the named counter, creating it the first time
+        fullName = metricName(name, labels)
+        counter = self.counters.get(fullName)
+        if (counter is None):
+            counter = self.counters[fullName] = Counter()
+        return counter
+
+    def gauge(self, name, **labels):
+        fullName = metricName(name, labels)
+        gauge = self.gauges.get(fullName)
+        if (gauge is None):
+            gauge = self.gauges[fullName] = Gauge()
+        return gauge
+
+    def histogram(self, name, bounds=LATENCY_BUCKETS, **labels):
+        fullName = metricName(name, labels)
+        histogram = self.histograms.get(fullName)
+        if (histogram is None):
+            histogram = self.histograms[fullName] = Histogram(bounds)
+        return histogram
+
+    def addCollector(self, collector):
+        self.collectors.append(collector)
+
+    def snapshot(self):#every metric as a dictionary which can be dumped as JSON
+        snapshot = {
+            "counters": {name: counter.value for name, counter in self.counters.items()},
+            "gauges": {name: gauge.value for name, gauge in self.gauges.items()},
+            "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+        }
+        for collector in self.collectors:
+            collector(snapshot)
+        return snapshot
+
+class MetricsFileExporter:#writes a JSON snapshot to a file on a timer
+
+    def __init__(self, snapshot, fileName, interval, scheduler):
+        self.snapshot = snapshot#function returning the dictionary to write
+        self.fileName = fileName
+        self.interval = interval
+        self.scheduler = scheduler
+        self.timer = None
+        self.scheduleDump()
+
+    def scheduleDump(self):
+        self.timer = self.scheduler.schedule(self.interval, "metrics", self.dump)
+
+    def dump(self):#write to a temporary file and rename it, so readers never see a half written file
+        temporaryName = self.fileName + ".tmp"
+        with open(temporaryName, "w") as metricsFile:
+            json.dump(self.snapshot(), metricsFile, indent=2)
+        os.replace(temporaryName, self.fileName)
+        self.scheduleDump()
+
+    def stop(self):
+        self.scheduler.cancel(self.timer)
+
+class MetricsControlSocket:#answers any datagram sent to a local UDP port with the current snapshot
+
+    def __init__(self, snapshot, port, host="127.0.0.1", routerSnapshot=None):
+        self.snapshot = snapshot
+        self.routerSnapshot = routerSnapshot#function returning one router's snapshot, or None for an unknown router ID. None when the daemon runs one router
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.socket.setblocking(0)
+        self.logger = logging.getLogger("RIP.metrics")
+
+    def handle(self):#call when select reports the socket readable
+        try:
+            request, address = self.socket.recvfrom(512)
+        except OSError:
+            return
+        reply = self.reply(request.split())
+        try:
+            self.socket.sendto(reply, address)
+        except OSError as error:#the requester has gone away
+            self.logger.warning("Could not send metrics to %s: %s", address, error)
+
+    def reply(self, words):#the JSON reply to a request split into words
+        if (len(words) > 1 and self.routerSnapshot is not None):
+            try:
+                routerID = int(words[1])
+            except ValueError:
+                return json.dumps({"error": "router ID %r is not a number" % words[1].decode(errors="replace")}).encode()
+            snapshot = self.routerSnapshot(routerID)
+            if (snapshot is None):
+                return json.dumps({"error": "no router %d here" % routerID}).encode()
+        else:
+            snapshot = self.snapshot()
+        reply = json.dumps(snapshot).encode()
+        if (len(reply) > MAX_REPLY_SIZE):
+            self.logger.warning("Metrics snapshot of %d bytes is too big for one datagram, answering with the router IDs to ask for instead", len(reply))
+            reply = json.dumps({"error": "snapshot of %d bytes is too big for one datagram, ask for one router with 'metrics <routerID>'" % len(reply), "routers": sorted(snapshot.get("routers", ()))}).encode()
+        return reply
+
+    def close(self):
+        self.socket.close()
+
+def queryMetrics(port, host="127.0.0.1", timeout=1.0, routerID=None):#ask a running daemon's control socket for its metrics, or for one of its routers' metrics
+    querySocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        querySocket.settimeout(timeout)
+        querySocket.sendto(b"metrics" if routerID is None else b"metrics %d" % routerID, (host, port))
+        reply, address = querySocket.recvfrom(65535)
+        return json.loads(reply)
+    finally:
+        querySocket.close()
@@ -0,0 +1,209 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import selectors
+import signal
+import socket
+import sys
+
+from RIPCapture import PacketCapture
+from RIPForwarding import ForwardingTableExport
+from RIPMetrics import MetricsControlSocket
+from RIPReceive import ReceiveStage
+from RIPSend import SendStage
+from RIPServerCode import RIPRouter, readTopology
+from RIPSnapshot import RouteSnapshot, loadSnapshot
+from RIPTimers import TimerScheduler
+
+'''
+Multi-instance RIP daemon.
+
+One daemon hosts every router of one or more config or topology files. The routers are sharded
+across a pool of worker processes, so the interpreter and startup cost is paid once per worker
+rather than once per router, and the work spreads across cores. Inside a worker every router has
+its own routing table, timers and sockets, but all of them share one TimerScheduler and one
+selectors poller, so the worker sleeps until any of its routers has a packet or a deadline. They
+also share one SendStage, which keeps a queue per router and neighbour port, so two routers
+sending to the same port never mix their packets. Every router limits how fast each of its
+neighbours may send (see IngressLimiter in RIPReceive.py), and due timers run before each batch
+of packets, for at most --timer-budget seconds, so a flooded router keeps its timers.
+
+Each worker can answer metrics queries for all its routers on its own control port (base port +
+worker number), or for one router when the query is "metrics <routerID>", as a worker with more
+than about 70 routers can't fit them all in one reply. It can also keep a snapshot file per
+router for warm restarts, and publish each router's forwarding table in shared memory for local
+readers (see RIPForwarding.py). With
+--capture-dir each worker logs every datagram its routers receive to worker<N>.ripcap, which
+RIPBenchmark.py replay can feed back through the routers of the same topology file.
+
+Usage:
+python RIPMultiDaemon.py topology.txt [--workers 4] [--snapshot-dir snapshots/] [--control-port 9000] [--fib-dir /dev/shm]
+'''
+
+def shardConfigs(configs, workers):#split the configs into one list per worker, dealt out in router ID order so shards are even
+    shards = [[] for worker in range(min(workers, len(configs)))]
+    for index, config in enumerate(sorted(configs, key=lambda config: config.routerID)):
+        shards[index % len(shards)].append(config)
+    return shards
+
+class RouterWorker:#the routers of one shard, their sockets, and the loop which drives them
+
+    def __init__(self, configs, workerID=0, host="127.0.0.1", snapshotDirectory=None, controlPort=None, fibDirectory=None, captureDirectory=None, ingressLimit=None, timerBudget=None):
+        self.workerID = workerID
+        self.host = host
+        self.scheduler = TimerScheduler()
+        self.receiveStage = ReceiveStage()
+        self.selector = selectors.DefaultSelector()#epoll or kqueue where available, so a worker can hold more sockets than select allows
+        self.sendStage = SendStage(host, selector=self.selector)#neighbour sockets are only registered while they have a backlog
+        self.routers = {}#router ID -> RIPRouter
+        self.snapshots = []
+        self.forwardingExports = []
+        self.fibDirectory = fibDirectory#where each router's forwarding table is exported, None for no export
+        self.ingressLimit = ingressLimit#(packets per second, burst) each router allows every neighbour, either of which may be None to follow the table size. None for no limit
+        self.timerBudget = timerBudget#seconds of timer work each pass of the loop, None to run every due timer
+        self.logger = logging.getLogger("RIP.worker%d" % workerID)
+
+        for config in configs:
+            self.addRouter(config, snapshotDirectory)
+
+        if (captureDirectory is not None):
+            self.receiveStage.capture = PacketCapture(os.path.join(captureDirectory, "worker%d.ripcap" % workerID))
+        self.controlSocket = None
+        if (controlPort is not None):
+            self.controlSocket = MetricsControlSocket(self.metricsSnapshot, controlPort, host, self.routerSnapshot)
+            self.selector.register(self.controlSocket.socket, selectors.EVENT_READ)
+
+    def addRouter(self, config, snapshotDirectory=None):
+        router = RIPRouter(config, self.scheduler, lambda packet, port, kind: self.sendStage.send(packet, port, kind, config.routerID))
+        if (self.ingressLimit is not None):
+            router.limitIngress(*self.ingressLimit)
+        for inputPort in config.inputPorts:
+            inputSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            inputSocket.bind((self.host, inputPort))
+            inputSocket.setblocking(0)
+            self.receiveStage.addSocket(inputSocket, router)
+            self.selector.register(inputSocket, selectors.EVENT_READ)
+
+        if (snapshotDirectory is not None):
+            snapshotFile = os.path.join(snapshotDirectory, "router%d.snapshot" % config.routerID)
+            router.warmStart(loadSnapshot(snapshotFile, config.routerID, config.timeoutValue))
+            self.snapshots.append(RouteSnapshot(snapshotFile, router.routingTable, self.scheduler, config.periodicValue))
+        if (self.fibDirectory is not None):
+            self.forwardingExports.append(ForwardingTableExport(router.routingTable, os.path.join(self.fibDirectory, "rip-fib-%d" % config.routerID), self.scheduler))
+        self.routers[config.routerID] = router
+        return router
+
+    def metricsSnapshot(self):#every router's metrics, keyed by router ID
+        sendStage = self.sendStage
+        return {"worker": self.workerID, "pid": os.getpid(), "routers": {routerID: router.metrics.snapshot() for routerID, router in self.routers.items()},
+            "send": {"sent": sendStage.sentCount, "queued": sendStage.queuedCount(), "droppedQueueFull": sendStage.droppedCount, "superseded": sendStage.supersededCount, "errors": sendStage.errorCount}}
+
+    def routerSnapshot(self, routerID):#one router's metrics, in the same layout, or None if this worker doesn't run it
+        router = self.routers.get(routerID)
+        if (router is None):
+            return None
+        return {"worker": self.workerID, "pid": os.getpid(), "routers": {routerID: router.metrics.snapshot()}}
+
+    def run(self):#serve the routers until interrupted
+        selector = self.selector
+        scheduler = self.scheduler
+        receiveStage = self.receiveStage
+        sendStage = self.sendStage
+        controlSocket = self.controlSocket.socket if self.controlSocket is not None else None
+        timerBudget = self.timerBudget
+        self.logger.info("Running %d routers: %s", len(self.routers), sorted(self.routers))
+        try:
+            while(1):
+                readyEvents = selector.select(scheduler.timeUntilNext())
+                scheduler.runDue(timerBudget)#timers go first, so routers flooded with packets still send their updates and time out their routes
+                readySockets = [key.fileobj for key, events in readyEvents if events & selectors.EVENT_READ]
+                sendStage.flushReady([key.fileobj for key, events in readyEvents if events & selectors.EVENT_WRITE])#neighbours whose socket was full
+                receiveStage.drain(readySockets)#every router with packets waiting gets them as one batch
+                if (controlSocket is not None and controlSocket in readySockets):
+                    self.controlSocket.handle()
+        finally:
+            self.close()
+
+    def close(self):
+        for snapshot in self.snapshots:
+            snapshot.close()
+        self.snapshots = []
+        for forwardingExport in self.forwardingExports:
+            forwardingExport.close()
+        self.forwardingExports = []
+        for inputSocket in list(self.receiveStage.sockets):
+            self.receiveStage.removeSocket(inputSocket)
+            inputSocket.close()
+        if (self.receiveStage.capture is not None):
+            self.receiveStage.capture.close()
+            self.receiveStage.capture = None
+        if (self.controlSocket is not None):
+            self.controlSocket.close()
+        self.sendStage.close()
+        self.selector.close()
+
+def runWorker(configs, workerID, host, snapshotDirectory, controlPort, fibDirectory, captureDirectory, ingressLimit, timerBudget, logLevel):#entry point of each worker process
+    logging.basicConfig(level=logLevel, format="%(asctime)s %(name)s %(message)s")
+    signal.signal(signal.SIGTERM, lambda signalNumber, frame: sys.exit(0))#leave through run's finally, so snapshots are written
+    try:
+        RouterWorker(configs, workerID, host, snapshotDirectory, controlPort, fibDirectory, captureDirectory, ingressLimit, timerBudget).run()
+    except KeyboardInterrupt:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many RIP routers in one daemon, sharded across worker processes")
+    parser.add_argument("configs", nargs="+", help="router config files or topology files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes, default one per CPU")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--snapshot-dir", help="keep a snapshot file per router in this directory and warm start from it")
+    parser.add_argument("--control-port", type=int, help="worker N answers metrics queries on this port + N")
+    parser.add_argument("--fib-dir", help="export each router's forwarding table to rip-fib-<routerID> in this directory")
+    parser.add_argument("--capture-dir", help="each worker appends every datagram it receives to worker<N>.ripcap in this directory")
+    parser.add_argument("--ingress-rate", type=float, help="packets per second each router accepts from each neighbour before the excess is dropped, 0 for no limit. Default 4 full tables of the router's size per period, at least 100")
+    parser.add_argument("--ingress-burst", type=int, help="packets a neighbour may send at once above the ingress rate. Default 2 full tables of the router's size, at least 500")
+    parser.add_argument("--timer-budget", type=float, default=0.05, help="seconds of timer work each pass of a worker's loop runs before it receives more packets, 0 for no limit")
+    parser.add_argument("--log-level", default="WARNING")
+    arguments = parser.parse_args()
+    logging.basicConfig(level=arguments.log_level.upper(), format="%(asctime)s %(name)s %(message)s")
+
+    configs = {}
+    for configurationFile in arguments.configs:
+        fileConfigs = readTopology(configurationFile)
+        if (fileConfigs is None):
+            return 1
+        for routerID, config in fileConfigs.items():
+            if routerID in configs:
+                print("Router %d is defined in more than one file" % routerID)
+                return 1
+            configs[routerID] = config
+    for directory in (arguments.snapshot_dir, arguments.capture_dir):
+        if (directory is not None):
+            os.makedirs(directory, exist_ok=True)
+
+    ingressLimit = (arguments.ingress_rate, arguments.ingress_burst) if arguments.ingress_rate != 0 else None#None in the pair follows the table size
+    timerBudget = arguments.timer_budget if arguments.timer_budget > 0 else None
+    workers = []
+    for workerID, shard in enumerate(shardConfigs(list(configs.values()), max(1, arguments.workers))):
+        controlPort = arguments.control_port + workerID if arguments.control_port is not None else None
+        worker = multiprocessing.Process(target=runWorker, args=(shard, workerID, arguments.host, arguments.snapshot_dir, controlPort, arguments.fib_dir, arguments.capture_dir, ingressLimit, timerBudget, arguments.log_level.upper()), name="RIP-worker%d" % workerID)
+        worker.start()
+        workers.append(worker)
+    print("Running %d routers in %d workers" % (len(configs), len(workers)))
+
+    signal.signal(signal.SIGTERM, lambda signalNumber, frame: sys.exit(0))
+    try:
+        for worker in workers:
+            worker.join()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import hashlib
+import struct
+import time
+
+from RIPCodec import HEADER_SIZE, INFINITY, MAX_ENTRIES, decodeEntries
+
+'''
+Batched receive path for the RIP daemon.
+
+When select reports sockets ready, every ready socket is drained with recvfrom_into into a pool of
+buffers allocated once at startup, until it would block or the pool is full. The packets are then
+handed to each router as one batch, so a burst of updates costs one triggered update rather than
+one per packet. With a PacketCapture attached every packet is also logged, with the port it
+arrived on, for replaying later.
+
+Once the network has converged, neighbours send byte-identical responses every period. The
+DuplicateFilter remembers a digest of the last packet accepted for each neighbour and fragment,
+together with the routes it refreshed. An identical packet arriving while the routing table is
+unchanged skips the packet checks and the update entirely and only moves those routes' timers,
+and the time the fragment was heard, which keeps the backup offers it made current.
+A packet is only remembered if applying it again would change nothing, so the cheap path always
+gives the same table as the full one.
+
+A neighbour which floods a port can't starve the others. The receive pool is shared out between
+the ready sockets on each pass, and an IngressLimiter in front of the packet checks gives every
+neighbour, keyed on the router ID in the packet header, a token bucket. Packets over a
+neighbour's rate are dropped before any other work is done on them and counted against that
+neighbour. Router IDs which aren't neighbours share one bucket, so spoofed IDs can't create
+buckets without limit. Unless they are set, the rate and bucket size follow the routing table,
+as a neighbour's full table is about as long as this router's: the rate allows INGRESS_HEADROOM
+such tables every shortest jittered period, and the bucket holds two, so a large table is never
+throttled just for being large.
+'''
+
+DUPLICATE_KEY = struct.Struct(">2xH4xH")#sender router ID and fragment number from a packet header
+SENDER_KEY = struct.Struct(">2xH")#sender router ID from a packet header
+INGRESS_HEADROOM = 4#full tables per period a neighbour's rate allows when it follows the table, leaving room for triggered updates and answers to requests
+MIN_INGRESS_RATE = 100#packets per second a rate which follows the table never falls below
+MIN_INGRESS_BURST = 500#packets a bucket which follows the table never holds fewer of
+
+class ReceiveStage:#the sockets a poller watches, the router each belongs to, and the buffers packets are received into
+
+    def __init__(self, batchSize=64, bufferSize=4096):
+        self.buffers = [bytearray(bufferSize) for slot in range(batchSize)]#reused for every batch
+        self.views = [memoryview(buffer) for buffer in self.buffers]
+        self.socketRouters = {}#socket -> RIPRouter the socket's packets go to
+        self.socketPorts = {}#socket -> the local port it is bound to, recorded in captures
+        self.sockets = []#sockets to pass to select
+        self.batchCount = 0
+        self.packetCount = 0
+        self.capture = None#PacketCapture every received packet is written to, or None
+
+    def addSocket(self, inputSocket, router):
+        self.socketRouters[inputSocket] = router
+        self.socketPorts[inputSocket] = inputSocket.getsockname()[1]
+        self.sockets.append(inputSocket)
+
+    def removeSocket(self, inputSocket):
+        if inputSocket in self.socketRouters:
+            del self.socketRouters[inputSocket]
+            del self.socketPorts[inputSocket]
+            self.sockets.remove(inputSocket)
+
+    def drain(self, readySockets):#receive everything waiting on the ready sockets and apply it, returns the number of packets received
+        batchSize = len(self.buffers)
+        batches = {}#router -> list of (packet, address) received for it in this batch
+        slot = 0
+        capture = self.capture
+        receivedAt = time.time() if capture is not None else 0.0#one timestamp for the whole batch keeps capturing cheap
+        active = [inputSocket for inputSocket in readySockets if inputSocket in self.socketRouters]
+        while (active and slot < batchSize):#a full pool leaves the rest in the socket buffers, select will report them straight away
+            share = max(1, (batchSize - slot) // len(active))#the pool is shared out between the sockets, so one flooded port can't fill it alone
+            stillReady = []
+            for inputSocket in active:
+                router = self.socketRouters[inputSocket]
+                batch = batches.setdefault(router, [])
+                limit = min(batchSize, slot + share)
+                while (slot < limit):
+                    try:
+                        byteCount, address = inputSocket.recvfrom_into(self.buffers[slot])
+                    except OSError:#nothing more waiting on this socket, or an error reported for an earlier send
+                        break
+                    batch.append((self.views[slot][:byteCount], address))
+                    if (capture is not None):
+                        capture.record(batch[-1][0], self.socketPorts[inputSocket], receivedAt)
+                    slot = slot + 1
+                else:#took its whole share, so there may be more waiting
+                    stillReady.append(inputSocket)
+            active = stillReady
+
+        for router, batch in batches.items():#packets are views of the pool, so they are applied before the next drain reuses it
+            if batch:
+                router.receiveBatch(batch)
+        if (slot > 0):
+            self.batchCount = self.batchCount + 1
+            self.packetCount = self.packetCount + slot
+        return slot
+
+class DuplicateFilter:#short cut for packets identical to the last one accepted from the same neighbour fragment
+
+    def __init__(self, routingTable, hits=None, misses=None):
+        self.routingTable = routingTable
+        self.entries = {}#(neighbour ID, fragment number) -> (digest, table version, routes the packet refreshes)
+        self.hits = hits#counters from the router's MetricsRegistry, or None
+        self.misses = misses
+
+    def refresh(self, packet):#if packet repeats a remembered one, refresh its routes' timers and return True
+        if (len(packet) < HEADER_SIZE):
+            return False
+        key = DUPLICATE_KEY.unpack_from(packet, 0)
+        entry = self.entries.get(key)
+        if (entry is None or entry[1] != self.routingTable.version or entry[0] != hashlib.blake2b(packet, digest_size=16).digest()):
+            if (self.misses is not None):
+                self.misses.inc()
+            return False
+        now = self.routingTable.clock()
+        for route in entry[2]:
+            route.lastUpdate = now
+        heard = self.routingTable.offerFragments.get(key)
+        if (heard is not None):
+            heard[1] = now
+        if (self.hits is not None):
+            self.hits.inc()
+        return True
+
+    def remember(self, packet, count, received=None):#call after an accepted response with count entries has been applied. It is kept only if applying it again would just refresh timers. received is the packet as it arrived, if it was expanded from a compact one
+        routingTable = self.routingTable
+        routes = routingTable.routes
+        staleDestinations = routingTable.staleDestinations
+        key = DUPLICATE_KEY.unpack_from(packet, 0)
+        sender = key[0]
+        linkCost = routingTable.linkCosts.get(sender)
+        self.entries.pop(key, None)
+        if (linkCost is None):
+            return
+
+        route = routes.get(sender)#the direct route to the sender, as confirmNeighbour would see it
+        if (route is None or ((route.nextHop == sender or linkCost < route.metric) and (route.metric != linkCost or route.nextHop != sender))):
+            return
+        refreshed = [route] if route.nextHop == sender else []
+
+        routerID = routingTable.routerID
+        for destination, address, firstHop, receivedMetric in decodeEntries(packet, count):#the same decisions as updateRoutingTable, without acting on them
+            if (destination == routerID or destination == sender):
+                continue
+            metric = min(receivedMetric + linkCost, INFINITY)
+            route = routes.get(destination)
+            if (route is None):
+                if (metric < INFINITY):
+                    return
+            elif (route.nextHop == sender):
+                if (route.metric != metric or destination in staleDestinations):
+                    return
+                if (metric < INFINITY):
+                    refreshed.append(route)
+            elif (metric < route.metric):
+                return
+        self.entries[key] = (hashlib.blake2b(packet if received is None else received, digest_size=16).digest(), routingTable.version, refreshed)
+
+    def forget(self):
+        self.entries.clear()
+
+class IngressLimiter:#token bucket per neighbour, checked before a received packet costs anything else
+
+    def __init__(self, routingTable, rate, burst, metrics=None, periodicValue=30):
+        self.routingTable = routingTable
+        self.rate = rate#packets per second each neighbour's bucket refills at, None to follow the table
+        self.burst = burst#packets a full bucket holds, enough for a whole table in one go, None to follow the table
+        self.periodicValue = periodicValue#seconds between a neighbour's full tables before jitter, for a rate which follows the table
+        self.buckets = {}#neighbour ID, or 0 for anything else -> [tokens, time last topped up]
+        self.metrics = metrics#MetricsRegistry the drop counters go in, or None
+        self.dropCounters = {}#neighbour ID -> counter of packets dropped for it
+        self.droppedCount = 0
+
+    def admit(self, packet, now):#take a token from the sender's bucket, returns False if the packet should be dropped
+        sender = SENDER_KEY.unpack_from(packet, 0)[0] if len(packet) >= SENDER_KEY.size else 0
+        if sender not in self.routingTable.linkCosts:
+            sender = 0
+        rate, burst = self.limits()
+        bucket = self.buckets.get(sender)
+        if (bucket is None):
+            bucket = self.buckets[sender] = [burst, now]
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if (tokens >= 1):
+            bucket[0] = tokens - 1
+            return True
+        bucket[0] = tokens
+        self.droppedCount = self.droppedCount + 1
+        if (self.metrics is not None):
+            counter = self.dropCounters.get(sender)
+            if (counter is None):
+                counter = self.dropCounters[sender] = self.metrics.counter("packetsThrottled", neighbour=sender if sender else "other")
+            counter.inc()
+        return False
+
+    def limits(self):#the rate and bucket size in use, working out whichever follow the table from its size
+        rate = self.rate
+        burst = self.burst
+        if (rate is None or burst is None):
+            fragments = len(self.routingTable) // MAX_ENTRIES + 1#datagrams in a full table as long as this router's
+            if (rate is None):
+                rate = max(MIN_INGRESS_RATE, INGRESS_HEADROOM * fragments / (self.periodicValue * 0.8))#periods are jittered down to 0.8 of the base
+            if (burst is None):
+                burst = max(MIN_INGRESS_BURST, 2 * fragments)
+        return rate, burst
+
+    def throttled(self):#neighbour IDs whose buckets are empty right now, 0 standing for router IDs that aren't neighbours
+        return sorted(sender for sender, bucket in self.buckets.items() if bucket[0] < 1)
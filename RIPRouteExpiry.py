@@ -0,0 +1,68 @@
+from RIPCodec import INFINITY
+
+'''
+Route timeouts and garbage collection for the RIP daemon.
+
+Every route has exactly one timer in the scheduler heap. While a route is valid the timer is its
+timeout deadline. Refreshing a route only moves its last update time and does not touch the heap.
+When the timer fires and the route has been refreshed since, the timer is put back at the new
+deadline. Otherwise the route times out: it is poisoned to metric 16, announced in a triggered
+update, and its timer becomes a garbage collection deadline after which the route is removed.
+Work per loop therefore depends on the number of timers that fire, not on the size of the table.
+
+Timeouts are never stretched for a neighbour with an adaptive periodic interval. It keeps its
+stretched period short enough for two full tables to fit in a timeout instead (see
+RIPRouter.stretchLimit), so a failed neighbour is still noticed within timeoutValue.
+
+A route which has a feasible backup is moved onto it when it times out rather than poisoned (see
+RouteTable.failOver), and gets a new timeout from the time the backup was last advertised.
+'''
+
+class RouteExpiry:#timeout and garbage collection deadlines for the routes in one routing table
+
+    def __init__(self, routingTable, scheduler, timeoutValue, garbageValue, routesExpired):
+        self.routingTable = routingTable
+        self.scheduler = scheduler
+        self.timeoutValue = timeoutValue#seconds a route stays valid without being refreshed
+        self.garbageValue = garbageValue#seconds an unreachable route is still advertised before it is removed
+        self.routesExpired = routesExpired#called with no arguments after a route times out, so the router can send a triggered update
+        self.expiredCount = 0
+        self.removedCount = 0
+
+        routingTable.onRouteAdded = self.armTimeout
+        routingTable.onRouteUnreachable = self.startGarbageCollection
+        for route in routingTable:#routes that existed before the engine was attached
+            self.armTimeout(route)
+
+    def isCurrent(self, route):#a route object stops being current once it is removed from the table
+        return self.routingTable.get(route.destination) is route
+
+    def armTimeout(self, route):#put the route's timer at its timeout deadline
+        route.timer = self.scheduler.scheduleAt(self.routingTable.lastUpdateOf(route) + self.timeoutValue, "timeout", lambda: self.timeoutDue(route))
+
+    def timeoutDue(self, route):
+        if not self.isCurrent(route):
+            return
+        if (self.routingTable.lastUpdateOf(route) + self.timeoutValue > self.scheduler.clock()):#refreshed since the timer was set, so wait for the new deadline
+            self.armTimeout(route)
+            return
+        if (route.metric >= INFINITY):#already unreachable, garbage collection is running
+            return
+        self.expiredCount = self.expiredCount + 1
+        self.routingTable.setMetric(route, INFINITY)#poison the route, which starts garbage collection
+        if (route.metric < INFINITY):#the table moved the route to a backup instead, so it needs a timeout again
+            self.armTimeout(route)
+        self.routesExpired()
+
+    def startGarbageCollection(self, route):#the route just became unreachable, remove it once it has been advertised as such for garbageValue seconds
+        self.scheduler.cancel(route.timer)
+        route.timer = self.scheduler.schedule(self.garbageValue, "garbage", lambda: self.garbageDue(route))
+
+    def garbageDue(self, route):
+        if not self.isCurrent(route):
+            return
+        if (route.metric < INFINITY):#a new path was learned during garbage collection, so the route is valid again
+            self.armTimeout(route)
+            return
+        self.removedCount = self.removedCount + 1
+        self.routingTable.removeRoute(route.destination)
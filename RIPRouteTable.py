@@ -0,0 +1,383 @@
+import time
+
+from RIPCodec import INFINITY, PARTIAL_FRAGMENT, ResponseCache, ResponseEncoder, decodeEntries, decodeHeader
+
+'''
+Routing table for the RIP daemon.
+
+Routes are held in a dictionary keyed by destination router ID, so looking up a destination is a
+single dictionary access instead of a scan of the table. Each neighbour also has a set of the
+destinations currently routed through it, so everything learned from one neighbour can be found
+without looking at the rest of the table.
+
+The last metric each neighbour advertised for each destination is kept as well, even when it
+loses to the route in use. An offer is current while the fragment it arrived in keeps being
+heard without changing, which the duplicate filter can note without decoding the packet. When a route is poisoned or times out, the table switches straight
+away to the best of those offers which is still fresh and passes the feasibility condition: the
+neighbour must have advertised a metric strictly lower than the lowest metric this router has
+had for the destination since the route was learned. A neighbour that close cannot be routing
+through this router, so the switch cannot form a loop. Offers whose own next hop is the next hop
+that just failed are skipped too, as they most likely fail with it. Without a feasible offer the route becomes
+unreachable as usual and waits for new advertisements.
+'''
+
+class Route:#one destination in the routing table
+
+    __slots__ = ("destination", "address", "nextHop", "metric", "lastUpdate", "learnedFrom", "timer", "feasibleDistance")
+
+    def __init__(self, destination, address, nextHop, metric, lastUpdate, learnedFrom):
+        self.destination = destination#router ID of the destination
+        self.address = address#port the destination was advertised with
+        self.nextHop = nextHop#router ID of the first router on the way to the destination
+        self.metric = metric
+        self.lastUpdate = lastUpdate#time the route was last confirmed
+        self.learnedFrom = learnedFrom#router ID this route was learned from, 0 for directly connected neighbours
+        self.timer = None#pending timeout or garbage collection timer for this route
+        self.feasibleDistance = metric#lowest metric the route has had since it was learned, backups must be advertised with less than this
+
+    def asList(self):#the route in the old list format [routerID, address, first router to destination, metric, time of last update, learned from]
+        return [self.destination, self.address, self.nextHop, self.metric, self.lastUpdate, self.learnedFrom]
+
+    def __repr__(self):
+        return repr(self.asList())
+
+class RouteTable:#routing table keyed by destination router ID
+
+    def __init__(self, routerID, outputData, clock=time.time):
+        self.routerID = routerID#ID of the router that owns this table
+        self.clock = clock
+        self.routes = {}#destination router ID -> Route
+        self.neighbourRoutes = {}#neighbour router ID -> set of destinations whose next hop is that neighbour
+        self.linkCosts = {}#neighbour router ID -> metric of the direct link to it
+        self.neighbourPorts = {}#neighbour router ID -> input port of that neighbour
+        self.neighbourOffers = {}#neighbour router ID -> {destination: (metric it advertised, address, its next hop, fragment, fragment generation)}, the candidates for backup routes
+        self.offerFragments = {}#(neighbour router ID, fragment number) -> [generation, time last heard]. Offers from an older generation of their fragment are superseded
+        self.backupLifetime = 0#seconds an offer stays usable as a backup. 0 turns backup routes off
+        self.failoverCount = 0#routes switched to a backup instead of becoming unreachable
+        self.encoder = ResponseEncoder()#reusable buffer responses are packed into
+        self.changedDestinations = set()#destinations whose route changed since the last update was sent
+        self.staleDestinations = set()#destinations loaded from a snapshot which no neighbour has confirmed yet. They are used but not advertised
+        self.version = 0#bumped whenever anything that is sent to neighbours changes
+        self.responseCache = ResponseCache()#full table responses for the current version
+        self.addedCount = 0#routes added since the table was created
+        self.removedCount = 0
+        self.onRouteAdded = None#called with each new route, used to start its timeout
+        self.onRouteUnreachable = None#called with a route whose metric has just become infinity, used to start garbage collection
+        self.onRouteChanged = None#called with the destination of every route added, removed or given a new next hop or metric, used to export the forwarding table
+        self.createRoutingTable(outputData)
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __iter__(self):
+        return iter(self.routes.values())
+
+    def __contains__(self, destination):
+        return destination in self.routes
+
+    def __repr__(self):
+        return repr([route.asList() for route in self.routes.values()])
+
+    def createRoutingTable(self, outputData):#initialises the routing table with output data from config files
+        #[port of the pair router, metric value of link to the router, router id of the router]
+        now = self.clock()
+        for outputRouter in outputData:#for each router in the outputData
+            port, linkCost, neighbourID = outputRouter[0], outputRouter[1], outputRouter[2]
+            self.linkCosts[neighbourID] = linkCost
+            self.neighbourPorts[neighbourID] = port
+            self.neighbourRoutes[neighbourID] = set()
+            self.addRoute(Route(neighbourID, port, neighbourID, linkCost, now, 0))#the initial neighbours are reached directly
+
+    def setNeighbour(self, neighbourID, port, linkCost):#add a neighbour, or change its port or link cost, adjusting only the routes through it
+        oldCost = self.linkCosts.get(neighbourID)
+        self.linkCosts[neighbourID] = linkCost
+        self.neighbourPorts[neighbourID] = port
+        self.neighbourRoutes.setdefault(neighbourID, set())
+
+        if (oldCost is not None and oldCost != linkCost):
+            for route in self.routesVia(neighbourID):
+                if (route.metric < INFINITY):
+                    self.setMetric(route, min(route.metric - oldCost + linkCost, INFINITY))
+
+        route = self.routes.get(neighbourID)
+        if (route is None):
+            self.addRoute(Route(neighbourID, port, neighbourID, linkCost, self.clock(), 0))
+        elif (route.nextHop == neighbourID):
+            if (route.address != port):
+                route.address = port
+                self.changedDestinations.add(neighbourID)
+                self.version = self.version + 1
+        elif (linkCost < route.metric):#the direct link is now shorter than the path in use
+            self.setNextHop(route, neighbourID)
+            route.address = port
+            route.learnedFrom = 0
+            route.lastUpdate = self.clock()
+            self.setMetric(route, linkCost)
+
+    def removeNeighbour(self, neighbourID):#stop trusting a neighbour and poison every route through it, which starts their garbage collection
+        self.linkCosts.pop(neighbourID, None)
+        self.neighbourPorts.pop(neighbourID, None)
+        self.neighbourOffers.pop(neighbourID, None)
+        for key in [key for key in self.offerFragments if key[0] == neighbourID]:
+            del self.offerFragments[key]
+        for route in self.routesVia(neighbourID):
+            self.setMetric(route, INFINITY)
+
+    def neighbourLost(self, neighbourID):#a neighbour has stopped answering, poison every route through it at once. Its offers are dropped first, so none of them becomes a backup. Returns the number of routes poisoned or failed over
+        self.neighbourOffers.pop(neighbourID, None)
+        for key in [key for key in self.offerFragments if key[0] == neighbourID]:
+            del self.offerFragments[key]
+        routes = [route for route in self.routesVia(neighbourID) if route.metric < INFINITY]
+        for route in routes:
+            self.setMetric(route, INFINITY)
+        return len(routes)
+
+    def get(self, destination):#return the route to a destination, or None
+        return self.routes.get(destination)
+
+    def findMetric(self, destination):#return the metric to a destination, or infinity if there is no route
+        route = self.routes.get(destination)
+        if (route is None):
+            return INFINITY
+        return route.metric
+
+    def routesVia(self, neighbourID):#return the routes whose next hop is the given neighbour
+        routes = self.routes
+        return [routes[destination] for destination in self.neighbourRoutes.get(neighbourID, ())]
+
+    def addRoute(self, route):
+        self.routes[route.destination] = route
+        self.neighbourRoutes.setdefault(route.nextHop, set()).add(route.destination)
+        self.changedDestinations.add(route.destination)
+        self.version = self.version + 1
+        self.addedCount = self.addedCount + 1
+        if (self.onRouteAdded is not None):
+            self.onRouteAdded(route)
+        if (self.onRouteChanged is not None):
+            self.onRouteChanged(route.destination)
+
+    def addStaleRoute(self, route):#add a route from a snapshot, held back from neighbours until its next hop confirms it
+        self.addRoute(route)
+        self.changedDestinations.discard(route.destination)
+        self.staleDestinations.add(route.destination)
+
+    def confirmRoute(self, destination):#a neighbour confirmed a stale route, so it is advertised from now on
+        self.staleDestinations.discard(destination)
+        self.changedDestinations.add(destination)
+        self.version = self.version + 1
+        if (self.onRouteChanged is not None):
+            self.onRouteChanged(destination)
+
+    def removeRoute(self, destination):
+        route = self.routes.pop(destination, None)
+        if (route is not None):
+            self.neighbourRoutes[route.nextHop].discard(destination)
+            self.changedDestinations.discard(destination)
+            self.staleDestinations.discard(destination)
+            self.version = self.version + 1
+            self.removedCount = self.removedCount + 1
+            if (self.onRouteChanged is not None):
+                self.onRouteChanged(destination)
+        return route
+
+    def takeChanges(self):#return the routes changed since the last call and start tracking afresh
+        routes = self.routes
+        changedRoutes = [routes[destination] for destination in self.changedDestinations if destination in routes]
+        self.changedDestinations.clear()
+        return changedRoutes
+
+    def setNextHop(self, route, nextHop):#change a route's next hop, keeping the neighbour index in step
+        if (route.nextHop == nextHop):
+            return
+        self.neighbourRoutes[route.nextHop].discard(route.destination)
+        self.neighbourRoutes.setdefault(nextHop, set()).add(route.destination)
+        route.nextHop = nextHop
+        if self.staleDestinations:#a new path replaces what the snapshot said
+            self.staleDestinations.discard(route.destination)
+        self.changedDestinations.add(route.destination)
+        self.version = self.version + 1
+        if (self.onRouteChanged is not None):
+            self.onRouteChanged(route.destination)
+
+    def setMetric(self, route, metric):#change a route's metric, marking it for the next triggered update
+        if (route.metric == metric):
+            return
+        if (metric >= INFINITY and self.failOver(route)):#a feasible backup took over, so the route never becomes unreachable
+            return
+        if (metric < route.feasibleDistance or route.metric >= INFINITY):#a route coming back from unreachable starts a new feasible distance
+            route.feasibleDistance = metric
+        route.metric = metric
+        if self.staleDestinations:
+            self.staleDestinations.discard(route.destination)
+        self.changedDestinations.add(route.destination)
+        self.version = self.version + 1
+        if (self.onRouteChanged is not None):
+            self.onRouteChanged(route.destination)
+        if (metric >= INFINITY and self.onRouteUnreachable is not None):
+            self.onRouteUnreachable(route)
+
+    def heardFragment(self, neighbourID, fragment, now):#a fragment from a neighbour is about to be decoded, superseding the offers its last copy made. Returns the new generation
+        heard = self.offerFragments.get((neighbourID, fragment))
+        if (heard is None):
+            heard = self.offerFragments[(neighbourID, fragment)] = [0, now]
+        heard[0] = heard[0] + 1
+        heard[1] = now
+        return heard[0]
+
+    def storePartialOffers(self, neighbourID, offers, entries):#keep a triggered update's entries as offers from the fragment that last offered each destination, or fragment 0 for a new one, so they last as long as that fragment does. Returns the entries as a list
+        entries = list(entries)
+        offerFragments = self.offerFragments
+        for destination, address, firstHop, receivedMetric in entries:
+            if (destination == self.routerID or destination == neighbourID):
+                continue
+            offer = offers.get(destination)
+            fragment = offer[3] if offer is not None else 0
+            heard = offerFragments.get((neighbourID, fragment))
+            offers[destination] = (receivedMetric, address, firstHop, fragment, heard[0] if heard is not None else 0)#generation 0 is never current, so nothing is offered before a full table has been heard
+        return entries
+
+    def offerFrom(self, neighbourID, destination):#the current (metric, address, time heard, next hop) a neighbour advertises for a destination, or None
+        offers = self.neighbourOffers.get(neighbourID)
+        if (offers is None):
+            return None
+        offer = offers.get(destination)
+        if (offer is None):
+            return None
+        heard = self.offerFragments.get((neighbourID, offer[3]))
+        if (heard is None or heard[0] != offer[4]):#the fragment has been heard since without it
+            return None
+        return offer[0], offer[1], heard[1], offer[2]
+
+    def feasibleBackup(self, route):#the best fresh, loop-free offer from a neighbour other than the route's next hop, as (metric, neighbour ID, address, time heard), or None
+        if (self.backupLifetime <= 0):
+            return None
+        now = self.clock()
+        destination = route.destination
+        best = None
+        for neighbourID, linkCost in self.linkCosts.items():
+            if (neighbourID == route.nextHop):
+                continue
+            offer = self.offerFrom(neighbourID, destination)
+            if (offer is None or offer[0] >= route.feasibleDistance):#no offer, or the neighbour may be routing through this router
+                continue
+            if (offer[3] == route.nextHop):#the neighbour goes through the next hop being replaced
+                continue
+            if (offer[2] + self.backupLifetime <= now):#not advertised again for as long as a route would stay valid
+                continue
+            metric = offer[0] + linkCost
+            if (metric < INFINITY and (best is None or metric < best[0])):
+                best = (metric, neighbourID, offer[1], offer[2])
+        return best
+
+    def failOver(self, route):#move a route which is about to become unreachable onto its best feasible backup, returns True if there was one
+        backup = self.feasibleBackup(route)
+        if (backup is None):
+            return False
+        metric, neighbourID, address, heardAt = backup
+        self.setNextHop(route, neighbourID)
+        route.address = address
+        route.learnedFrom = neighbourID
+        route.lastUpdate = heardAt#the backup times out when the offer it came from would have
+        self.setMetric(route, metric)
+        self.failoverCount = self.failoverCount + 1
+        return True
+
+    def composeResponse(self, recipient, routes=None, stretch=0):#composes the datagrams to send to the given neighbour. Sends the whole table unless given a list of routes
+        #routes whose next hop is the recipient are advertised back to it as unreachable (split horizon with poisoned reverse)
+        metric = self.findMetric(recipient)#metric of this router's route to the recipient
+        if (routes is not None):#partial updates are small, so encode them directly. Only valid until the next call
+            return self.encoder.encode(self.routerID, metric, routes, recipient, stretch, True)
+
+        responseCache = self.responseCache
+        if (responseCache.version != self.version):#the table changed since the full table was last encoded
+            routes = list(self.routes.values())
+            if self.staleDestinations:
+                staleDestinations = self.staleDestinations
+                routes = [route for route in routes if route.destination not in staleDestinations]
+            responseCache.build(self.version, self.routerID, routes)
+        return responseCache.packetsFor(metric, self.neighbourRoutes.get(recipient, ()), stretch)
+
+    def lastUpdateOf(self, route):#time the route was last confirmed
+        return route.lastUpdate
+
+    def confirmNeighbour(self, neighbourID, linkCost, now):#hearing from a neighbour confirms the direct link to it, returns 1 if its route was added or changed
+        route = self.routes.get(neighbourID)
+        if (route is None):
+            self.addRoute(Route(neighbourID, self.neighbourPorts[neighbourID], neighbourID, linkCost, now, 0))
+            return 1
+        if (route.nextHop == neighbourID or linkCost < route.metric):
+            changed = 1 if (route.metric != linkCost or route.nextHop != neighbourID) else 0
+            self.setNextHop(route, neighbourID)
+            route.learnedFrom = 0
+            route.lastUpdate = now
+            self.setMetric(route, linkCost)
+            return changed
+        return 0
+
+    def updateFromPackets(self, packets):#apply a batch of checked (packet, address) pairs in order, returns the number of routes added or changed
+        changed = 0
+        for packetReceived in packets:
+            changed = changed + self.updateRoutingTable(packetReceived)
+        return changed
+
+    def updateRoutingTable(self, packetReceived):#updates the routing table from a received packet, returns the number of routes added or changed
+
+        packet = packetReceived[0]
+        header = decodeHeader(packet)
+        receivedRouterID = header[2]
+        linkCost = self.linkCosts.get(receivedRouterID)
+        if (linkCost is None):#only neighbours from the config file are trusted
+            return 0
+
+        now = self.clock()
+        offers = self.neighbourOffers.get(receivedRouterID)
+        if (offers is None):
+            offers = self.neighbourOffers[receivedRouterID] = {}
+        fragment = header[5]
+        if (fragment == PARTIAL_FRAGMENT):#a triggered update only replaces the offers it carries, the last full table's fragments stay current
+            changed = self.confirmNeighbour(receivedRouterID, linkCost, now)
+            changed = changed + self.relaxEntries(self.storePartialOffers(receivedRouterID, offers, decodeEntries(packet, header[10])), receivedRouterID, linkCost, now)
+        else:
+            generation = self.heardFragment(receivedRouterID, fragment, now)
+            changed = self.confirmNeighbour(receivedRouterID, linkCost, now)
+            changed = changed + self.relaxEntries(decodeEntries(packet, header[10]), receivedRouterID, linkCost, now, offers, fragment, generation)#unpack this fragment of the received routing table in one pass, each fragment is applied on its own
+
+        if (changed > 0):
+            self.version = self.version + 1
+        return changed
+
+    def relaxEntries(self, entries, receivedRouterID, linkCost, now, offers=None, fragment=0, generation=0):#apply (destination, address, first hop, metric) entries from a neighbour one at a time, in order, storing each in offers when given. Returns the number of routes added or changed
+        routes = self.routes
+        staleDestinations = self.staleDestinations
+        changed = 0
+        for destination, address, firstHop, receivedMetric in entries:
+            if (destination == self.routerID or destination == receivedRouterID):#routes to ourself and to the sender are not learned from the sender
+                continue
+            if (offers is not None):
+                offers[destination] = (receivedMetric, address, firstHop, fragment, generation)#kept whether or not it wins, as a backup for later
+
+            metric = min(receivedMetric + linkCost, INFINITY)#metric to the destination through the sender
+            route = routes.get(destination)
+
+            if (route is None):
+                if (metric < INFINITY):#only add destinations that are reachable
+                    self.addRoute(Route(destination, address, receivedRouterID, metric, now, receivedRouterID))
+                    changed = changed + 1
+            elif (route.nextHop == receivedRouterID):#the sender is already our next hop, so believe it whether the metric got better or worse
+                if (route.metric != metric):
+                    route.lastUpdate = now
+                    self.setMetric(route, metric)
+                    changed = changed + 1
+                elif (metric < INFINITY):#an unreachable route is not kept alive by hearing it is still unreachable
+                    route.lastUpdate = now
+                    if (staleDestinations and destination in staleDestinations):#the next hop confirmed a route from the snapshot
+                        self.confirmRoute(destination)
+                        changed = changed + 1
+            elif (metric < route.metric):#the sender offers a shorter path
+                self.setNextHop(route, receivedRouterID)
+                route.address = address
+                route.learnedFrom = receivedRouterID
+                route.lastUpdate = now
+                self.setMetric(route, metric)
+                changed = changed + 1
+        return changed
@@ -0,0 +1,176 @@
+import collections
+import logging
+import selectors
+import socket
+
+from RIPCodec import ENTRY_SIZE, HEADER, HEADER_SIZE, MAX_ENTRIES, RIP_VERSION, decodeHeader
+
+'''
+Send path for the RIP daemon.
+
+Every neighbour port a router sends to gets its own non-blocking UDP socket, connected to the
+neighbour, and a bounded queue. Routers sharing a SendStage, as in a RIPMultiDaemon worker, each
+get their own queue even when they send to the same port, so one router's packets never merge
+with or supersede another's. A packet is sent straight away when the queue is empty. If the
+socket's buffer is full the packet waits in the queue, the socket is watched for writability, and
+the whole backlog is flushed in one go once it is writable. A full queue drops the packet rather
+than growing, and errors such as a refused port from a dead neighbour are counted and dropped, so
+a slow or dead neighbour never stalls the loop or raises out of it.
+
+Packets are queued by kind. "table" packets carry the whole routing table, from a periodic update
+or an answer to a request, and the first fragment of a new table supersedes everything the same
+router still has queued for that neighbour from older tables and triggered updates. "triggered"
+packets only carry changed routes: their entries are merged by destination while they wait, so a
+newer change to a route replaces the older one still queued and nothing else is lost, and they
+are packed back into as few datagrams as they need when the socket can take them. Compact
+triggered updates, and every other kind of packet, such as requests, are queued as they are.
+'''
+
+FRAGMENT_OFFSET = 8#fragment number in the header, 0 for the first datagram of a table
+
+class NeighbourQueue:#the connected socket and pending packets from one router to one neighbour port
+
+    def __init__(self, port, host, sender=0):
+        self.port = port
+        self.sender = sender#router ID the packets are from
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(0)
+        self.socket.connect((host, port))#the kernel keeps the address, and a dead neighbour shows up as a refused port
+        self.packets = collections.deque()#(kind, packet bytes) in the order they go out
+        self.triggeredHeader = None#header of the newest triggered update waiting, its entries are in triggeredEntries
+        self.triggeredEntries = {}#destination -> newest entry bytes waiting to go out in a triggered update
+
+    def __len__(self):
+        return len(self.packets) + -(-len(self.triggeredEntries) // MAX_ENTRIES)
+
+    def takeTriggered(self):#pack the waiting triggered entries into datagrams, queued after everything else. They keep the triggered update's fragment number, which marks them as partial
+        entries = list(self.triggeredEntries.values())
+        header = list(HEADER.unpack(self.triggeredHeader))
+        for start in range(0, len(entries), MAX_ENTRIES):
+            block = entries[start:start + MAX_ENTRIES]
+            header[10] = len(block)
+            self.packets.append(("triggered", HEADER.pack(*header) + b"".join(block)))
+        self.triggeredHeader = None
+        self.triggeredEntries = {}
+
+class SendStage:#per-neighbour connected sockets and queues which the router's packets go out through
+
+    def __init__(self, host="127.0.0.1", queueLimit=256, selector=None):
+        self.host = host
+        self.queueLimit = queueLimit#datagrams a neighbour's queue holds before new packets are dropped
+        self.selector = selector#selectors poller to register waiting sockets with, None when the loop polls waitingSockets() itself
+        self.queues = {}#(sending router ID, neighbour port) -> NeighbourQueue
+        self.waiting = {}#socket -> NeighbourQueue for every queue whose socket was full
+        self.logger = logging.getLogger("RIP.send")
+        self.sentCount = 0
+        self.droppedCount = 0#packets dropped because a queue was full
+        self.supersededCount = 0#queued packets and triggered entries replaced by newer ones
+        self.errorCount = 0#packets lost to send errors, such as a refused port
+
+    def queueFor(self, port, sender=0):
+        queue = self.queues.get((sender, port))
+        if (queue is None):
+            queue = self.queues[(sender, port)] = NeighbourQueue(port, self.host, sender)
+        return queue
+
+    def send(self, packet, port, kind="table", sender=0):#queue a packet from router sender for a neighbour's input port and send what its socket will take
+        queue = self.queueFor(port, sender)
+        if (kind == "triggered" and packet[1] == RIP_VERSION):#compact entries vary in length, so they are queued whole like any other packet
+            entries = queue.triggeredEntries
+            for offset in range(HEADER_SIZE, HEADER_SIZE + decodeHeader(packet)[10] * ENTRY_SIZE, ENTRY_SIZE):
+                destination = bytes(packet[offset:offset + 2])
+                if destination in entries:
+                    self.supersededCount = self.supersededCount + 1
+                entries[destination] = bytes(packet[offset:offset + ENTRY_SIZE])
+            queue.triggeredHeader = bytes(packet[:HEADER_SIZE])
+        else:
+            if (kind == "table" and packet[FRAGMENT_OFFSET] == 0 and packet[FRAGMENT_OFFSET + 1] == 0):#a new whole table makes every older table and triggered update this router has waiting for this neighbour redundant
+                superseded = [entry for entry in queue.packets if entry[0] == "table" or entry[0] == "triggered"]
+                if (superseded or queue.triggeredEntries):
+                    self.supersededCount = self.supersededCount + len(superseded) + len(queue.triggeredEntries)
+                    queue.packets = collections.deque(entry for entry in queue.packets if entry[0] != "table" and entry[0] != "triggered")
+                    queue.triggeredHeader = None
+                    queue.triggeredEntries = {}
+            if (len(queue) >= self.queueLimit):
+                self.droppedCount = self.droppedCount + 1
+                return
+            queue.packets.append((kind, bytes(packet)))#the router reuses its packet buffers
+        if queue.socket not in self.waiting:#a waiting socket is flushed when the poller says it is writable
+            self.flush(queue)
+
+    def flush(self, queue):#send queued packets until the socket is full or the queue is empty
+        if queue.triggeredEntries:
+            queue.takeTriggered()
+        packets = queue.packets
+        sendSocket = queue.socket
+        while packets:
+            try:
+                sendSocket.send(packets[0][1])
+            except BlockingIOError:#the socket buffer is full, wait until the poller says it is writable
+                self.wait(queue)
+                return
+            except ConnectionRefusedError:#an earlier datagram found nothing listening, the error is reported once so this one is tried again
+                try:
+                    sendSocket.send(packets[0][1])
+                except BlockingIOError:
+                    self.wait(queue)
+                    return
+                except OSError as error:
+                    self.sendFailed(queue, error)
+                    continue
+            except OSError as error:
+                self.sendFailed(queue, error)
+                continue
+            packets.popleft()
+            self.sentCount = self.sentCount + 1
+        self.unwait(queue)
+
+    def sendFailed(self, queue, error):
+        queue.packets.popleft()
+        self.errorCount = self.errorCount + 1
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Send from router %d to port %d failed: %s", queue.sender, queue.port, error)
+
+    def wait(self, queue):
+        if queue.socket in self.waiting:
+            return
+        self.waiting[queue.socket] = queue
+        if (self.selector is not None):
+            self.selector.register(queue.socket, selectors.EVENT_WRITE)
+
+    def unwait(self, queue):
+        if (self.waiting.pop(queue.socket, None) is not None and self.selector is not None):
+            self.selector.unregister(queue.socket)
+
+    def waitingSockets(self):#sockets to pass to select as the write list
+        return list(self.waiting)
+
+    def flushReady(self, writableSockets):#flush the backlog of every socket the poller reported writable
+        for sendSocket in writableSockets:
+            queue = self.waiting.get(sendSocket)
+            if (queue is not None):
+                self.flush(queue)
+
+    def queuedCount(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def collectMetrics(self, snapshot):#add the send path's counters to a router's metrics snapshot
+        snapshot["counters"]["packetsDroppedQueueFull"] = self.droppedCount
+        snapshot["counters"]["packetsSuperseded"] = self.supersededCount
+        snapshot["counters"]["sendErrors"] = self.errorCount
+        snapshot["gauges"]["packetsQueued"] = self.queuedCount()
+
+    def retain(self, ports, sender=0):#close router sender's queues for neighbour ports it no longer uses, e.g. after a reload
+        for key in [key for key in self.queues if key[0] == sender and key[1] not in ports]:
+            self.closeQueue(self.queues.pop(key))
+
+    def closeQueue(self, queue):
+        self.unwait(queue)
+        queue.socket.close()
+
+    def close(self):#send what the sockets will take without waiting, then close them
+        for queue in self.queues.values():
+            if queue.socket not in self.waiting:
+                self.flush(queue)
+            self.closeQueue(queue)
+        self.queues = {}
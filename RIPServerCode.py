@@ -1,10 +1,25 @@
-import struct
 import socket
 import sys
 import select
+import signal
+import argparse
 import configparser
-import time
+import logging
 import random
+from time import perf_counter
+
+from RIPCapture import PacketCapture
+from RIPCodec import COMPACT_VERSION, ENTRY_SIZE, FLAG_ADVERTISE, HEADER_FLAGS, HEADER_FLAGS_OFFSET, HEADER_SIZE, HELLO_COMMAND, INFINITY, MAX_PERIODIC_STRETCH, PACKET_FORMATS, REQUEST_COMMAND, RESPONSE_COMMAND, compactPacket, decodeHeader, encodeAdvertisement, encodeRequest, expandCompact
+from RIPForwarding import ForwardingTableExport, defaultExportPath
+from RIPHello import HelloProtocol
+from RIPMetrics import MetricsControlSocket, MetricsFileExporter, MetricsRegistry
+from RIPReceive import DuplicateFilter, IngressLimiter, ReceiveStage
+from RIPRouteExpiry import RouteExpiry
+from RIPRouteTable import Route, RouteTable
+from RIPSend import SendStage
+from RIPSnapshot import RouteSnapshot, loadSnapshot
+from RIPTimers import TimerScheduler
+from RIPVectorTable import VectorRouteTable, vectorAvailable
 
 '''
 The following is an example of my configuration files, to assist with understanding the format
@@ -19,6 +34,18 @@ outputs = 20000-7-2,20001-1-5
 timeoutValue = 18
 periodicValue = 3
 
+An optional "engine = vector" line applies received updates with NumPy (see RIPVectorTable), and
+"adaptivePeriodic = true" doubles the periodic interval, up to 4 times, while the table is stable.
+The stretched interval is kept short enough for two full tables to fit in timeoutValue, so
+neighbours don't stretch their timeouts and still notice a failure within timeoutValue.
+"backupRoutes = false" stops routes failing over to a neighbour's earlier offer when they time out
+or are poisoned, so they wait for new advertisements as plain RIP does.
+"packetFormat = compact" sends neighbours which can read them compact packets, with varint
+entries, and "packetFormat = compressed" deflates their entries as well (see RIPCodec). Other
+neighbours still get standard packets, and every router reads compact packets whatever it sends.
+"helloInterval = 0.2" sends every neighbour a hello that often, and "helloMultiplier = 3" (the
+default) lets them miss 3 before they declare this router down and poison the routes through it
+at once, rather than waiting for the routes to time out (see RIPHello).
 '''
 
 '''
@@ -28,6 +55,9 @@ RIP packages will contain the RIP header and the routing table as a 2D list. Eac
 Each contact will be packed into a long using the struct module.
 '''
 
+ENGINES = ("scalar", "vector")#routing tables a config can choose, see RIPVectorTable
+COMPACT_ADVERTISEMENTS = 3#advertisements a neighbour is sent without sending a compact packet back before they stop, until it sends a request
+
 def convertOutput(outputs):#function which converts output router information from [xxxx-x-x,xxxx-x-x,xxxx-x-x] in string format to 2D list [[port of the pair router, metric value of link to the router, router id of the router]x3] in integer format
     outputData = []#creates an empty list which will contain data on all peer output routers.
     
@@ -43,7 +73,7 @@ def performConfigTests(routerID, inputPorts, outputData, timeoutValue, periodicV
     if ((routerID < 1) or (routerID > 64000)):#if ID outside of valid range
         return False
     
-    usedPortNumbers = []#creates a list to check if an input port number has already been used
+    usedPortNumbers = set()#creates a set to check if a port number has already been used, each check is a single lookup
     
     for inputPortNumber in inputPorts:#for each port number in the list
         if ((inputPortNumber < 1024) or (inputPortNumber > 64000)):#if the number is outside of the range
@@ -51,8 +81,9 @@ def performConfigTests(routerID, inputPorts, outputData, timeoutValue, periodicV
         elif (inputPortNumber in usedPortNumbers):#if the port number has already been used
             return False
         else:
-            usedPortNumbers.append(inputPortNumber)#if not, add the port number
-            
+            usedPortNumbers.add(inputPortNumber)#if not, add the port number
+
+    neighbourIDs = set()#router IDs of the neighbours seen so far
     for outputPortData in outputData:#for each output port data entry
         if((outputPortData[0] < 1024) or (outputPortData[0] > 64000)):#if the output port number is out of range
             return False
@@ -60,8 +91,11 @@ def performConfigTests(routerID, inputPorts, outputData, timeoutValue, periodicV
             return False
         elif (outputPortData[1] > 15):#if the output metric number is greater than "infinity"
             return False
+        elif (outputPortData[2] == routerID or outputPortData[2] in neighbourIDs):#if the neighbour is this router or is listed twice
+            return False
         else:
-            usedPortNumbers.append(outputPortData[0])
+            usedPortNumbers.add(outputPortData[0])
+            neighbourIDs.add(outputPortData[2])
 
     if (timeoutValue/periodicValue != 6):#if timeout ratio is incorrect
         return False
@@ -71,266 +105,655 @@ def performConfigTests(routerID, inputPorts, outputData, timeoutValue, periodicV
 
     return True#return true if all tests are passed
 
-def performPacketChecks(packetReceived, routerID):
-    command = struct.unpack_from(">B", packetReceived[0], 0)#unpack the header info
-    version = struct.unpack_from(">B", packetReceived[0], 1)
-    receivedRouterID = struct.unpack_from(">H", packetReceived[0], 2)
-    firstCompulsoryZero = struct.unpack_from(">H", packetReceived[0], 6)
-    secondCompulsoryZero = struct.unpack_from(">L", packetReceived[0], 12)
-    thirdCompulsoryZero = struct.unpack_from(">L", packetReceived[0], 16)
-    metric = struct.unpack_from(">L", packetReceived[0], 20)
-    
-    if (command[0] != 2):#if it is not a response packet
-        return False
-    if (version[0] != 2):#if it is not version 2
-        return False
-    if (routerID == receivedRouterID[0]):#if the router ID is the same as the host router
-        return False
-    if ((firstCompulsoryZero[0] + secondCompulsoryZero[0] + thirdCompulsoryZero[0]) != 0):#if the sum of the zero fields does not = 0, then at least one of them isn't 0
-        return False
-    if (metric[0] >= 17):#if the metric is too high  marker: due to split horizons the metric is set to 16 for neighbours
-        return False
-
-    return True#if none of these cases are true, return true
-
-def createRoutingTable(outputData):#initialises the routing table for the router with output data from config files
-    #[port of the pair router, metric value of link to the router, router id of the router] converts to
-    #routerID, address,first router to destination, metric, time of last update, neighbouring router this location was learned from
-    routingTable = []#initialise routing table
-    for outputRouter in outputData:#for each router in the outputData
-        routerData = [outputRouter[2], outputRouter[0], outputRouter[2], outputRouter[1], int(time.time()),0]#the entry into the routing table will be as follows for the initial neighbours
-        routingTable.append(routerData)#insert the router into the routertable
-
-    return routingTable
-
-def findMetric(routerID, routingTable):#return the metric of a router given the ID using the routing table
-    for router in routingTable:
-        if (routerID == router[0]):
-            return router[3]
-    return
-
-def composeResponse(routingTable, routerID, recipient):#composes packet to send
-
-    routerResponse = bytearray(512)
-
-    command = 2
-    version = 2
-    mustBeZero = 0
-    addressFamilyIdentifier = 0
-    ipv4Address = 0
-    split = 0
-    
-    metric = findMetric(recipient, routingTable)
-    
-    #for destination in routingTable:
-        
-        #if (destination[2] == recipient):#if the first hop is the recipient of the response, then split horizons are needed
-        #    metric = 16
-
-    struct.pack_into(">B", routerResponse, 0, command)
-    struct.pack_into(">B", routerResponse, 1, version)
-    struct.pack_into(">H", routerResponse, 2, routerID)
-    struct.pack_into(">H", routerResponse, 4, addressFamilyIdentifier)
-    struct.pack_into(">H", routerResponse, 6, mustBeZero)
-    struct.pack_into(">L", routerResponse, 8, ipv4Address)
-    struct.pack_into(">L", routerResponse, 12, mustBeZero)
-    struct.pack_into(">L", routerResponse, 16, mustBeZero)
-    struct.pack_into(">L", routerResponse, 20, metric)
-    
-    count = 0
-    # Routing table packing into response packet byte array
-    while (count < len(routingTable)):
-        struct.pack_into(">B", routerResponse, (25 + count * 8), routingTable[count][0])
-        struct.pack_into(">H", routerResponse, (25 + count * 8) + 1, routingTable[count][1])
-        struct.pack_into(">H", routerResponse, (25 + count * 8) + 3, routingTable[count][2])
-        struct.pack_into(">H", routerResponse, (25 + count * 8) + 5, metric)#time of last response not packed for obvious reasons
-        struct.pack_into(">B", routerResponse, (25 + count * 8) + 7, routingTable[count][5])
-        count = count + 1
-        
-    struct.pack_into(">B", routerResponse, 24, count)
-    return routerResponse
-
-def updateRoutingTable(packetReceived, routingTable, neighbourList):#updates routing table according to the new packet received
-    
-    receivedRouterID = (struct.unpack_from(">H", packetReceived[0], 2))[0]
-    receivedTable = []#initialise received router table
-    
-    routerCount = (struct.unpack_from(">B", packetReceived[0], 24))[0]
-    routersAddedCount = 0
-
-    print("Update code executing")
-    while (routerCount > 0):#unpack the received routing table one long at a time. One routing destination is packed into one long
-        
-        thisRouter = []
-        #receivedTable[routersAddedCount] = struct.unpack_from(">L", packedReceived, 25 + routersAddedCount)
-        thisRouter.append((struct.unpack_from(">B", packetReceived[0], (25 + routersAddedCount * 8)))[0])
-        thisRouter.append((struct.unpack_from(">H", packetReceived[0], (25 + routersAddedCount * 8) + 1))[0])
-        thisRouter.append((struct.unpack_from(">H", packetReceived[0], (25 + routersAddedCount * 8) + 3))[0])
-        thisRouter.append((struct.unpack_from(">H", packetReceived[0], (25 + routersAddedCount * 8) + 5))[0])#use changed metric innit
-        thisRouter.append((struct.unpack_from(">B", packetReceived[0], (25 + routersAddedCount * 8) + 7))[0])
-        thisRouter.append(receivedRouterID)
-        
-        receivedTable.append(thisRouter)
-        routerCount = routerCount - 1
-        routersAddedCount = routersAddedCount + 1
-    
-
-    for destination in receivedTable:#for each item in new routing table
-
-        existingCount = 0#initiate count of existing routers checked so far for this destination in received routing table
-        alreadyExisted = 0#create variable to track if a router was already in local routing table
-
-        for existingDestination in routingTable:#for each item in existing table
-            
-            if (destination[0] == existingDestination[0]):#if the router numbers are the same in each table, compare information
-                
-                alreadyExisted = 1
-                if (findMetric(destination[0],receivedTable) < 16):
-                    if (findMetric(existingDestination[0], routingTable) > findMetric(receivedRouterID, routingTable) + findMetric(destination[0], receivedTable)):#if the old metric is greater than new metric + metric to router
-                        routingTable[existingCount][2] = receivedRouterID#set first hop to the id of the router we received the update from
-                        
-                        if (routingTable[existingCount][5] != receivedRouterID):
-                            routingTable[existingCount][3] = findMetric(receivedRouterID, routingTable) + findMetric(destination[0], receivedTable)#set new metric to the metric of the hop to the first hop router + metric of that router to destination
-                        else:
-                            routingTable[existingCount][3] = 16
-                        routingTable[existingCount][4] = time.time()#reset timer since entry was last updated
-
-            existingCount = existingCount + 1#increment the number of existing routers checked
-
-        if (alreadyExisted == 0):#if after iterating through every existing destination in routing table the new router id was not found
-            
-            if (receivedRouterID in neighbourList):#not a neighbour
-
-                newDestination = [destination[0], destination[1], receivedRouterID, 16, routingTable, 0,receivedRouterID]
+def topologyProblems(configs):#checks across the routers of a topology file, returns a list of problems which is empty if they fit together
+    problems = []
+    portOwners = {}#input port -> router ID listening on it
+    for config in configs:
+        for inputPort in config.inputPorts:
+            if inputPort in portOwners:
+                problems.append("port %d is an input port of routers %d and %d" % (inputPort, portOwners[inputPort], config.routerID))
             else:
-                newDestination = [destination[0], destination[1], receivedRouterID, findMetric(receivedRouterID, routingTable)+findMetric(destination[0], receivedTable), 0,receivedRouterID]
-            routingTable.append(newDestination)
+                portOwners[inputPort] = config.routerID
+    for config in configs:
+        for port, metric, neighbourID in config.outputData:
+            owner = portOwners.get(port)
+            if (owner is not None and owner != neighbourID):#ports of routers outside this file can't be checked
+                problems.append("router %d sends to port %d for router %d, but that port belongs to router %d" % (config.routerID, port, neighbourID, owner))
+    return problems
+
+def packetCheckFailure(packetReceived, routerID):#returns why a received packet should be ignored, or None if it passes every check
+    packet = packetReceived[0]
+    if (len(packet) < HEADER_SIZE):#if the packet is too short to hold a header
+        return "short"
+
+    command, version, receivedRouterID, addressFamilyIdentifier, firstCompulsoryZero, fragment, fragments, secondCompulsoryZero, thirdCompulsoryZero, metric, routerCount = decodeHeader(packet)#unpack the header info in one call
+
+    if (command != RESPONSE_COMMAND and command != REQUEST_COMMAND and command != HELLO_COMMAND):#if it is not a response, request or hello packet
+        return "command"
+    if (version != 2 and version != COMPACT_VERSION):#if it is not version 2, or the compact version 3
+        return "version"
+    if (routerID == receivedRouterID):#if the router ID is the same as the host router
+        return "ownRouterID"
+    if version == COMPACT_VERSION:#the first zero field holds the flags of a compact packet
+        firstCompulsoryZero = 0
+    if command == HELLO_COMMAND:#the second zero field holds the hold time of a hello
+        secondCompulsoryZero = 0
+    if ((firstCompulsoryZero + secondCompulsoryZero + thirdCompulsoryZero) != 0):#if the sum of the zero fields does not = 0, then at least one of them isn't 0
+        return "nonZero"
+    if (metric >= 17):#if the metric is too high  marker: due to split horizons the metric is set to 16 for neighbours
+        return "metric"
+    if (fragment >= fragments):#if the fragment number is outside the number of fragments the table was split into
+        return "fragment"
+    if (version == 2 and len(packet) < HEADER_SIZE + routerCount * ENTRY_SIZE):#if the packet is too short for the number of entries it claims to hold. Compact entries are checked as they are expanded
+        return "truncated"
+
+    return None#if none of these cases are true, the packet is fine
 
-    return routingTable
-
-def main():
-    configurationFile = str(sys.argv[1])#take the file path and name of the config file from the command line
-    
-    configParser = configparser.RawConfigParser()#set up the configuration parser to read config files
-    configParser.read(configurationFile)#read the file
-    
-    routerID = configParser.get('RIP_Demon_Parameters', 'routerID')#Assigns local integer routerID to
+def performPacketChecks(packetReceived, routerID):
+    return packetCheckFailure(packetReceived, routerID) is None
+
+class RIPRouter:#holds the running state of one router so the socket loop and the timer callbacks can share it
+
+    def __init__(self, config, scheduler, sendPacket, rng=random, logger=None, metrics=None):
+        self.config = config
+        self.routerID = config.routerID
+        self.inputPorts = config.inputPorts
+        self.outputData = config.outputData
+        self.timeoutValue = config.timeoutValue
+        self.periodicValue = config.periodicValue
+        self.garbageValue = self.timeoutValue * 2/3#RIP removes routes 120s after a 180s timeout
+        self.adaptivePeriodic = config.adaptivePeriodic
+        self.packetFormat = config.packetFormat#what to send neighbours which can read compact packets, one of PACKET_FORMATS
+        self.compactNeighbours = {}#neighbour router ID -> time a compact packet was last heard from it
+        self.advertisementsUnanswered = {}#neighbour router ID -> advertisements sent to it since it last sent a compact packet
+        self.periodicStretch = 1#multiple of periodicValue until the next full table, doubled while the table is stable when adaptivePeriodic is on
+        self.stableVersion = None#table version at the last periodic response
+        self.scheduler = scheduler#TimerScheduler holding this router's deadlines
+        self.sendPacket = sendPacket#function taking (packet, port, kind) which delivers a packet to a neighbour's input port
+        self.random = rng#source of the random offsets, replaceable so simulations are repeatable
+        self.logger = logger if logger is not None else logging.getLogger("RIP.router%d" % self.routerID)
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+
+        metrics = self.metrics
+        self.packetsReceived = metrics.counter("packetsReceived")
+        self.packetsSent = metrics.counter("packetsSent")
+        self.bytesSent = metrics.counter("bytesSent")
+        self.routesChanged = metrics.counter("routesChanged")#routes added or changed by received updates
+        self.requestsAnswered = metrics.counter("requestsAnswered")
+        self.rejectedCounters = {}#reason from packetCheckFailure -> counter of packets rejected for it
+        self.updateLatency = metrics.histogram("updateSeconds")#time to apply one received packet, averaged over each batch
+        self.composeLatency = metrics.histogram("composeSeconds")#time to compose one neighbour's response
+        metrics.addCollector(self.collectMetrics)
+
+        tableClass = RouteTable
+        if (config.engine == "vector"):
+            if vectorAvailable:
+                tableClass = VectorRouteTable
+            else:
+                self.logger.warning("NumPy is not installed, using the scalar routing table")
+        self.routingTable = tableClass(self.routerID, self.outputData, scheduler.clock)#routes keyed by destination router ID
+        self.routingTable.backupLifetime = self.timeoutValue if config.backupRoutes else 0#an offer is as usable as a route for as long as a route would stay valid
+        self.periodicTimer = None
+        self.triggeredTimer = None#pending triggered update, if any
+        self.nextTriggeredTime = 0#triggered updates are rate limited, none is sent before this time
+        self.routeExpiry = RouteExpiry(self.routingTable, scheduler, self.timeoutValue, self.garbageValue, self.routesExpired)
+        self.hello = HelloProtocol(self.routingTable, scheduler, lambda packet, port: self.transmit(packet, port, "hello"), self.neighbourLost, self.neighbourBack, rng, config.helloInterval, config.helloMultiplier)
+        self.duplicateFilter = DuplicateFilter(self.routingTable, metrics.counter("duplicateHits"), metrics.counter("duplicateMisses"))
+        self.ingressLimiter = None#IngressLimiter every received packet must pass first, None to accept everything
+        self.requestTimer = scheduler.schedule(0, "request", self.sendRequests)#ask the neighbours for their tables once the caller has finished setting up
+        self.schedulePeriodicResponse()
+
+    def collectMetrics(self, snapshot):#add the values kept by the table, the expiry engine and the scheduler to a metrics snapshot
+        snapshot["counters"]["routesAdded"] = self.routingTable.addedCount
+        snapshot["counters"]["routesExpired"] = self.routeExpiry.expiredCount
+        snapshot["counters"]["routesRemoved"] = self.routeExpiry.removedCount
+        snapshot["counters"]["routesFailedOver"] = self.routingTable.failoverCount
+        snapshot["counters"]["neighboursLost"] = self.hello.lostCount
+        snapshot["gauges"]["neighboursDown"] = len(self.hello.down)
+        snapshot["gauges"]["tableSize"] = len(self.routingTable)
+        snapshot["gauges"]["staleRoutes"] = len(self.routingTable.staleDestinations)
+        snapshot["gauges"]["compactNeighbours"] = sum(1 for neighbourID in self.compactNeighbours if self.sendsCompactTo(neighbourID)) if self.packetFormat != "standard" else 0#neighbours being sent compact packets
+        snapshot["gauges"]["loopLagSeconds"] = getattr(self.scheduler, "lag", 0.0)
+        snapshot["counters"]["timerPassesDeferred"] = getattr(self.scheduler, "deferredCount", 0)
+        if (self.ingressLimiter is not None):
+            snapshot["counters"]["packetsThrottled"] = self.ingressLimiter.droppedCount
+            snapshot["gauges"]["neighboursThrottled"] = len(self.ingressLimiter.throttled())
+
+    def limitIngress(self, rate=None, burst=None):#give every neighbour a token bucket of burst packets refilled at rate packets per second, either left as None follows the table size. A rate of 0 turns the limit off
+        self.ingressLimiter = IngressLimiter(self.routingTable, rate, burst, self.metrics, self.periodicValue) if rate != 0 else None
+
+    def transmit(self, packet, port, kind):#send one datagram to a neighbour's input port, counting it. kind is "request", "table", "triggered", "advert" or "hello", so a send queue knows what a newer packet supersedes
+        self.packetsSent.inc()
+        self.bytesSent.inc(len(packet))
+        self.sendPacket(packet, port, kind)
+
+    def composeResponse(self, recipient, routes=None):#compose the datagrams for one neighbour, timing how long it takes
+        started = perf_counter()
+        packets = self.routingTable.composeResponse(recipient, routes, self.periodicStretch if self.adaptivePeriodic else 0)
+        if (self.packetFormat != "standard" and self.sendsCompactTo(recipient)):
+            compress = self.packetFormat == "compressed"
+            packets = [compactPacket(packet, compress) for packet in packets]
+        self.composeLatency.observe(perf_counter() - started)
+        return packets
+
+    def sendsCompactTo(self, neighbourID):#whether a compact packet has been heard from the neighbour within a timeout, so it can read them
+        heardAt = self.compactNeighbours.get(neighbourID)
+        return heardAt is not None and self.scheduler.clock() - heardAt <= self.timeoutValue
+
+    def advertiseCompact(self, neighbourID, port):#tell a neighbour which isn't sent compact packets yet that this router can read them, unless it ignored the last COMPACT_ADVERTISEMENTS
+        if (self.packetFormat != "standard" and not self.sendsCompactTo(neighbourID)):
+            unanswered = self.advertisementsUnanswered.get(neighbourID, 0)
+            if (unanswered >= COMPACT_ADVERTISEMENTS):#it only sends standard packets, so more would be wasted on it
+                return
+            self.advertisementsUnanswered[neighbourID] = unanswered + 1
+            self.transmit(encodeAdvertisement(self.routerID), port, "advert")
+
+    def compactHeard(self, packetReceived):#note that the sender of a checked compact packet can read them, returns the packet in the standard layout or None if it holds nothing to apply
+        packet = packetReceived[0]
+        sender = decodeHeader(packet)[2]
+        if sender not in self.routingTable.linkCosts:#only neighbours from the config file are trusted, so nothing else is worth expanding
+            return None
+        self.compactNeighbours[sender] = self.scheduler.clock()
+        self.advertisementsUnanswered.pop(sender, None)
+        if (HEADER_FLAGS.unpack_from(packet, HEADER_FLAGS_OFFSET)[0] & FLAG_ADVERTISE):
+            return None
+        expanded = expandCompact(packet)
+        if (expanded is None):
+            self.packetRejected("compact")
+            return None
+        return (expanded, packetReceived[1])
+
+    def reconfigure(self, config):#apply a reloaded config, touching only the neighbours and routes that changed. Returns the input ports to bind and to close
+        oldNeighbours = {outputRouter[2]: (outputRouter[0], outputRouter[1]) for outputRouter in self.outputData}
+        newNeighbours = {outputRouter[2]: (outputRouter[0], outputRouter[1]) for outputRouter in config.outputData}
+        routingTable = self.routingTable
+        if (config.engine != self.config.engine):#the expiry timers, snapshot and forwarding table export all hold the table, so it is only replaced on a restart
+            self.logger.warning("Changing the engine from %s to %s needs a restart, still using %s", self.config.engine, config.engine, self.config.engine)
+
+        for neighbourID in oldNeighbours.keys() - newNeighbours.keys():#neighbours removed from the config
+            routingTable.removeNeighbour(neighbourID)
+            self.compactNeighbours.pop(neighbourID, None)
+            self.advertisementsUnanswered.pop(neighbourID, None)
+            self.hello.forget(neighbourID)
+        for neighbourID, (port, linkCost) in newNeighbours.items():#neighbours added, or whose port or link cost changed
+            if (oldNeighbours.get(neighbourID) != (port, linkCost)):
+                routingTable.setNeighbour(neighbourID, port, linkCost)
+
+        if (config.timeoutValue != self.timeoutValue):
+            self.timeoutValue = config.timeoutValue
+            self.garbageValue = self.timeoutValue * 2/3
+            self.routeExpiry.timeoutValue = self.timeoutValue#running timers pick the new values up when they next fire
+            self.routeExpiry.garbageValue = self.garbageValue
+        routingTable.backupLifetime = self.timeoutValue if config.backupRoutes else 0
+        self.adaptivePeriodic = config.adaptivePeriodic
+        self.packetFormat = config.packetFormat
+        self.hello.configure(config.helloInterval, config.helloMultiplier)
+        if (config.periodicValue != self.periodicValue):
+            self.periodicValue = config.periodicValue
+            self.scheduler.cancel(self.periodicTimer)
+            self.schedulePeriodicResponse()
+            if (self.ingressLimiter is not None):
+                self.ingressLimiter.periodicValue = self.periodicValue
+        if (not self.adaptivePeriodic or self.periodicStretch > self.stretchLimit()):#a shorter timeout or longer period may leave the current stretch too long
+            self.resetPeriodicStretch()
+
+        oldPorts = set(self.inputPorts)
+        newPorts = set(config.inputPorts)
+        config.engine = self.config.engine#the engine still in use, so a later reload warns again
+        self.config = config
+        self.inputPorts = config.inputPorts
+        self.outputData = config.outputData
+        if routingTable.changedDestinations:
+            self.scheduleTriggeredUpdate()
+        return [port for port in config.inputPorts if port not in oldPorts], [port for port in oldPorts if port not in newPorts]
+
+    def warmStart(self, entries, staleWindow=None):#load (destination, address, next hop, metric) entries from a snapshot as stale routes, returns the number loaded
+        #a stale route times out staleWindow seconds from now unless its next hop confirms it first, by default long enough for a request round trip and a periodic update
+        if (staleWindow is None):
+            staleWindow = self.periodicValue * 2
+        routingTable = self.routingTable
+        lastUpdate = self.scheduler.clock() - self.timeoutValue + min(staleWindow, self.timeoutValue)
+        loaded = 0
+        for destination, address, nextHop, metric in entries:
+            if (destination == self.routerID or metric >= INFINITY):
+                continue
+            route = routingTable.get(destination)
+            if (route is not None and route.metric <= metric):#direct neighbours are already in the table at their link cost, a snapshot route only replaces one it beats
+                continue
+            linkCost = routingTable.linkCosts.get(nextHop)
+            if (linkCost is None or metric < linkCost):#the next hop is no longer a neighbour, or the snapshot doesn't fit the current link cost
+                continue
+            if (route is not None):#if the shorter route isn't confirmed it times out and the neighbour puts its direct route back when it is next heard
+                routingTable.removeRoute(destination)
+            routingTable.addStaleRoute(Route(destination, address, nextHop, metric, lastUpdate, nextHop))
+            loaded = loaded + 1
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("Loaded %d stale routes from snapshot", loaded)
+        return loaded
+
+    def sendRequests(self):#ask every neighbour for its whole table, so a restarted router doesn't wait for their periodic updates
+        self.requestTimer = None
+        request = encodeRequest(self.routerID)
+        for neighbouringRouter in self.outputData:
+            self.transmit(request, neighbouringRouter[0], "request")
+            self.advertiseCompact(neighbouringRouter[2], neighbouringRouter[0])
+
+    def answerRequest(self, neighbourID):#send the whole table to a neighbour which asked for it
+        port = self.routingTable.neighbourPorts.get(neighbourID)
+        if (port is None):#only neighbours from the config file are answered
+            return
+        self.requestsAnswered.inc()
+        for routerResponse in self.composeResponse(neighbourID):
+            self.transmit(routerResponse, port, "table")
+
+    def stop(self):#cancel every timer this router has, after which it does nothing until it is sent a packet
+        self.scheduler.cancel(self.periodicTimer)
+        self.scheduler.cancel(self.triggeredTimer)
+        self.periodicTimer = None
+        self.triggeredTimer = None
+        self.scheduler.cancel(self.requestTimer)
+        self.requestTimer = None
+        self.hello.stop()
+        for route in self.routingTable:
+            self.scheduler.cancel(route.timer)
+
+    def schedulePeriodicResponse(self):#schedule the next periodic response with a random offset so neighbours don't synchronise
+        offset = self.periodicValue * self.periodicStretch * self.random.uniform(0.8, 1.2)#a continuous offset, so routers spread out rather than sharing a handful of send times
+        self.periodicTimer = self.scheduler.schedule(offset, "periodic", self.sendPeriodicResponse)
+
+    def stretchLimit(self):#the largest stretch, at most MAX_PERIODIC_STRETCH, which still sends two full tables within a neighbour's timeout at the longest jitter
+        limit = MAX_PERIODIC_STRETCH
+        while (limit > 1 and 2 * self.periodicValue * limit * 1.2 > self.timeoutValue):
+            limit = limit // 2
+        return limit
+
+    def adaptPeriodicStretch(self):#double the period while nothing has changed since the last full table, up to stretchLimit times the base
+        version = self.routingTable.version
+        if (version == self.stableVersion):
+            self.periodicStretch = min(self.periodicStretch * 2, self.stretchLimit())
+        else:
+            self.periodicStretch = 1
+        self.stableVersion = version
+
+    def resetPeriodicStretch(self):#the table changed, so go back to the base period straight away
+        self.stableVersion = None
+        if (self.periodicStretch > 1):
+            #the change should reach neighbours in full well inside one base period, not at the end of a stretched one
+            self.periodicStretch = 1
+            self.scheduler.cancel(self.periodicTimer)
+            self.periodicTimer = self.scheduler.schedule(self.periodicValue * self.random.uniform(0.2, 0.6), "periodic", self.sendPeriodicResponse)
+
+    def sendPeriodicResponse(self):#send the routing table to every neighbour, then schedule the next send
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Sending periodic response")
+        if self.adaptivePeriodic:#decided before sending, as the stretch is announced in the packets
+            self.adaptPeriodicStretch()
+        self.routingTable.takeChanges()#the full table carries every change, so nothing is left for a triggered update
+        self.scheduler.cancel(self.triggeredTimer)
+        self.triggeredTimer = None
+        for neighbouringRouter in self.outputData:#for each neighbour
+            for routerResponse in self.composeResponse(neighbouringRouter[2]):#compose the response, one datagram per fragment
+                self.transmit(routerResponse, neighbouringRouter[0], "table")#send it to the neighbour's input port
+            self.advertiseCompact(neighbouringRouter[2], neighbouringRouter[0])
+        self.schedulePeriodicResponse()
+
+    def scheduleTriggeredUpdate(self):#send the changed routes as soon as the rate limit allows. Changes made while an update is pending go out with it
+        if self.adaptivePeriodic:
+            self.resetPeriodicStretch()
+        if (self.triggeredTimer is not None):
+            return
+        self.triggeredTimer = self.scheduler.scheduleAt(max(self.scheduler.clock(), self.nextTriggeredTime), "triggered", self.sendTriggeredUpdate)
+
+    def sendTriggeredUpdate(self):#send only the routes which changed since the last update to every neighbour
+        self.triggeredTimer = None
+        changedRoutes = self.routingTable.takeChanges()
+        if not changedRoutes:
+            return
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Sending triggered update with %d routes", len(changedRoutes))
+        for neighbouringRouter in self.outputData:#for each neighbour
+            for routerResponse in self.composeResponse(neighbouringRouter[2], changedRoutes):
+                self.transmit(routerResponse, neighbouringRouter[0], "triggered")
+        self.nextTriggeredTime = self.scheduler.clock() + self.periodicValue * self.random.randint(1,5)/30#wait a random 1/30 to 5/30 of the periodic time before the next triggered update, as RIP waits 1-5s for a 30s period
+
+    def neighbourLost(self, neighbourID):#a neighbour missed its hellos, so poison every route through it and tell the other neighbours straight away
+        changed = self.routingTable.neighbourLost(neighbourID)
+        self.logger.info("Neighbour %d missed its hellos, %d routes through it poisoned or failed over", neighbourID, changed)
+        if (changed > 0):
+            self.scheduleTriggeredUpdate()
+
+    def neighbourBack(self, neighbourID):#a neighbour declared down sent a hello again, so ask for its table rather than wait for its next periodic update
+        self.logger.info("Neighbour %d is sending hellos again", neighbourID)
+        port = self.routingTable.neighbourPorts.get(neighbourID)
+        if (port is not None):
+            self.transmit(encodeRequest(self.routerID), port, "request")
+
+    def routesExpired(self):#a route timed out and has been poisoned, so tell the neighbours straight away
+        self.logger.info("Route timed out")
+        if self.logger.isEnabledFor(logging.DEBUG):#formatting the whole table is too slow to do by default
+            self.logger.debug("%s", self.routingTable)
+        self.scheduleTriggeredUpdate()
+
+    def receiveBatch(self, packets):#check a batch of received (packet, address) pairs and apply them all, with at most one triggered update for the whole batch
+        routingTable = self.routingTable
+        routerID = self.routerID
+        duplicateFilter = self.duplicateFilter
+        self.packetsReceived.inc(len(packets))
+        ingressLimiter = self.ingressLimiter
+        now = self.scheduler.clock() if ingressLimiter is not None else 0
+        accepted = []
+        received = []#the packets in accepted as they arrived, which differ for compact packets
+        for packetReceived in packets:
+            if (ingressLimiter is not None and not ingressLimiter.admit(packetReceived[0], now)):#over its neighbour's rate, dropped before the checks
+                continue
+            if (len(packetReceived[0]) >= HEADER_SIZE and packetReceived[0][0] == HELLO_COMMAND):#hellos only move a hold timer, so they skip the duplicate filter's digest
+                failure = packetCheckFailure(packetReceived, routerID)
+                if (failure is not None):
+                    self.packetRejected(failure)
+                    continue
+                header = decodeHeader(packetReceived[0])
+                self.hello.helloHeard(header[2], header[7] / 1000)
+                continue
+            if (not accepted and duplicateFilter.refresh(packetReceived[0])):#identical to the last packet accepted from this neighbour fragment, so only its timers move. Once this batch has changed the table the rest take the full path
+                if (packetReceived[0][1] == COMPACT_VERSION):
+                    sender = decodeHeader(packetReceived[0])[2]
+                    self.compactNeighbours[sender] = self.scheduler.clock()
+                    self.advertisementsUnanswered.pop(sender, None)
+                continue
+            failure = packetCheckFailure(packetReceived, routerID)
+            if (failure is not None):#if test failed
+                self.packetRejected(failure)
+                continue#ignore this packet
+            if (packetReceived[0][0] == REQUEST_COMMAND):
+                neighbourID = decodeHeader(packetReceived[0])[2]
+                self.compactNeighbours.pop(neighbourID, None)#it has restarted, perhaps without compact packets, and advertises them again if it has them
+                self.advertisementsUnanswered.pop(neighbourID, None)#and perhaps with them now, so it is advertised to again
+                self.answerRequest(neighbourID)
+                continue
+            received.append(packetReceived[0])
+            if (packetReceived[0][1] == COMPACT_VERSION):
+                packetReceived = self.compactHeard(packetReceived)
+                if (packetReceived is None):
+                    received.pop()
+                    continue
+            accepted.append(packetReceived)
+        if not accepted:
+            return
+        started = perf_counter()
+        changed = routingTable.updateFromPackets(accepted)#the vector table relaxes consecutive fragments from one neighbour together
+        for packetReceived, receivedPacket in zip(accepted, received):
+            duplicateFilter.remember(packetReceived[0], decodeHeader(packetReceived[0])[10], receivedPacket)
+        self.updateLatency.observe((perf_counter() - started) / len(accepted))
+        if (changed > 0):#if anything changed tell the neighbours, and show the table when debugging
+            self.routesChanged.inc(changed)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("%s", routingTable)
+            self.scheduleTriggeredUpdate()
+
+    def packetRejected(self, reason):
+        counter = self.rejectedCounters.get(reason)
+        if (counter is None):
+            counter = self.rejectedCounters[reason] = self.metrics.counter("packetsRejected", reason=reason)
+        counter.inc()
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Packet failed checks: %s", reason)
+
+    def receivePacket(self, packetReceived):#check a received packet and update the routing table with it
+        self.receiveBatch((packetReceived,))
+
+class RouterConfig:#the settings for one router, as read from its config file
+
+    def __init__(self, routerID, inputPorts, outputData, timeoutValue, periodicValue, engine="scalar", adaptivePeriodic=False, backupRoutes=True, packetFormat="standard", helloInterval=0, helloMultiplier=3):
+        self.routerID = routerID
+        self.inputPorts = inputPorts#list of port numbers this router listens on
+        self.outputData = outputData#list of [port of the pair router, metric value of link to the router, router id of the router]
+        self.timeoutValue = timeoutValue
+        self.periodicValue = periodicValue
+        self.engine = engine#which routing table applies received updates, one of ENGINES
+        self.adaptivePeriodic = adaptivePeriodic#stretch the periodic interval while the table is stable
+        self.backupRoutes = backupRoutes#fail routes over to feasible offers from other neighbours
+        self.packetFormat = packetFormat#what to send neighbours which can read compact packets, one of PACKET_FORMATS
+        self.helloInterval = helloInterval#seconds between hellos to the neighbours, 0 for none
+        self.helloMultiplier = helloMultiplier#hellos a neighbour may miss before it declares this router down
+
+    def __repr__(self):
+        return "RouterConfig(%d, %r, %r, %r, %r, %r, %r, %r, %r, %r, %r)" % (self.routerID, self.inputPorts, self.outputData, self.timeoutValue, self.periodicValue, self.engine, self.adaptivePeriodic, self.backupRoutes, self.packetFormat, self.helloInterval, self.helloMultiplier)
+
+def readConfigSection(configParser, section, report=print):#read and test one router's settings from a parsed config file, returns a RouterConfig or None if the settings are invalid. Problems are passed to report
+    try:
+        return parseConfigSection(configParser, section, report)
+    except (ValueError, IndexError, ZeroDivisionError, configparser.Error) as error:#a value which is not a number, an output without all three parts, a missing setting
+        report("Config data invalid in [%s]: %s" % (section, error))
+        return None
+
+def parseConfigSection(configParser, section, report):#readConfigSection without the handling of values that fail to parse
+    routerID = configParser.get(section, 'routerID')#Assigns local integer routerID to
 
     #be the integer value of routerID in the config file with header [RIP_Demon_Parameters]
     routerID = int(routerID)
     
-    inputPorts = (configParser.get('RIP_Demon_Parameters', 'inputPorts'))#assigns inputPorts to be a list of strings of
+    inputPorts = (configParser.get(section, 'inputPorts'))#assigns inputPorts to be a list of strings of
     #the port numbers
     inputPorts = inputPorts.split(",")
 
-    outputs = configParser.get('RIP_Demon_Parameters', 'outputs').split(",")#assigns outputs to be a list of the output values as strings.
+    outputs = configParser.get(section, 'outputs').split(",")#assigns outputs to be a list of the output values as strings.
     
-    timeoutValue = configParser.get('RIP_Demon_Parameters', 'timeoutValue')
-    periodicValue = configParser.get('RIP_Demon_Parameters', 'periodicValue')
+    timeoutValue = configParser.get(section, 'timeoutValue')
+    periodicValue = configParser.get(section, 'periodicValue')
     timeoutValue = int(timeoutValue)
     periodicValue = int(periodicValue)
+    engine = configParser.get(section, 'engine', fallback="scalar").strip()#optional, "vector" applies updates with NumPy
+    if engine not in ENGINES:
+        report("Config data invalid, engine must be one of %s" % ", ".join(ENGINES))
+        return None
+    try:
+        adaptivePeriodic = configParser.getboolean(section, 'adaptivePeriodic', fallback=False)#optional, stretch the periodic interval while the table is stable
+    except ValueError:
+        report("Config data invalid, adaptivePeriodic must be true or false")
+        return None
+    try:
+        backupRoutes = configParser.getboolean(section, 'backupRoutes', fallback=True)#optional, fail over to feasible offers from other neighbours
+    except ValueError:
+        report("Config data invalid, backupRoutes must be true or false")
+        return None
+    packetFormat = configParser.get(section, 'packetFormat', fallback="standard").strip()#optional, "compact" or "compressed" to neighbours which can read them
+    if packetFormat not in PACKET_FORMATS:
+        report("Config data invalid, packetFormat must be one of %s" % ", ".join(PACKET_FORMATS))
+        return None
+    try:
+        helloInterval = configParser.getfloat(section, 'helloInterval', fallback=0)#optional, seconds between hellos to the neighbours
+        helloMultiplier = configParser.getint(section, 'helloMultiplier', fallback=3)#optional, hellos a neighbour may miss
+    except ValueError:
+        report("Config data invalid, helloInterval must be a number and helloMultiplier a whole number")
+        return None
+    if (helloInterval < 0 or helloMultiplier < 1):
+        report("Config data invalid, helloInterval can't be negative and helloMultiplier must be at least 1")
+        return None
     
     if "\n" in inputPorts:#performs check that all input ports are in one line
-        print("Config data invalid, ports not in one line. Ending program")
-        return
+        report("Config data invalid, ports not in one line")
+        return None
 
     if "\n" in outputs:
-        print("Config data invalid, ports not in one line. Ending program")
-        return    
+        report("Config data invalid, ports not in one line")
+        return None
     
     inputPorts = [int(j) for j in inputPorts]
     outputData = convertOutput(outputs)
     
     if (performConfigTests(routerID, inputPorts, outputData, timeoutValue, periodicValue) == False):
-        print("Configuration file invalid, ending program")
+        report("Configuration file invalid")
+        return None
+
+    return RouterConfig(routerID, inputPorts, outputData, timeoutValue, periodicValue, engine, adaptivePeriodic, backupRoutes, packetFormat, helloInterval, helloMultiplier)
+
+def readTopology(configurationFile, report=print):#read every router section of a config or topology file, returns {router ID: RouterConfig} or None if anything is invalid. Problems are passed to report
+    configParser = configparser.RawConfigParser()#set up the configuration parser to read config files
+    try:
+        if not configParser.read(configurationFile):#read the file
+            report("Could not read %s" % configurationFile)
+            return None
+    except configparser.Error as error:#e.g. no section header, or a setting given twice
+        report("Could not parse %s: %s" % (configurationFile, error))
+        return None
+
+    configs = {}
+    for section in configParser.sections():#a single router file has one [RIP_Demon_Parameters] section, a topology file has one section per router
+        config = readConfigSection(configParser, section, report)
+        if (config is None):
+            return None
+        if config.routerID in configs:
+            report("Router %d is defined more than once" % config.routerID)
+            return None
+        configs[config.routerID] = config
+
+    problems = topologyProblems(configs.values())
+    for problem in problems:
+        report("Topology invalid: %s" % problem)
+    if problems:
+        return None
+    return configs
+
+def readConfig(configurationFile, routerID=None, report=print):#read one router's settings from a config or topology file, returns a RouterConfig or None if it is invalid. Problems are passed to report
+    configs = readTopology(configurationFile, report)
+    if (configs is None):
+        return None
+    if (routerID is None):
+        if (len(configs) != 1):
+            report("%s describes %d routers, choose one by router ID" % (configurationFile, len(configs)))
+            return None
+        return next(iter(configs.values()))
+    if routerID not in configs:
+        report("Router %d is not in %s" % (routerID, configurationFile))
+        return None
+    return configs[routerID]
+
+def main():
+    parser = argparse.ArgumentParser(description="RIP routing daemon. Send it SIGHUP to reload its config file")
+    parser.add_argument("config", help="router config file, or a topology file with one section per router")
+    parser.add_argument("--router-id", type=int, help="which router to run, needed when the file describes more than one")
+    parser.add_argument("--log-level", default="INFO", help="DEBUG shows every packet sent and rejected and the table after every change, WARNING shows nothing in normal running")
+    parser.add_argument("--metrics-file", help="write a JSON metrics snapshot to this file periodically")
+    parser.add_argument("--metrics-interval", type=float, default=10, help="seconds between metrics file writes")
+    parser.add_argument("--snapshot-file", help="keep a routing table snapshot in this file and warm start from it")
+    parser.add_argument("--snapshot-interval", type=float, help="seconds between snapshot writes, default the periodic update interval")
+    parser.add_argument("--control-port", type=int, help="answer any datagram sent to this local UDP port with a JSON metrics snapshot")
+    parser.add_argument("--capture-file", help="append every received datagram to this file, for RIPBenchmark.py replay")
+    parser.add_argument("--ingress-rate", type=float, help="packets per second accepted from each neighbour before the excess is dropped, 0 for no limit. Default 4 full tables of this router's size per period, at least 100")
+    parser.add_argument("--ingress-burst", type=int, help="packets a neighbour may send at once above the ingress rate. Default 2 full tables of this router's size, at least 500")
+    parser.add_argument("--timer-budget", type=float, default=0.05, help="seconds of timer work each pass of the loop runs before it receives more packets")
+    parser.add_argument("--fib-export", nargs="?", const="", help="publish the forwarding table in shared memory for local readers, default /dev/shm/rip-fib-<routerID>")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=arguments.log_level.upper(), format="%(asctime)s %(name)s %(message)s")
+
+    configurationFile = arguments.config#take the file path and name of the config file from the command line
+    config = readConfig(configurationFile, arguments.router_id)
+    if (config is None):
+        print("Ending program")
         return
 
-    socketList = []#create an empty list where I can dynamically create and bind sockets. This is needed as I do not know the number of ports I need to bind to and must create socket from an unknown size list.
-
-    inputCount = 0 #initialise count of input ports for naming purposes
-    for inputPort in inputPorts:#for each input port number I have
-        socketList.append(socket.socket(socket.AF_INET, socket.SOCK_DGRAM))#create another socket
-        socketList[inputCount].bind(('127.0.0.1', inputPort))#bind the socket with the port number
-        socketList[inputCount].setblocking(0)
-        inputCount = inputCount + 1#increment to create next socket with next port number
-
-    routingTable = createRoutingTable(outputData)#format routerID, address,first router to destination, metric, time since last update
-    #Each destination will also be a list, so this will be a 2D list
-
-    timeSincePeriodicResponse = time.time()#initialise time
-
-    #while(1):
-    #This loop needs to constantly monitor for incoming messages and update internal routing table accordingly, as well as sending out schedulued messages containing its internal routing table to its neighbours. Also, needs to handle neighbour shutdowns after timeout
-    print(routingTable)
-    #need to create random offset for time waited but it's bugging out##errormarker
-    offset = periodicValue * random.randint(8,12)/10
-    while(1):
-        if (time.time() >= timeSincePeriodicResponse + offset):#if the periodic value of time has passed
-            timeSincePeriodicResponse = time.time()#set time since response to be current time
-            offset = periodicValue * random.randint(8,12)/10
-            print("Sending periodic response")
-            for neighbouringRouter in outputData:#for each neighbour
-                routerResponse = composeResponse(routingTable, routerID,neighbouringRouter[2])#compose the response packet
-                socketList[0].sendto(routerResponse, ('127.0.0.1', neighbouringRouter[0]))#use a socket to send the update
-                
-                #marker above is local ip, need to get it dynamically
-        
-        
-            #hangmeifthisdoesntwork
-            inputReady,outputReady,exceptReady = select.select(socketList, [], [],0)#assign boolean of whether or not input socket is ready
-            for inputSocket in inputReady:#for every socket created
-                packetReceived = inputSocket.recvfrom(4096)#receive it and assign it to packetReceived
-                #now we need to process it-check validity of incoming package, update routing table
-                if (performPacketChecks(packetReceived, routerID) == False):#if test failed
-                    print("failed checks")
-                    continue#ignore this packet
-                else:
-                    neighbourIDs = []
-                    for dataItem in outputData:
-                        neighbourIDs.append(dataItem[2])
-                    routingTable = updateRoutingTable(packetReceived, routingTable,neighbourIDs)#update routing table
-            
-        #above can be made into a function later
-        '''
-        routesChecked = 0
-        for route in routingTable:#for each route in the table
-            if (time.time() - route[4] > timeoutValue):#if the time elapsed passed the timeout value
-                routingTable[routesChecked] = None#check if none will bug out #errormarker
-                #send triggered update
-                route[4] = time.time()
-                for neighbouringRouter in outputData:#for each neighbour
-                    routerResponse = composeResponse(routingTable, routerID, neighbouringRouter)#compose the response packet
-                    socketList[0].sendto(routerResponse, (socketList[0].gethostname(), neighbouringRouter[0]))#use a socket to send the update
-            routesChecked = routesChecked + 1
-
-        #errormarker i think below here for loop isn't needed, use select to listen simultaneously
-
-        
-        #hangmeifthisdoesntwork
-        inputReady,outputReady,exceptReady = select.select(socketList, [], [],0)#assign boolean of whether or not input socket is ready
-        for inputSocket in inputReady:#for every socket created
-            packetReceived = inputSocket.recvfrom(4096)#receive it and assign it to packetReceived
-            #now we need to process it-check validity of incoming package, update routing table
-            if (performPacketChecks(packetReceived, routerID) == False):#if test failed
-                print("failed checks")
-                continue#ignore this packet
-            else:
-                neighbourIDs = []
-                for dataItem in outputData:
-                    neighbourIDs.append(dataItem[2])
-                routingTable = updateRoutingTable(packetReceived, routingTable,neighbourIDs)#update routing table
-
-        
-        for inputSocket in socketList:#for every socket created
-            socketReady = select.select([inputSocket], [], [])#assign boolean of whether or not input socket is ready
-
-            if socketReady[0]:#if something is receivable from this port number
-                packetReceived = inputSocket.recvfrom(4096)#recive it and assign it to packetReceived
-                #now we need to process it-check validity of incoming package, update routing table
-                if (performPacketChecks(packetReceived, routerID) == False):#if test failed
-                    continue#ignore this packet
-                else:
-                    routingTable = updateRoutingTable(packetReceived, routingTable)#update routing table
-        '''
-
-main()
+    scheduler = TimerScheduler()
+    receiveStage = ReceiveStage()
+    inputSockets = {}#input port -> socket bound to it. This is needed as I do not know the number of ports I need to bind to, and a reload can change them
+
+    sendStage = SendStage('127.0.0.1')#a connected socket and bounded queue per neighbour port on this host. marker: local ip, need to get it dynamically
+
+    router = RIPRouter(config, scheduler, sendStage.send)
+    router.metrics.addCollector(sendStage.collectMetrics)
+    router.limitIngress(arguments.ingress_rate, arguments.ingress_burst)
+    snapshot = None
+    if (arguments.snapshot_file is not None):
+        router.warmStart(loadSnapshot(arguments.snapshot_file, router.routerID, config.timeoutValue))#a snapshot older than the timeout holds nothing worth loading
+        snapshot = RouteSnapshot(arguments.snapshot_file, router.routingTable, scheduler, arguments.snapshot_interval or config.periodicValue)
+    forwardingExport = None
+    if (arguments.fib_export is not None):
+        forwardingExport = ForwardingTableExport(router.routingTable, arguments.fib_export or defaultExportPath(router.routerID), scheduler)
+        router.logger.info("Exporting the forwarding table to %s", forwardingExport.fileName)
+    router.logger.info("%s", router.routingTable)
+
+    def bindInputPort(inputPort):
+        inputSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)#create another socket
+        inputSocket.bind(('127.0.0.1', inputPort))#bind the socket with the port number
+        inputSocket.setblocking(0)
+        inputSockets[inputPort] = inputSocket
+        receiveStage.addSocket(inputSocket, router)
+
+    def closeInputPort(inputPort):
+        inputSocket = inputSockets.pop(inputPort)
+        receiveStage.removeSocket(inputSocket)
+        inputSocket.close()
+
+    for inputPort in config.inputPorts:#for each input port number I have
+        bindInputPort(inputPort)
+    capture = None
+    if (arguments.capture_file is not None):
+        capture = receiveStage.capture = PacketCapture(arguments.capture_file)
+
+    if (arguments.metrics_file is not None):
+        MetricsFileExporter(router.metrics.snapshot, arguments.metrics_file, arguments.metrics_interval, scheduler)
+    controlSocket = None
+    extraSockets = []#sockets watched by the loop which are not router input ports
+    if (arguments.control_port is not None):
+        controlSocket = MetricsControlSocket(router.metrics.snapshot, arguments.control_port)
+        extraSockets.append(controlSocket.socket)
+
+    #SIGHUP asks for the config file to be read again. The signal handler only sets a flag, and the wakeup socket makes select return so the flag is seen straight away
+    reloadRequested = []
+    wakeupReader = None
+    if hasattr(signal, "SIGHUP"):
+        wakeupReader, wakeupWriter = socket.socketpair()
+        wakeupReader.setblocking(0)
+        wakeupWriter.setblocking(0)
+        signal.set_wakeup_fd(wakeupWriter.fileno())
+        signal.signal(signal.SIGHUP, lambda signalNumber, frame: reloadRequested.append(signalNumber))
+        extraSockets.append(wakeupReader)
+
+    def reloadConfig():#read the config again and apply only what changed
+        newConfig = readConfig(configurationFile, router.routerID, router.logger.warning)#the daemon keeps running, so problems are logged rather than printed
+        if (newConfig is None):
+            router.logger.warning("Reload failed, keeping the current config")
+            return
+        addedPorts, removedPorts = router.reconfigure(newConfig)
+        sendStage.retain([outputRouter[0] for outputRouter in newConfig.outputData])
+        for inputPort in removedPorts:
+            closeInputPort(inputPort)
+        for inputPort in addedPorts:
+            try:
+                bindInputPort(inputPort)
+            except OSError as error:#e.g. another program already has the port
+                router.logger.warning("Could not bind port %d: %s", inputPort, error)
+        router.logger.info("Reloaded %s: %d ports bound, %d ports closed", configurationFile, len(addedPorts), len(removedPorts))
+
+    if hasattr(signal, "SIGTERM"):#exit through the finally below, so the snapshot and capture are written on shutdown
+        signal.signal(signal.SIGTERM, lambda signalNumber, frame: sys.exit(0))
+
+    timerBudget = arguments.timer_budget if arguments.timer_budget > 0 else None
+    try:
+        while(1):
+            #block until either a datagram arrives or the next timer is due, so an idle router uses no CPU and packets are handled as soon as they arrive
+            inputReady,outputReady,exceptReady = select.select(receiveStage.sockets + extraSockets, sendStage.waitingSockets(), [], scheduler.timeUntilNext())
+            scheduler.runDue(timerBudget)#periodic, timeout and garbage collection timers whose deadline has passed go first, so a flood of packets can't hold them up
+            sendStage.flushReady(outputReady)#send the backlog of any neighbour whose socket was full
+            receiveStage.drain(inputReady)#receive everything waiting on every ready socket and apply it as one batch
+            if (controlSocket is not None and controlSocket.socket in inputReady):
+                controlSocket.handle()
+            if (wakeupReader is not None and wakeupReader in inputReady):
+                try:
+                    wakeupReader.recv(512)
+                except OSError:
+                    pass
+            if reloadRequested:
+                del reloadRequested[:]
+                reloadConfig()
+    finally:
+        if (snapshot is not None):
+            snapshot.close()
+        if (forwardingExport is not None):
+            forwardingExport.close()
+        if (capture is not None):
+            capture.close()
+        sendStage.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import argparse
+import heapq
+import logging
+import random
+import sys
+
+from RIPCapture import PacketCapture
+from RIPCodec import INFINITY, REQUEST_COMMAND
+from RIPServerCode import RIPRouter, readTopology
+from RIPSnapshot import packSnapshot, snapshotEntries, unpackSnapshot
+from RIPTimers import TimerScheduler
+
+'''
+In-process discrete event simulator for the RIP daemon.
+
+Many routers are loaded into one process and share one TimerScheduler running on a virtual
+clock. Sockets are replaced by an in-memory link layer: sending a packet schedules its delivery
+to the router that owns the destination port after a fixed link delay. Time only moves when the
+next event is due, so simulated minutes run in milliseconds, and with a fixed seed every run
+is identical. Setting requestsLost drops every request, as if the neighbours were plain RIP
+routers which never answer them, so a restarted router has to wait for their periodic updates.
+
+Usage:
+python RIPSimulator.py router1.txt router2.txt ... [--time 120] [--seed 0]
+python RIPSimulator.py topology.txt [--time 120] [--capture-file run.ripcap]
+'''
+
+class VirtualClock:#clock which only moves when the simulation moves it
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class Simulation:#a set of routers joined by an in-memory link layer, driven by a virtual clock
+
+    def __init__(self, configs, seed=0, linkDelay=0.001):
+        self.clock = VirtualClock()
+        self.scheduler = TimerScheduler(self.clock)
+        self.random = random.Random(seed)
+        self.linkDelay = linkDelay#seconds between a packet being sent and delivered
+
+        self.configs = {}#router ID -> RouterConfig
+        self.routers = {}#router ID -> RIPRouter for every running router
+        self.portOwners = {}#input port -> router ID listening on it
+        self.failedLinks = set()#frozensets of two router IDs whose link is down
+        self.packetsSent = {}#router ID -> datagrams sent
+        self.bytesSent = {}#router ID -> bytes sent
+        self.packetsDropped = 0
+        self.expectedMetrics = None#router ID -> shortest path metrics, worked out again after any failure or restore
+        self.snapshots = {}#router ID -> snapshot bytes a failed router wrote as it stopped
+        self.capture = None#PacketCapture every delivered packet is written to, with the simulated time, or None
+        self.requestsLost = False#drop every request packet, so no router gets an answer to one
+
+        for config in configs:
+            self.addRouter(config)
+
+    def addRouter(self, config):#start a router, or restart it with an empty table if it is already known
+        routerID = config.routerID
+        self.configs[routerID] = config
+        for inputPort in config.inputPorts:
+            self.portOwners[inputPort] = routerID
+        self.packetsSent.setdefault(routerID, 0)
+        self.bytesSent.setdefault(routerID, 0)
+        self.routers[routerID] = RIPRouter(config, self.scheduler, lambda packet, port, kind: self.transmit(routerID, packet, port), self.random)
+        self.expectedMetrics = None
+        return self.routers[routerID]
+
+    def transmit(self, senderID, packet, port):#the link layer, schedules delivery of a packet to whichever router owns the port
+        if senderID not in self.routers:#a failed router's leftover timers send nothing
+            return
+        receiverID = self.portOwners.get(port)
+        if (receiverID is None or frozenset((senderID, receiverID)) in self.failedLinks or (self.requestsLost and packet[0] == REQUEST_COMMAND)):
+            self.packetsDropped = self.packetsDropped + 1
+            return
+        data = bytes(packet)#packets from the router are only valid until its next send
+        self.packetsSent[senderID] = self.packetsSent[senderID] + 1
+        self.bytesSent[senderID] = self.bytesSent[senderID] + len(data)
+        self.scheduler.schedule(self.linkDelay, "deliver", lambda: self.deliver(senderID, receiverID, data, port))
+
+    def deliver(self, senderID, receiverID, data, port):
+        router = self.routers.get(receiverID)
+        if (router is None or frozenset((senderID, receiverID)) in self.failedLinks):#the receiver or the link went down while the packet was in flight
+            self.packetsDropped = self.packetsDropped + 1
+            return
+        if (self.capture is not None):
+            self.capture.record(data, port, self.clock.now)
+        router.receivePacket((data, ("127.0.0.1", port)))
+
+    def reconfigureRouter(self, config):#give a running router a new config the way a reload would, without restarting it
+        routerID = config.routerID
+        for inputPort in self.configs[routerID].inputPorts:
+            if (self.portOwners.get(inputPort) == routerID):
+                del self.portOwners[inputPort]
+        for inputPort in config.inputPorts:
+            self.portOwners[inputPort] = routerID
+        self.configs[routerID] = config
+        self.expectedMetrics = None
+        router = self.routers.get(routerID)
+        if (router is not None):
+            router.reconfigure(config)
+
+    def failRouter(self, routerID):#stop a router, its neighbours only find out when its routes time out
+        router = self.routers.pop(routerID, None)
+        if (router is not None):
+            self.snapshots[routerID] = packSnapshot(routerID, snapshotEntries(router.routingTable), self.clock.now)#as the daemon does on shutdown
+            router.stop()
+        self.expectedMetrics = None
+
+    def restoreRouter(self, routerID, warm=False):#restart a failed router, with a fresh routing table or warm started from its snapshot
+        if routerID not in self.routers:
+            router = self.addRouter(self.configs[routerID])
+            snapshot = unpackSnapshot(self.snapshots.get(routerID, b""), routerID)
+            if (warm and snapshot is not None):
+                router.warmStart(snapshot[0])
+
+    def failLink(self, firstID, secondID):
+        self.failedLinks.add(frozenset((firstID, secondID)))
+        self.expectedMetrics = None
+
+    def restoreLink(self, firstID, secondID):
+        self.failedLinks.discard(frozenset((firstID, secondID)))
+        self.expectedMetrics = None
+
+    def runUntil(self, endTime):#process every event due up to endTime, then leave the clock at endTime
+        scheduler = self.scheduler
+        clock = self.clock
+        while True:
+            deadline = scheduler.nextDeadline()
+            if (deadline is None or deadline > endTime):
+                break
+            clock.now = deadline
+            scheduler.runDue()
+        clock.now = max(clock.now, endTime)
+
+    def runFor(self, seconds):
+        self.runUntil(self.clock.now + seconds)
+
+    def liveLinks(self):#router ID -> list of (neighbour ID, metric) for every link whose ends are both running
+        routers = self.routers
+        failedLinks = self.failedLinks
+        links = {}
+        for routerID in routers:
+            links[routerID] = [(neighbourID, metric) for port, metric, neighbourID in self.configs[routerID].outputData
+                if neighbourID in routers and frozenset((routerID, neighbourID)) not in failedLinks]
+        return links
+
+    def shortestPaths(self, sourceID, links):#metrics the source should converge to for every destination closer than infinity, using Dijkstra over the live links
+        distances = {sourceID: 0}
+        heap = [(0, sourceID)]
+        while heap:
+            distance, routerID = heapq.heappop(heap)
+            if (distance > distances[routerID]):
+                continue
+            for neighbourID, metric in links[routerID]:
+                newDistance = distance + metric
+                if (newDistance < distances.get(neighbourID, INFINITY)):
+                    distances[neighbourID] = newDistance
+                    heapq.heappush(heap, (newDistance, neighbourID))
+        del distances[sourceID]
+        return distances
+
+    def isConverged(self):#True when every running router has exactly the shortest path metric to every reachable destination and nothing else
+        if (self.expectedMetrics is None):
+            links = self.liveLinks()
+            self.expectedMetrics = {routerID: self.shortestPaths(routerID, links) for routerID in self.routers}
+        for routerID, router in self.routers.items():
+            expected = self.expectedMetrics[routerID]
+            reachable = 0
+            for route in router.routingTable:
+                if (route.metric >= INFINITY):
+                    continue
+                if (expected.get(route.destination) != route.metric):
+                    return False
+                reachable = reachable + 1
+            if (reachable != len(expected)):
+                return False
+        return True
+
+    def runUntilConverged(self, limit, checkInterval=0.1):#run until the routers converge, returns the time it took or None if limit seconds pass first
+        startTime = self.clock.now
+        while (self.clock.now - startTime < limit):
+            self.runFor(checkInterval)
+            if self.isConverged():
+                return round(self.clock.now - startTime, 6)#rounded so repeated checkInterval additions do not show up as noise
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate several RIP routers in one process on a virtual clock")
+    parser.add_argument("configs", nargs="+", help="router config files or topology files")
+    parser.add_argument("--time", type=float, default=120, help="simulated seconds to run for")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="log every router's progress messages")
+    parser.add_argument("--capture-file", help="write every delivered packet to this file, stamped with the simulated time, for RIPBenchmark.py replay")
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if arguments.verbose else logging.WARNING, format="%(name)s %(message)s")
+
+    configs = []
+    for configurationFile in arguments.configs:
+        fileConfigs = readTopology(configurationFile)
+        if (fileConfigs is None):
+            print("Could not load %s" % configurationFile)
+            return 1
+        configs.extend(fileConfigs.values())
+
+    simulation = Simulation(configs, arguments.seed)
+    if (arguments.capture_file is not None):
+        simulation.capture = PacketCapture(arguments.capture_file)
+    convergenceTime = simulation.runUntilConverged(arguments.time)
+    simulation.runUntil(arguments.time)
+    if (simulation.capture is not None):
+        simulation.capture.close()
+
+    if (convergenceTime is None):
+        print("Not converged after %.1f simulated seconds" % arguments.time)
+    else:
+        print("Converged after %.1f simulated seconds" % convergenceTime)
+    for routerID in sorted(simulation.routers):
+        print(routerID, simulation.routers[routerID].routingTable)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
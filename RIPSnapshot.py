@@ -0,0 +1,128 @@
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from RIPCodec import INFINITY
+
+'''
+Routing table snapshots for warm restarts of the RIP daemon.
+
+The learned routes of a table are written to a memory-mapped file periodically and when the
+daemon shuts down. After a restart the routes are loaded back as stale routes: they are used
+straight away, but not advertised until the neighbour they go through confirms them, and they
+time out after a short window if it never does. Routes to direct neighbours are not stored, as
+they always come from the config file.
+
+Header (24 bytes):
+magic b"RIPS" (4s), format version (B), padding (x), router ID (H), entry count (L),
+CRC32 of the entries (L), wall clock time the snapshot was written (d)
+
+Entry (7 bytes):
+destination (H), address (H), next hop (H), metric (B)
+
+The entries are written before the header, so a snapshot cut short by a crash fails its CRC
+check and the router simply starts cold.
+'''
+
+SNAPSHOT_MAGIC = b"RIPS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct(">4sBxHLLd")
+SNAPSHOT_ENTRY = struct.Struct(">HHHB")
+
+def snapshotEntries(routingTable):#(destination, address, next hop, metric) for every learned route that is reachable
+    return [(route.destination, route.address, route.nextHop, route.metric) for route in routingTable if route.learnedFrom != 0 and route.metric < INFINITY]
+
+def packEntries(entries):
+    return b"".join([SNAPSHOT_ENTRY.pack(*entry) for entry in entries])
+
+def packSnapshot(routerID, entries, savedAt):#a whole snapshot as bytes
+    body = packEntries(entries)
+    return SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, routerID, len(entries), zlib.crc32(body), savedAt) + body
+
+def unpackSnapshot(data, routerID):#returns (entries, time written), or None if the data is not a complete snapshot for this router
+    if (len(data) < SNAPSHOT_HEADER.size):
+        return None
+    magic, version, snapshotRouterID, count, checksum, savedAt = SNAPSHOT_HEADER.unpack_from(data, 0)
+    end = SNAPSHOT_HEADER.size + count * SNAPSHOT_ENTRY.size
+    if (magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or snapshotRouterID != routerID or len(data) < end):
+        return None
+    body = bytes(data[SNAPSHOT_HEADER.size:end])
+    if (zlib.crc32(body) != checksum):
+        return None
+    return list(SNAPSHOT_ENTRY.iter_unpack(body)), savedAt
+
+def loadSnapshot(fileName, routerID, maxAge=None):#read a snapshot file, returns its entries or an empty list if it is missing, invalid or older than maxAge seconds
+    try:
+        with open(fileName, "rb") as snapshotFile:
+            if (os.fstat(snapshotFile.fileno()).st_size < SNAPSHOT_HEADER.size):
+                return []
+            with mmap.mmap(snapshotFile.fileno(), 0, access=mmap.ACCESS_READ) as snapshotMap:
+                snapshot = unpackSnapshot(snapshotMap, routerID)
+    except OSError:
+        return []
+    if (snapshot is None):
+        return []
+    entries, savedAt = snapshot
+    if (maxAge is not None and time.time() - savedAt > maxAge):#every route in it would have timed out by now
+        return []
+    return entries
+
+class RouteSnapshot:#keeps a routing table's snapshot file up to date through a memory map
+
+    def __init__(self, fileName, routingTable, scheduler=None, interval=None):
+        self.fileName = fileName
+        self.routingTable = routingTable
+        self.scheduler = scheduler
+        self.interval = interval#seconds between writes, None to only write when asked
+        self.writtenVersion = None#table version of the last write, so an unchanged table is not written again
+        self.writeCount = 0
+        self.timer = None
+
+        self.file = open(fileName, "a+b")
+        self.capacity = 0
+        self.map = None
+        self.reserve(max(4096, os.fstat(self.file.fileno()).st_size))
+        if (scheduler is not None and interval is not None):
+            self.scheduleWrite()
+
+    def reserve(self, size):#grow the file and its map to at least size bytes, doubling so growth is rare
+        if (size <= self.capacity):
+            return
+        capacity = max(self.capacity, 4096)
+        while (capacity < size):
+            capacity = capacity * 2
+        if (self.map is not None):
+            self.map.close()
+        self.file.truncate(capacity)
+        self.map = mmap.mmap(self.file.fileno(), capacity)
+        self.capacity = capacity
+
+    def write(self):#write the table if it changed since the last write, returns True if it was written
+        routingTable = self.routingTable
+        if (routingTable.version == self.writtenVersion):
+            return False
+        entries = snapshotEntries(routingTable)
+        body = packEntries(entries)
+        self.reserve(SNAPSHOT_HEADER.size + len(body))
+        self.map[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + len(body)] = body
+        SNAPSHOT_HEADER.pack_into(self.map, 0, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, routingTable.routerID, len(entries), zlib.crc32(body), time.time())
+        self.map.flush()
+        self.writtenVersion = routingTable.version
+        self.writeCount = self.writeCount + 1
+        return True
+
+    def scheduleWrite(self):
+        self.timer = self.scheduler.schedule(self.interval, "snapshot", self.periodicWrite)
+
+    def periodicWrite(self):
+        self.write()
+        self.scheduleWrite()
+
+    def close(self):#write a final snapshot and release the file
+        if (self.scheduler is not None):
+            self.scheduler.cancel(self.timer)
+        self.write()
+        self.map.close()
+        self.file.close()
@@ -0,0 +1,95 @@
+import heapq
+import itertools
+import time
+from time import perf_counter
+
+'''
+Timer scheduling for the RIP daemon.
+
+Every deadline the daemon cares about (periodic responses, route timeouts and garbage collection)
+is held in a single heap ordered by deadline. The main loop asks the scheduler how long it can
+block in select before the next deadline is due, so an idle router sleeps instead of spinning.
+The loop runs due timers before it receives anything, and can give them a time budget: timers
+still due when the budget is spent run on the next pass, which starts straight away because
+their deadlines have passed, so neither a flood of packets nor a pile of timers shuts the other
+out.
+'''
+
+class Timer:#a single deadline held in the scheduler heap
+
+    __slots__ = ("deadline", "kind", "callback", "cancelled")
+
+    def __init__(self, deadline, kind, callback):
+        self.deadline = deadline#absolute time at which the callback should run
+        self.kind = kind#what the timer is for, e.g. "periodic", "timeout" or "garbage"
+        self.callback = callback#function called with no arguments when the deadline passes
+        self.cancelled = False
+
+    def __repr__(self):
+        return "Timer(%s, %.3f%s)" % (self.kind, self.deadline, ", cancelled" if self.cancelled else "")
+
+class TimerScheduler:#heap of deadlines which the main loop blocks on
+
+    def __init__(self, clock=time.time):
+        self.clock = clock#function returning the current time, replaceable so the scheduler can run on a virtual clock
+        self.heap = []#heap of (deadline, sequence number, timer) tuples, the sequence number keeps equal deadlines in insertion order
+        self.sequence = itertools.count()
+        self.cancelledCount = 0#number of cancelled timers still sitting in the heap
+        self.lag = 0.0#how late the first timer run by the last runDue was, a measure of how loaded the loop is
+        self.deferredCount = 0#passes of runDue which ran out of budget with timers still due
+
+    def __len__(self):#number of live timers
+        return len(self.heap) - self.cancelledCount
+
+    def scheduleAt(self, deadline, kind, callback):#schedule callback to run at an absolute time
+        timer = Timer(deadline, kind, callback)
+        heapq.heappush(self.heap, (deadline, next(self.sequence), timer))
+        return timer
+
+    def schedule(self, delay, kind, callback):#schedule callback to run delay seconds from now
+        return self.scheduleAt(self.clock() + delay, kind, callback)
+
+    def cancel(self, timer):#cancel a timer, it is dropped lazily when it reaches the top of the heap
+        if (timer is None or timer.cancelled):
+            return
+        timer.cancelled = True
+        self.cancelledCount = self.cancelledCount + 1
+        if (self.cancelledCount > 64 and self.cancelledCount * 2 > len(self.heap)):#if most of the heap is dead entries, rebuild it so it doesn't grow without bound
+            self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+            heapq.heapify(self.heap)
+            self.cancelledCount = 0
+
+    def nextDeadline(self):#return the earliest live deadline, or None if nothing is scheduled
+        heap = self.heap
+        while (heap and heap[0][2].cancelled):
+            heapq.heappop(heap)
+            self.cancelledCount = self.cancelledCount - 1
+        if not heap:
+            return None
+        return heap[0][0]
+
+    def timeUntilNext(self):#seconds until the next deadline, suitable as a select timeout. None means block until a datagram arrives
+        deadline = self.nextDeadline()
+        if (deadline is None):
+            return None
+        return max(0.0, deadline - self.clock())
+
+    def runDue(self, budget=None):#run every timer whose deadline has passed, or as many as fit in budget seconds, returns the number of callbacks run
+        now = self.clock()
+        heap = self.heap
+        ran = 0
+        stopAt = perf_counter() + budget if budget is not None else None#real time, the clock may be virtual
+        while (heap and heap[0][0] <= now):
+            if (stopAt is not None and ran > 0 and perf_counter() >= stopAt):#at least one timer always runs, so a pass always makes progress
+                self.deferredCount = self.deferredCount + 1
+                break
+            timer = heapq.heappop(heap)[2]
+            if timer.cancelled:
+                self.cancelledCount = self.cancelledCount - 1
+                continue
+            timer.cancelled = True#a fired timer can no longer be cancelled
+            if (ran == 0):
+                self.lag = now - timer.deadline
+            timer.callback()
+            ran = ran + 1
+        return ran
@@ -0,0 +1,153 @@
+import argparse
+import os
+import random
+import sys
+
+from RIPCodec import PACKET_FORMATS
+from RIPServerCode import ENGINES, RouterConfig
+
+'''
+Topology generator for the RIP daemon.
+
+Builds ring, grid, star, random and scale-free topologies as lists of links, turns them into
+RouterConfig objects with one input port per link end, and can write them out as config files
+in the usual [RIP_Demon_Parameters] format.
+
+Usage:
+python RIPTopology.py ring 20 --output configs/
+'''
+
+BASE_PORT = 1024#first input port handed out
+MAX_PORT = 64000
+
+def ringLinks(size):#each router joined to the next, the last joined back to the first
+    if (size < 3):
+        return [(1, 2)] if size == 2 else []
+    return [(routerID, routerID % size + 1) for routerID in range(1, size + 1)]
+
+def gridLinks(size):#routers laid out in a square-ish grid, each joined to the routers beside and below it
+    columns = max(1, int(size ** 0.5))
+    links = []
+    for routerID in range(1, size + 1):
+        index = routerID - 1
+        if ((index + 1) % columns != 0 and routerID + 1 <= size):
+            links.append((routerID, routerID + 1))
+        if (routerID + columns <= size):
+            links.append((routerID, routerID + columns))
+    return links
+
+def starLinks(size):#router 1 in the middle, joined to every other router
+    return [(1, routerID) for routerID in range(2, size + 1)]
+
+def randomLinks(size, rng, degree=4):#a random spanning tree, so the topology is connected, plus random extra links up to the average degree
+    links = set()
+    for routerID in range(2, size + 1):
+        links.add((rng.randint(1, routerID - 1), routerID))
+    wanted = max(len(links), size * degree // 2)
+    attempts = 0
+    while (len(links) < wanted and attempts < wanted * 10):
+        first, second = rng.randint(1, size), rng.randint(1, size)
+        attempts = attempts + 1
+        if (first != second and (first, second) not in links and (second, first) not in links):
+            links.add((first, second))
+    return sorted(links)
+
+def scaleFreeLinks(size, rng, linksPerRouter=2):#Barabasi-Albert preferential attachment, new routers link to routers that already have many links
+    links = []
+    endpoints = []#every link end, so choosing from it picks routers in proportion to their degree
+    for routerID in range(2, size + 1):
+        targets = set()
+        wanted = min(linksPerRouter, routerID - 1)
+        while (len(targets) < wanted):
+            targets.add(rng.choice(endpoints) if endpoints else rng.randint(1, routerID - 1))
+        for target in targets:
+            links.append((target, routerID))
+            endpoints += (target, routerID)
+    return links
+
+TOPOLOGIES = {
+    "ring": lambda size, rng: ringLinks(size),
+    "grid": lambda size, rng: gridLinks(size),
+    "star": lambda size, rng: starLinks(size),
+    "random": randomLinks,
+    "scalefree": scaleFreeLinks,
+}
+
+def generateLinks(topology, size, seed=0):#return a list of (router ID, router ID) links for the named topology
+    if topology not in TOPOLOGIES:
+        raise ValueError("unknown topology %r, expected one of %s" % (topology, ", ".join(sorted(TOPOLOGIES))))
+    return TOPOLOGIES[topology](size, random.Random(seed))
+
+def configsFromLinks(links, size, seed=0, maxCost=1, timeoutValue=18, periodicValue=3, engine="scalar", adaptivePeriodic=False, backupRoutes=True, packetFormat="standard", helloInterval=0, helloMultiplier=3):#one RouterConfig per router, with a random link cost between 1 and maxCost shared by both ends
+    rng = random.Random(seed)
+    inputPorts = {routerID: [] for routerID in range(1, size + 1)}
+    outputData = {routerID: [] for routerID in range(1, size + 1)}
+    nextPort = BASE_PORT
+    for first, second in links:
+        if (nextPort + 1 > MAX_PORT):
+            raise ValueError("too many links to give every link end its own port")
+        cost = rng.randint(1, maxCost)
+        inputPorts[first].append(nextPort)
+        inputPorts[second].append(nextPort + 1)
+        outputData[first].append([nextPort + 1, cost, second])
+        outputData[second].append([nextPort, cost, first])
+        nextPort = nextPort + 2
+    return [RouterConfig(routerID, inputPorts[routerID], outputData[routerID], timeoutValue, periodicValue, engine, adaptivePeriodic, backupRoutes, packetFormat, helloInterval, helloMultiplier) for routerID in range(1, size + 1) if inputPorts[routerID]]
+
+def generateConfigs(topology, size, seed=0, maxCost=1, timeoutValue=18, periodicValue=3, engine="scalar", adaptivePeriodic=False, backupRoutes=True, packetFormat="standard", helloInterval=0, helloMultiplier=3):
+    return configsFromLinks(generateLinks(topology, size, seed), size, seed, maxCost, timeoutValue, periodicValue, engine, adaptivePeriodic, backupRoutes, packetFormat, helloInterval, helloMultiplier)
+
+def formatConfig(config, section="RIP_Demon_Parameters"):#the config file text for one router
+    return "[%s]\n\nrouterID = %d\ninputPorts = %s\noutputs = %s\ntimeoutValue = %d\nperiodicValue = %d\n" % (
+        section, config.routerID,
+        ",".join(str(port) for port in config.inputPorts),
+        ",".join("%d-%d-%d" % tuple(output) for output in config.outputData),
+        config.timeoutValue, config.periodicValue) + ("" if config.engine == "scalar" else "engine = %s\n" % config.engine) + ("adaptivePeriodic = true\n" if config.adaptivePeriodic else "") + ("" if config.backupRoutes else "backupRoutes = false\n") + ("" if config.packetFormat == "standard" else "packetFormat = %s\n" % config.packetFormat) + ("" if not config.helloInterval else "helloInterval = %g\nhelloMultiplier = %d\n" % (config.helloInterval, config.helloMultiplier))
+
+def writeConfigs(configs, directory):#write router<ID>.txt for every config, returns the file names
+    os.makedirs(directory, exist_ok=True)
+    fileNames = []
+    for config in configs:
+        fileName = os.path.join(directory, "router%d.txt" % config.routerID)
+        with open(fileName, "w") as configFile:
+            configFile.write(formatConfig(config))
+        fileNames.append(fileName)
+    return fileNames
+
+def formatTopology(configs):#the text of one topology file holding a [router<ID>] section for every config
+    return "\n".join(formatConfig(config, "router%d" % config.routerID) for config in configs)
+
+def writeTopology(configs, fileName):
+    with open(fileName, "w") as topologyFile:
+        topologyFile.write(formatTopology(configs))
+    return fileName
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate RIP router config files for a topology")
+    parser.add_argument("topology", choices=sorted(TOPOLOGIES))
+    parser.add_argument("size", type=int, help="number of routers")
+    parser.add_argument("--output", default=".", help="directory to write router<ID>.txt files into")
+    parser.add_argument("--single-file", help="write one topology file with a section per router instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-cost", type=int, default=1, help="link costs are chosen between 1 and this")
+    parser.add_argument("--timeout", type=int, default=18)
+    parser.add_argument("--periodic", type=int, default=3)
+    parser.add_argument("--engine", choices=ENGINES, default="scalar", help="routing table the generated routers use")
+    parser.add_argument("--adaptive-periodic", action="store_true", help="stretch the generated routers' periodic interval while their tables are stable")
+    parser.add_argument("--no-backup-routes", action="store_true", help="generated routers wait for new advertisements instead of failing over to backup routes")
+    parser.add_argument("--packet-format", choices=PACKET_FORMATS, default="standard", help="what the generated routers send neighbours which can read compact packets")
+    parser.add_argument("--hello-interval", type=float, default=0, help="seconds between the generated routers' hellos, 0 for none")
+    parser.add_argument("--hello-multiplier", type=int, default=3, help="hellos a neighbour may miss before it is declared down")
+    arguments = parser.parse_args()
+
+    configs = generateConfigs(arguments.topology, arguments.size, arguments.seed, arguments.max_cost, arguments.timeout, arguments.periodic, arguments.engine, arguments.adaptive_periodic, not arguments.no_backup_routes, arguments.packet_format, arguments.hello_interval, arguments.hello_multiplier)
+    if (arguments.single_file is not None):
+        writeTopology(configs, arguments.single_file)
+        print("Wrote %d routers to %s" % (len(configs), arguments.single_file))
+        return 0
+    fileNames = writeConfigs(configs, arguments.output)
+    print("Wrote %d config files to %s" % (len(fileNames), arguments.output))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+import time
+
+from RIPCodec import ENTRY_SIZE, HEADER_SIZE, INFINITY, PARTIAL_FRAGMENT, decodeHeader
+from RIPRouteTable import Route, RouteTable
+
+try:
+    import numpy
+except ImportError:#NumPy is optional, without it every router uses the scalar RouteTable
+    numpy = None
+
+'''
+NumPy backed routing table for the RIP daemon.
+
+VectorRouteTable keeps the metric, next hop and last update time of every route in arrays indexed
+by destination router ID, alongside the usual Route objects. Each received packet is decoded with
+one numpy.frombuffer call, and consecutive fragments from one neighbour in a received batch are
+relaxed together as one vector: the metrics through the sender are worked out for every entry at
+once and compared with the arrays, and only the entries which add or change a route go through
+Python. Entries which just confirm a route only have their time set in the array, which is the
+common case once the network has converged. The whole received vector is also stored, as a few
+array writes, in the sender's offer arrays, which hold the backup route candidates that the
+scalar table keeps in dictionaries.
+
+A run which names a destination more than once is applied entry by entry instead, as each of
+those entries depends on the ones before it. The result is the same as RouteTable.updateRoutingTable.
+Select it with "engine = vector" in the router's config section. If NumPy is not installed the
+router logs a warning and uses RouteTable.
+'''
+
+vectorAvailable = numpy is not None
+
+if vectorAvailable:
+    ENTRY_DTYPE = numpy.dtype([("destination", ">u2"), ("address", ">u2"), ("nextHop", ">u2"), ("metric", ">u2")])#the ENTRY layout from RIPCodec
+
+class VectorRouteTable(RouteTable):#routing table whose received updates are applied with array operations
+
+    def __init__(self, routerID, outputData, clock=time.time, capacity=256):
+        if not vectorAvailable:
+            raise RuntimeError("the vector routing table needs NumPy")
+        self.metrics = numpy.full(capacity, INFINITY, numpy.int16)#destination -> metric, INFINITY where there is no route
+        self.nextHops = numpy.zeros(capacity, numpy.uint16)#destination -> next hop, 0 where there is no route
+        self.lastUpdates = numpy.zeros(capacity, numpy.float64)#destination -> time the route was last confirmed by an update which changed nothing
+        RouteTable.__init__(self, routerID, outputData, clock)
+
+    def reserve(self, destination):#grow the arrays so destination can index them, doubling so growth is rare
+        capacity = len(self.metrics)
+        if (destination < capacity):
+            return
+        while (capacity <= destination):
+            capacity = capacity * 2
+        grow = capacity - len(self.metrics)
+        self.metrics = numpy.concatenate((self.metrics, numpy.full(grow, INFINITY, numpy.int16)))
+        self.nextHops = numpy.concatenate((self.nextHops, numpy.zeros(grow, numpy.uint16)))
+        self.lastUpdates = numpy.concatenate((self.lastUpdates, numpy.zeros(grow, numpy.float64)))
+        for neighbourID in list(self.neighbourOffers):
+            self.offerArrays(neighbourID)
+
+    def offerArrays(self, neighbourID):#the (metrics, addresses, next hops, fragments, generations) arrays of a neighbour's offers, grown to the table's capacity
+        capacity = len(self.metrics)
+        offers = self.neighbourOffers.get(neighbourID)
+        if (offers is not None and len(offers[0]) == capacity):
+            return offers
+        grown = (numpy.full(capacity, INFINITY, numpy.int16), numpy.zeros(capacity, numpy.uint16), numpy.zeros(capacity, numpy.uint16), numpy.zeros(capacity, numpy.uint16), numpy.zeros(capacity, numpy.uint32))
+        if (offers is not None):
+            for array, old in zip(grown, offers):
+                array[:len(old)] = old
+        self.neighbourOffers[neighbourID] = grown
+        return grown
+
+    #every change to a route goes through these, so the arrays always match the Route objects
+
+    def addRoute(self, route):
+        destination = route.destination
+        self.reserve(destination)
+        self.metrics[destination] = route.metric
+        self.nextHops[destination] = route.nextHop
+        self.lastUpdates[destination] = route.lastUpdate
+        RouteTable.addRoute(self, route)
+
+    def removeRoute(self, destination):
+        route = RouteTable.removeRoute(self, destination)
+        if (route is not None):
+            self.metrics[destination] = INFINITY
+            self.nextHops[destination] = 0
+            self.lastUpdates[destination] = 0.0
+        return route
+
+    def setNextHop(self, route, nextHop):
+        self.nextHops[route.destination] = nextHop
+        self.lastUpdates[route.destination] = 0.0#times confirmed through the old next hop say nothing about the new one
+        RouteTable.setNextHop(self, route, nextHop)
+
+    def setMetric(self, route, metric):
+        self.metrics[route.destination] = metric
+        RouteTable.setMetric(self, route, metric)
+
+    def offerFrom(self, neighbourID, destination):
+        offers = self.neighbourOffers.get(neighbourID)
+        if (offers is None or destination >= len(offers[0]) or offers[4][destination] == 0):
+            return None
+        heard = self.offerFragments.get((neighbourID, int(offers[3][destination])))
+        if (heard is None or heard[0] != offers[4][destination]):
+            return None
+        return int(offers[0][destination]), int(offers[1][destination]), heard[1], int(offers[2][destination])
+
+    def lastUpdateOf(self, route):#the later of the route's own time and the time an unchanged update left in the array
+        lastUpdate = self.lastUpdates[route.destination]
+        if (lastUpdate > route.lastUpdate):
+            route.lastUpdate = float(lastUpdate)
+        return route.lastUpdate
+
+    def updateRoutingTable(self, packetReceived):#updates the routing table from a received packet, returns the number of routes added or changed
+        return self.updateFromPackets((packetReceived,))
+
+    def updateFromPackets(self, packets):#apply a batch of checked packets, relaxing each run of consecutive packets from one neighbour as one vector
+        changed = 0
+        run = []
+        runSender = None
+        for packetReceived in packets:
+            sender = decodeHeader(packetReceived[0])[2]
+            if (sender != runSender and run):
+                changed = changed + self.applyRun(runSender, run)
+                run = []
+            runSender = sender
+            run.append(packetReceived[0])
+        if run:
+            changed = changed + self.applyRun(runSender, run)
+        return changed
+
+    def applyRun(self, receivedRouterID, packets):#apply packets which all came from one neighbour, returns the number of routes added or changed
+        linkCost = self.linkCosts.get(receivedRouterID)
+        if (linkCost is None):#only neighbours from the config file are trusted
+            return 0
+
+        now = self.clock()
+        headers = [decodeHeader(packet) for packet in packets]
+        changed = self.confirmNeighbour(receivedRouterID, linkCost, now)
+        if (len(packets) == 1):
+            entries = numpy.frombuffer(packets[0], ENTRY_DTYPE, headers[0][10], HEADER_SIZE)
+        else:#join the entry blocks of every fragment and view them as one array
+            entries = numpy.frombuffer(b"".join([memoryview(packet)[HEADER_SIZE:HEADER_SIZE + header[10] * ENTRY_SIZE] for packet, header in zip(packets, headers)]), ENTRY_DTYPE)
+        if any(header[5] == PARTIAL_FRAGMENT for header in headers):#a triggered update takes its offers' fragments from the offers before it, so the offers are stored a packet at a time
+            start = 0
+            for header in headers:
+                block = entries[start:start + header[10]]
+                start = start + header[10]
+                if (header[5] == PARTIAL_FRAGMENT):
+                    if (len(block) > 0):
+                        self.storePartialOffers(receivedRouterID, block)
+                    continue
+                generation = self.heardFragment(receivedRouterID, header[5], now)
+                if (len(block) > 0):
+                    self.storeOffers(receivedRouterID, block, [header], [generation])
+        else:
+            generations = [self.heardFragment(receivedRouterID, header[5], now) for header in headers]
+            if (len(entries) > 0):
+                self.storeOffers(receivedRouterID, entries, headers, generations)
+        if (len(entries) > 0):
+            changed = changed + self.relax(entries, receivedRouterID, linkCost, now)
+        if (changed > 0):
+            self.version = self.version + 1
+        return changed
+
+    def storeOffers(self, neighbourID, entries, headers, generations):#keep every entry of a run as the neighbour's current offer, whether or not it wins, as backups for later
+        destinations = entries["destination"].astype(numpy.intp)
+        self.reserve(int(destinations.max()))
+        metrics, addresses, nextHops, fragments, fragmentGenerations = self.offerArrays(neighbourID)
+        counts = [header[10] for header in headers]
+        metrics[destinations] = numpy.minimum(entries["metric"], INFINITY)
+        addresses[destinations] = entries["address"]
+        nextHops[destinations] = entries["nextHop"]
+        fragments[destinations] = numpy.repeat([header[5] for header in headers], counts)
+        fragmentGenerations[destinations] = numpy.repeat(generations, counts)
+
+    def storePartialOffers(self, neighbourID, entries):#keep a triggered update's entries as offers from the fragment that last offered each destination, or fragment 0 for a new one, as RouteTable.storePartialOffers does
+        destinations = entries["destination"].astype(numpy.intp)
+        self.reserve(int(destinations.max()))
+        metrics, addresses, nextHops, fragments, fragmentGenerations = self.offerArrays(neighbourID)
+        offered = numpy.where(fragmentGenerations[destinations] != 0, fragments[destinations], 0)
+        heardFragments, inverse = numpy.unique(offered, return_inverse=True)
+        current = numpy.array([self.offerFragments.get((neighbourID, fragment), (0,))[0] for fragment in heardFragments.tolist()], numpy.uint32)#generation 0 is never current
+        metrics[destinations] = numpy.minimum(entries["metric"], INFINITY)
+        addresses[destinations] = entries["address"]
+        nextHops[destinations] = entries["nextHop"]
+        fragments[destinations] = offered
+        fragmentGenerations[destinations] = current[inverse]
+
+    def relax(self, entries, receivedRouterID, linkCost, now):#the min-plus step for a whole received vector, returns the number of routes added or changed
+        destinations = entries["destination"].astype(numpy.intp)
+        if (len(numpy.unique(destinations)) < len(destinations)):#a destination heard twice in one run, e.g. a triggered update and the next full table in one batch, depends on the entries before it, so the run is applied in order as the scalar table does
+            return RouteTable.relaxEntries(self, zip(destinations.tolist(), entries["address"].tolist(), entries["nextHop"].tolist(), entries["metric"].tolist()), receivedRouterID, linkCost, now)
+        self.reserve(int(destinations.max()))
+        metrics = numpy.minimum(entries["metric"].astype(numpy.int32) + linkCost, INFINITY)#metric to each destination through the sender
+        currentMetrics = self.metrics[destinations]
+        nextHops = self.nextHops[destinations]
+
+        wanted = (destinations != self.routerID) & (destinations != receivedRouterID)#routes to ourself and to the sender are not learned from the sender
+        viaSender = wanted & (nextHops == receivedRouterID)
+        reachable = metrics < INFINITY
+        unchanged = metrics == currentMetrics
+
+        confirmed = destinations[viaSender & unchanged & reachable]
+        self.lastUpdates[confirmed] = now#confirmed routes only need their time moved
+        changed = 0
+        if self.staleDestinations:#routes from a snapshot which the next hop has now confirmed
+            staleDestinations = self.staleDestinations
+            for destination in confirmed.tolist():
+                if destination in staleDestinations:
+                    self.confirmRoute(destination)
+                    changed = changed + 1
+        added = wanted & (nextHops == 0) & reachable#new destinations that are reachable
+        movedViaSender = viaSender & ~unchanged#the sender is already our next hop, so believe it whether the metric got better or worse
+        shorter = wanted & (nextHops != 0) & ~viaSender & (metrics < currentMetrics)#the sender offers a shorter path
+        changes = numpy.flatnonzero(added | movedViaSender | shorter)
+        if (len(changes) == 0):
+            return changed
+
+        changedDestinations = destinations[changes]
+        self.metrics[changedDestinations] = metrics[changes]#the arrays are updated in one go, so the Route objects below go through the RouteTable methods directly
+        self.nextHops[changedDestinations] = receivedRouterID
+        self.lastUpdates[changedDestinations] = now
+        routes = self.routes
+        for destination, address, metric in zip(changedDestinations.tolist(), entries["address"][changes].tolist(), metrics[changes].tolist()):
+            route = routes.get(destination)
+            if (route is None):
+                RouteTable.addRoute(self, Route(destination, address, receivedRouterID, metric, now, receivedRouterID))
+                continue
+            if (route.nextHop != receivedRouterID):#the route as it stands now, not as the masks saw it
+                RouteTable.setNextHop(self, route, receivedRouterID)
+                route.address = address
+                route.learnedFrom = receivedRouterID
+            route.lastUpdate = now
+            RouteTable.setMetric(self, route, metric)
+        return changed + len(changes)